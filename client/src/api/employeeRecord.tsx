@@ -54,34 +54,56 @@ export const fetchEmployeeServiceRecordPDF = async (employeeId: string) => {
 };
 
 /**
- * Creates a downloadable PDF from the base64 data
- * Triggers a file download in the browser
+ * Fetches the employee service record PDF as a binary Blob
+ * The server answers with an ETag, so repeat requests for an unchanged
+ * service record are revalidated by the browser cache (304) instead of
+ * being rendered again
  *
  * @param employeeId - The employee ID to generate the PDF for
- * @returns A Promise that resolves when the download is initiated
+ * @returns The PDF Blob and its file name
  */
-export const downloadEmployeeServiceRecordPDF = async (employeeId: string) => {
+export const fetchEmployeeServiceRecordPDFBlob = async (employeeId: string) => {
   try {
-    const pdfData = await fetchEmployeeServiceRecordPDF(employeeId);
-
-    // Convert base64 to blob
-    const byteCharacters = atob(pdfData.data);
-    const byteArrays = [];
+    const response = await axiosInstance.get<Blob>(
+      `/service-record/${employeeId}/pdf/`,
+      {
+        params: { download: true },
+        responseType: "blob",
+      },
+    );
 
-    for (let offset = 0; offset < byteCharacters.length; offset += 512) {
-      const slice = byteCharacters.slice(offset, offset + 512);
+    // Get filename from Content-Disposition header if available
+    const contentDisposition = response.headers["content-disposition"];
+    let filename = `service_record_${employeeId}.pdf`;
 
-      const byteNumbers = new Array(slice.length);
-      for (let i = 0; i < slice.length; i++) {
-        byteNumbers[i] = slice.charCodeAt(i);
+    if (contentDisposition) {
+      const filenameMatch = contentDisposition.match(/filename="?([^"]*)"?/);
+      if (filenameMatch && filenameMatch[1]) {
+        filename = filenameMatch[1];
       }
-
-      const byteArray = new Uint8Array(byteNumbers);
-      byteArrays.push(byteArray);
     }
 
-    const blob = new Blob(byteArrays, { type: pdfData.mime_type });
-    const url = URL.createObjectURL(blob);
+    return {
+      blob: new Blob([response.data], { type: "application/pdf" }),
+      filename,
+    };
+  } catch (error) {
+    console.error("Error fetching employee service record PDF:", error);
+    throw error;
+  }
+};
+
+/**
+ * Downloads the employee service record PDF
+ * Triggers a file download in the browser
+ *
+ * @param employeeId - The employee ID to generate the PDF for
+ * @returns A Promise that resolves when the download is initiated
+ */
+export const downloadEmployeeServiceRecordPDF = async (employeeId: string) => {
+  try {
+    const pdfData = await fetchEmployeeServiceRecordPDFBlob(employeeId);
+    const url = URL.createObjectURL(pdfData.blob);
 
     // Create download link
     const link = document.createElement("a");
@@ -112,26 +134,8 @@ export const downloadEmployeeServiceRecordPDF = async (employeeId: string) => {
  */
 export const openEmployeeServiceRecordPDF = async (employeeId: string) => {
   try {
-    const pdfData = await fetchEmployeeServiceRecordPDF(employeeId);
-
-    // Create blob URL
-    const byteCharacters = atob(pdfData.data);
-    const byteArrays = [];
-
-    for (let offset = 0; offset < byteCharacters.length; offset += 512) {
-      const slice = byteCharacters.slice(offset, offset + 512);
-
-      const byteNumbers = new Array(slice.length);
-      for (let i = 0; i < slice.length; i++) {
-        byteNumbers[i] = slice.charCodeAt(i);
-      }
-
-      const byteArray = new Uint8Array(byteNumbers);
-      byteArrays.push(byteArray);
-    }
-
-    const blob = new Blob(byteArrays, { type: pdfData.mime_type });
-    const url = URL.createObjectURL(blob);
+    const pdfData = await fetchEmployeeServiceRecordPDFBlob(employeeId);
+    const url = URL.createObjectURL(pdfData.blob);
 
     // Open in new tab
     window.open(url, "_blank");
@@ -0,0 +1,71 @@
+import { PdsJob } from "../types/employee";
+import axiosInstance from "../instance";
+
+export const fetchPdsJob = async (jobId: number) => {
+  const response = await axiosInstance.get<PdsJob>(
+    `/employee/pds/jobs/${jobId}/`,
+  );
+  return response.data;
+};
+
+/**
+ * Thrown by `waitForPdsJob` when the job is still queued or running after
+ * `maxWait`; the worker keeps going and the PDS still gets uploaded
+ */
+export class PdsJobTimeout extends Error {
+  job: PdsJob;
+
+  constructor(job: PdsJob) {
+    super("The PDS is still being generated");
+    this.name = "PdsJobTimeout";
+    this.job = job;
+  }
+}
+
+type WaitOptions = {
+  // Milliseconds before the second poll, growing by half after each poll
+  interval?: number;
+  // Longest wait between two polls
+  maxInterval?: number;
+  // Milliseconds to poll for before giving up with a PdsJobTimeout
+  maxWait?: number;
+};
+
+/**
+ * Polls a queued PDS render/upload job until the worker finishes it
+ *
+ * @param jobId - The job ID returned by a 202 from `/employee/pds/`
+ * @param onProgress - Called with every status update while polling
+ * @param options - Polling interval, backoff cap and how long to wait
+ * @returns The finished job, including its Drive `pds_link`
+ * @throws PdsJobTimeout when the job has not finished within `maxWait`
+ */
+export const waitForPdsJob = async (
+  jobId: number,
+  onProgress?: (job: PdsJob) => void,
+  {
+    interval = 1000,
+    maxInterval = 10000,
+    maxWait = 5 * 60 * 1000,
+  }: WaitOptions = {},
+) => {
+  const deadline = Date.now() + maxWait;
+  let delay = interval;
+
+  for (;;) {
+    const job = await fetchPdsJob(jobId);
+    onProgress?.(job);
+
+    if (job.status === "succeeded") return job;
+    if (job.status === "failed") {
+      throw new Error(job.error || "PDS generation failed");
+    }
+    if (job.status === "superseded") {
+      throw new Error("PDS generation was replaced by a newer save");
+    }
+    if (Date.now() + delay > deadline) throw new PdsJobTimeout(job);
+
+    await new Promise((resolve) => setTimeout(resolve, delay));
+    delay = Math.min(delay * 1.5, maxInterval);
+  }
+};
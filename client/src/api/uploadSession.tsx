@@ -0,0 +1,76 @@
+import { FileResponse } from "../types/employee";
+import axiosInstance from "../instance";
+
+// Files above this size go through a resumable upload session
+export const RESUMABLE_UPLOAD_THRESHOLD = 8 * 1024 * 1024;
+const CHUNK_SIZE = 4 * 1024 * 1024;
+const MAX_RETRIES = 5;
+
+type UploadSession = {
+  upload_id: string;
+  offset: number;
+  length: number;
+};
+
+const sessionUrl = (uploadId: string) => `/employee/uploads/${uploadId}/`;
+
+const fetchOffset = async (uploadId: string) => {
+  const response = await axiosInstance.head(sessionUrl(uploadId));
+  return Number(response.headers["upload-offset"]);
+};
+
+/**
+ * Uploads a document in chunks through a resumable upload session
+ *
+ * A failed chunk is retried from the offset the server reports, so a
+ * dropped connection only costs the bytes after the last stored chunk.
+ *
+ * @param file - The document to upload
+ * @param fields - employee_id, file_type and, to replace a document, file_id
+ * @param onProgress - Called with the fraction (0-1) uploaded so far
+ * @returns The same response as `/employee/files/`
+ */
+export const uploadResumable = async (
+  file: File,
+  fields: { employee_id: string; file_type: string; file_id?: string },
+  onProgress?: (fraction: number) => void,
+) => {
+  const { data: session } = await axiosInstance.post<UploadSession>(
+    "/employee/uploads/",
+    {
+      ...fields,
+      length: file.size,
+      file_name: file.name,
+      content_type: file.type,
+    },
+  );
+
+  let offset = session.offset;
+  let retries = 0;
+  while (offset < file.size) {
+    try {
+      const response = await axiosInstance.patch(
+        sessionUrl(session.upload_id),
+        file.slice(offset, offset + CHUNK_SIZE),
+        {
+          headers: {
+            "Content-Type": "application/offset+octet-stream",
+            "Upload-Offset": String(offset),
+          },
+        },
+      );
+      offset = Number(response.headers["upload-offset"]);
+      retries = 0;
+      onProgress?.(offset / file.size);
+    } catch (error) {
+      if (++retries > MAX_RETRIES) throw error;
+      await new Promise((resolve) => setTimeout(resolve, 1000 * retries));
+      offset = await fetchOffset(session.upload_id);
+    }
+  }
+
+  const response = await axiosInstance.post<FileResponse>(
+    `${sessionUrl(session.upload_id)}finalize/`,
+  );
+  return response.data;
+};
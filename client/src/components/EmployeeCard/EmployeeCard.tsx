@@ -38,7 +38,7 @@ const EmployeeCard = ({
         </button>
 
         <img
-          src={getProfile(employee.files) ?? displayPic}
+          src={getProfile(employee.files, "avatar") ?? displayPic}
           alt="Employee Icon"
           onError={(e) => {
             e.currentTarget.onerror = null;
@@ -10,7 +10,7 @@ import { useParams } from "react-router-dom";
 // Components
 import LoadingModal from "../../Loading/Loading";
 import { PDSPostModal } from "../../Modal";
-import { AlertError } from "../../Alert";
+import { AlertError, AlertSuccess } from "../../Alert";
 
 // Hooks
 import { useEffect, useRef, useState } from "react";
@@ -18,6 +18,7 @@ import { useRequest } from "../../../hooks";
 
 // Utils
 import { convertToBase64 } from "../../../utils/fileHandler";
+import { PdsJobTimeout, waitForPdsJob } from "../../../api/pdsJob";
 
 type RouteParams = Record<string, string | undefined>;
 
@@ -28,7 +29,11 @@ type FormFourProps = {
 };
 
 type PDSResponse = {
-  pds_link: string;
+  detail: string;
+  // Set when the PDS was unchanged and nothing had to be rendered
+  pds_link?: string;
+  // Set when rendering and uploading was queued for the worker
+  job_id?: number;
 };
 
 const FormFour = ({ register, setValue, handleSubmit }: FormFourProps) => {
@@ -37,14 +42,19 @@ const FormFour = ({ register, setValue, handleSubmit }: FormFourProps) => {
   const fileRef = useRef<HTMLInputElement>(null);
   const submitRef = useRef<HTMLInputElement>(null);
   const [imageUrl, setImageUrl] = useState<string>("");
-  const { loading, error, errorMessage, response, handleRequest } = useRequest<
+  const [pdsLink, setPdsLink] = useState<string | null>(null);
+  const [jobPending, setJobPending] = useState(false);
+  const [jobError, setJobError] = useState("");
+  // Saved, but the worker had not finished the PDS when polling gave up
+  const [jobStillProcessing, setJobStillProcessing] = useState(false);
+  const { loading, error, errorMessage, handleRequest } = useRequest<
     PDSResponse,
     PDSForm
   >("/employee/pds/");
 
   useEffect(() => {
-    if (error) setShowErrorAlert(true);
-  }, [error]);
+    if (error || jobError) setShowErrorAlert(true);
+  }, [error, jobError]);
 
   const handleFileClick = () => {
     fileRef.current?.click(); // Triggers the hidden file input
@@ -70,20 +80,52 @@ const FormFour = ({ register, setValue, handleSubmit }: FormFourProps) => {
     }
   };
 
-  const submit = (data: PDSForm) => {
+  const submit = async (data: PDSForm) => {
     console.log("Form data submitted:", data);
-    handleRequest(data, {
-      method: mode === "update" ? "PUT" : "POST",
-    });
+    setJobError("");
+    setJobStillProcessing(false);
+
+    let result: PDSResponse;
+    try {
+      result = await handleRequest(data, {
+        method: mode === "update" ? "PUT" : "POST",
+      });
+    } catch {
+      return; // Shown through `error` / `errorMessage`
+    }
+
+    if (result.pds_link) {
+      setPdsLink(result.pds_link);
+      return;
+    }
+
+    if (result.job_id) {
+      // The PDS is rendered and uploaded by a background worker
+      setJobPending(true);
+      try {
+        const job = await waitForPdsJob(result.job_id);
+        setPdsLink(job.pds_link);
+      } catch (jobFailure: any) {
+        if (jobFailure instanceof PdsJobTimeout) {
+          setJobStillProcessing(true);
+        } else {
+          setJobError(jobFailure.message || "PDS generation failed");
+        }
+      } finally {
+        setJobPending(false);
+      }
+    }
   };
 
   return (
     <div>
-      {response && (
-        <PDSPostModal url={response.pds_link} employeeId={employeeId} />
-      )}
+      {pdsLink && <PDSPostModal url={pdsLink} employeeId={employeeId} />}
       {error && showErrorAlert && <AlertError message={errorMessage} />}
-      <LoadingModal loading={loading} />
+      {jobError && showErrorAlert && <AlertError message={jobError} />}
+      {jobStillProcessing && (
+        <AlertSuccess message="PDS saved. It is still being generated and will appear in the employee's files once ready." />
+      )}
+      <LoadingModal loading={loading || jobPending} />
       <form
         className="mx-auto my-12 grid h-full w-[1001px] border-4 bg-white"
         autoComplete="off"
@@ -1,16 +1,10 @@
 // Hooks
 import { useState } from "react";
-import {
-  useEmployeeFile,
-  useUpdateEmployeeFile,
-} from "../../hooks/useEmployee";
+import { useEmployeeDocument } from "../../hooks/useEmployee";
 
 // Context
 import { useStatus } from "../../context/StatusContext";
 
-// Utils
-import { convertToBase64 } from "../../utils/fileHandler";
-
 // Types
 import { EmployeeData } from "../../types/employee";
 
@@ -36,33 +30,17 @@ const FileModal = ({
 }: FileModalProps) => {
   const { setStatus } = useStatus();
   const [selectedFile, setSelectedFile] = useState<File | null>(null);
-  const { mutateAsync: uploadFile, isPending: isUploading } = useEmployeeFile();
-  const { mutateAsync: updateFile, isPending: isUpdating } =
-    useUpdateEmployeeFile();
+  const { mutateAsync: uploadDocument, isPending } = useEmployeeDocument();
 
   const handleFileOperation = async () => {
     if (selectedFile) {
       try {
-        const base64 = await convertToBase64(selectedFile);
-        const payload = {
-          fileName: selectedFile.name,
-          fileType: selectedFile.type,
-          fileContent: base64,
-        };
-
-        const response =
-          mode === "add"
-            ? await uploadFile({
-                file_type: fileType,
-                payload,
-                employee,
-              })
-            : await updateFile({
-                file_id: fileId,
-                file_type: fileType,
-                payload,
-                employee,
-              });
+        const response = await uploadDocument({
+          file: selectedFile,
+          file_type: fileType,
+          employee,
+          file_id: mode === "update" ? fileId : undefined,
+        });
 
         resetDropdown();
         toggleModal();
@@ -82,7 +60,6 @@ const FileModal = ({
     }
   };
 
-  const isPending = isUploading || isUpdating;
   if (isPending) return <Loading loading={isPending} />;
 
   return (
@@ -4,6 +4,10 @@ import axiosInstance from "../instance";
 
 // Types
 import { FileUploadPayload, FileResponse } from "../types/employee";
+import {
+  RESUMABLE_UPLOAD_THRESHOLD,
+  uploadResumable,
+} from "../api/uploadSession";
 
 interface PaginatedEmployeesData {
   results: EmployeeData[];
@@ -149,6 +153,71 @@ export const useEmployeeFile = () => {
   });
 };
 
+// Uploads or replaces a document as multipart/form-data, so large scans are
+// streamed instead of being sent as base64 JSON. Very large files use a
+// resumable upload session so a dropped connection does not restart them.
+export const useEmployeeDocument = () => {
+  const queryClient = useQueryClient();
+
+  return useMutation({
+    mutationFn: async ({
+      file,
+      file_type,
+      employee,
+      file_id,
+    }: {
+      file: File;
+      file_type: string;
+      employee: EmployeeData;
+      file_id?: string;
+    }) => {
+      if (file.size > RESUMABLE_UPLOAD_THRESHOLD) {
+        return uploadResumable(file, {
+          employee_id: employee.employee_id,
+          file_type,
+          ...(file_id && { file_id }),
+        });
+      }
+
+      const formData = new FormData();
+      formData.append("file", file);
+      formData.append("file_type", file_type);
+      formData.append("employee_id", employee.employee_id);
+      if (file_id) formData.append("file_id", file_id);
+
+      const response = await axiosInstance.request<FileResponse>({
+        url: "/employee/files/",
+        method: file_id ? "PUT" : "POST",
+        data: formData,
+      });
+      return response.data;
+    },
+    onSuccess: (newData, variables) => {
+      // Update the employee detail cache
+      queryClient.setQueryData(
+        ["employee", variables.employee.employee_id],
+        (oldData: EmployeeData | undefined) => {
+          if (!oldData) return oldData;
+
+          return {
+            ...oldData,
+            files: variables.file_id
+              ? oldData.files.map((file) =>
+                  file.file_id === variables.file_id
+                    ? newData.employee_file
+                    : file,
+                )
+              : [...oldData.files, newData.employee_file],
+          };
+        },
+      );
+
+      // Invalidate employees list queries
+      queryClient.invalidateQueries({ queryKey: ["employees"] });
+    },
+  });
+};
+
 // Update the useDeleteEmployeeFile hook
 export const useDeleteEmployeeFile = () => {
   const queryClient = useQueryClient();
@@ -20,6 +20,32 @@ export type EmployeeFile = {
   name: string;
   file_id: string;
   file_type: string;
+  updated_at?: string | null;
+  // Signed, short-lived: opens the file's thumbnail or content without a login
+  token?: string;
+};
+
+export type ThumbnailSize = "avatar" | "detail" | "print";
+
+export type PdsJobStatus =
+  | "queued"
+  | "running"
+  | "succeeded"
+  | "failed"
+  | "superseded";
+
+export type PdsJob = {
+  job_id: number;
+  employee_id: string;
+  status: PdsJobStatus;
+  stage: string;
+  progress: number;
+  attempts: number;
+  error: string;
+  pds_link: string | null;
+  created_at: string;
+  updated_at: string;
+  finished_at: string | null;
 };
 
 export type EmployeeData = {
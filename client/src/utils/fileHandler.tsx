@@ -1,4 +1,5 @@
-import { EmployeeFile } from "../types/employee";
+import axiosInstance from "../instance";
+import { EmployeeFile, ThumbnailSize } from "../types/employee";
 
 export const convertToBase64 = (file: File): Promise<string> => {
   return new Promise((resolve, reject) => {
@@ -9,11 +10,20 @@ export const convertToBase64 = (file: File): Promise<string> => {
   });
 };
 
-export const getProfile = (files: EmployeeFile[]) => {
+export const getProfile = (
+  files: EmployeeFile[],
+  size: ThumbnailSize = "detail",
+) => {
   const profile = files.find((file) => file.file_type === "profile");
 
   if (profile) {
-    return `https://drive.google.com/thumbnail?id=${profile.file_id}`;
+    const params = new URLSearchParams();
+    // The version lets the browser cache each photo for good
+    if (profile.updated_at) params.set("v", profile.updated_at);
+    // <img> tags send no Authorization header, the token stands in for it
+    if (profile.token) params.set("token", profile.token);
+    const query = params.toString();
+    return `${axiosInstance.defaults.baseURL}employee/files/${profile.file_id}/thumbnail/${size}/${query ? `?${query}` : ""}`;
   }
 
   return null;
@@ -0,0 +1,132 @@
+"""
+Time the Drive helpers against the fake Drive server with injected latency.
+
+Starts `benchmarks.fake_drive` in-process, points drive_services at it and
+compares the ways documents reach Drive: uploads one after another versus
+on a thread pool, and sharing files one permission call at a time versus
+in batch requests. With injected quota errors it shows what the retries
+cost. Runs offline:
+
+    python -m benchmarks.drive_calls
+    python -m benchmarks.drive_calls --latency 0.25 --documents 24 --workers 8
+    python -m benchmarks.drive_calls --quota-rate 0.1 --max-qps 20
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+
+from benchmarks.fake_drive import Faults, start_server
+
+
+def timed(label, function):
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:34} {elapsed * 1000:9.1f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency", type=float, default=0.1, help="Seconds")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Seconds")
+    parser.add_argument("--documents", type=int, default=12)
+    parser.add_argument("--size", type=int, default=512 * 1024, help="Bytes")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument(
+        "--max-qps",
+        type=float,
+        default=0,
+        help="Client-side request rate limit (default: unlimited)",
+    )
+    parser.add_argument(
+        "--quota-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of requests the fake answers with 403 userRateLimitExceeded",
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of requests the fake answers with 500/503",
+    )
+    options = parser.parse_args()
+
+    server, drive, url = start_server(
+        faults=Faults(
+            latency=options.latency,
+            jitter=options.jitter,
+            quota_rate=options.quota_rate,
+            error_rate=options.error_rate,
+            seed=1,
+        )
+    )
+    if not settings.configured:
+        settings.configure(
+            GOOGLE_DRIVE_API_URL=url,
+            GOOGLE_DRIVE_CREDENTIALS=None,
+            GOOGLE_DRIVE_UPLOAD_CHUNK_SIZE=5 * 1024 * 1024,
+            GOOGLE_DRIVE_INHERIT_FOLDER_PERMISSIONS=False,
+            GOOGLE_DRIVE_MAX_REQUESTS_PER_SECOND=options.max_qps,
+            GOOGLE_DRIVE_MAX_RETRIES=6,
+            DRIVE_FOLDER_CACHE_TTL=300,
+            CACHES={
+                "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+            },
+        )
+
+    from services import drive_services
+
+    content = os.urandom(options.size)
+    folder_id = drive_services.create_folder("BENCHMARK", "root", share=False)
+
+    def upload(index):
+        return drive_services.upload_to_drive(
+            BytesIO(content), f"DOCUMENT {index}", folder_id, share=False
+        )["id"]
+
+    print(
+        f"{options.documents} documents of {options.size:,} bytes, "
+        f"{options.latency * 1000:.0f} ms latency per request"
+    )
+
+    serial = timed(
+        "upload serially",
+        lambda: [upload(index) for index in range(options.documents)],
+    )
+    with ThreadPoolExecutor(max_workers=options.workers) as pool:
+        timed(
+            f"upload on {options.workers} threads",
+            lambda: list(pool.map(upload, range(options.documents))),
+        )
+
+    timed(
+        "share one call per file",
+        lambda: [drive_services.set_file_permissions(file_id) for file_id in serial],
+    )
+    timed(
+        "share in a batch request", lambda: drive_services.set_permissions_batch(serial)
+    )
+
+    drive_services.invalidate_folder(folder_id)
+    timed("list folder", lambda: drive_services.get_file_to_folder(folder_id))
+    timed("list folder (cached)", lambda: drive_services.get_file_to_folder(folder_id))
+
+    drive_stats = drive_services.get_drive_stats()
+    print(
+        f"{drive.request_count} requests served, {drive_stats['retries']} retried, "
+        f"{drive_stats['failures']} failed, "
+        f"{drive_stats['throttled_seconds']:.1f} s throttled, "
+        f"{drive_stats['backoff_seconds']:.1f} s backing off"
+    )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,607 @@
+"""
+A local stand-in for the Google Drive v3 API, for offline runs and benchmarks.
+
+Implements the parts of Drive this project uses: files create/get/list/
+update/delete (with simple, multipart and resumable media uploads and ranged
+downloads), permissions, changes and batch requests. Everything is kept in
+memory. Latency, server errors and 403 quota errors can be injected to see
+how the code behaves against a slow or overloaded Drive:
+
+    python -m benchmarks.fake_drive --port 8765 --latency 0.15 --quota-rate 0.02
+
+Point the app at it with `api_url` in configurations.cnf (no credentials are
+needed when it is set):
+
+    [google_drive]
+    api_url = http://127.0.0.1:8765/
+    parent_folder_id = root
+"""
+
+import argparse
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from email.parser import BytesParser
+from email.policy import HTTP
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+FOLDER_MIMETYPE = "application/vnd.google-apps.folder"
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+FILES_PATH = re.compile(r"^/(?:upload/)?drive/v3/files(?:/(?P<file_id>[^/]+))?$")
+PERMISSIONS_PATH = re.compile(
+    r"^/drive/v3/files/(?P<file_id>[^/]+)/permissions(?:/(?P<permission_id>[^/]+))?$"
+)
+QUERY_TERM = re.compile(
+    r"'(?P<parent>[^']+)' in parents"
+    r"|trashed\s*=\s*(?P<trashed>true|false)"
+    r"|(?P<field>name|mimeType)\s*=\s*'(?P<value>[^']*)'"
+)
+
+
+class DriveError(Exception):
+    def __init__(
+        self, status, message, reason="notFound", domain="global", headers=None
+    ):
+        super().__init__(message)
+        self.status = status
+        self.reason = reason
+        self.domain = domain
+        self.headers = headers or {}
+
+    def body(self):
+        return {
+            "error": {
+                "errors": [
+                    {"domain": self.domain, "reason": self.reason, "message": str(self)}
+                ],
+                "code": self.status,
+                "message": str(self),
+            }
+        }
+
+
+class Faults:
+    """
+    Injected misbehaviour.
+
+    Latency is added once per HTTP request (a batch costs one round trip);
+    errors are drawn for every request and every batch sub-request.
+
+    Args:
+        latency: Seconds added to every response
+        jitter: Up to this many extra seconds, uniformly random
+        error_rate: Fraction of requests answered with 500/503
+        quota_rate: Fraction of requests answered with 403 userRateLimitExceeded
+        max_qps: Requests per second above which 403 rateLimitExceeded is returned
+        retry_after: Seconds sent as Retry-After with quota errors, if any
+        seed: Seed for the random draws, for repeatable runs
+    """
+
+    def __init__(
+        self,
+        latency=0.0,
+        jitter=0.0,
+        error_rate=0.0,
+        quota_rate=0.0,
+        max_qps=0,
+        retry_after=None,
+        seed=None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.quota_rate = quota_rate
+        self.max_qps = max_qps
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.recent = deque()
+        self.lock = threading.Lock()
+
+    def delay(self):
+        with self.lock:
+            extra = self.random.uniform(0, self.jitter) if self.jitter else 0
+        if self.latency or extra:
+            time.sleep(self.latency + extra)
+
+    def quota_error(self, message, reason):
+        headers = {}
+        if self.retry_after is not None:
+            headers["Retry-After"] = str(self.retry_after)
+        return DriveError(403, message, reason, "usageLimits", headers)
+
+    def check(self):
+        """Raise the DriveError to answer with, if this request should fail."""
+        with self.lock:
+            if self.max_qps:
+                now = time.monotonic()
+                while self.recent and now - self.recent[0] > 1:
+                    self.recent.popleft()
+                if len(self.recent) >= self.max_qps:
+                    raise self.quota_error("Rate Limit Exceeded", "rateLimitExceeded")
+                self.recent.append(now)
+
+            draw = self.random.random()
+        if draw < self.quota_rate:
+            raise self.quota_error("User Rate Limit Exceeded", "userRateLimitExceeded")
+        if draw < self.quota_rate + self.error_rate:
+            if draw < self.quota_rate + self.error_rate / 2:
+                raise DriveError(500, "Internal Error", "internalError")
+            raise DriveError(503, "Service Unavailable", "backendError")
+
+
+class FakeDrive:
+    """In-memory Drive state and the API operations on it."""
+
+    def __init__(self, faults=None):
+        self.faults = faults or Faults()
+        self.files = {"root": self.new_file("root", "My Drive", FOLDER_MIMETYPE, [])}
+        self.permissions = {}
+        self.uploads = {}
+        self.changes = []
+        self.ids = itertools.count(1)
+        self.lock = threading.RLock()
+        self.request_count = 0
+
+    def new_file(self, file_id, name, mimetype, parents, content=b""):
+        return {
+            "kind": "drive#file",
+            "id": file_id,
+            "name": name,
+            "mimeType": mimetype,
+            "parents": parents,
+            "trashed": False,
+            "size": str(len(content)),
+            "modifiedTime": now(),
+            "lastModifyingUser": {"me": True},
+            "content": content,
+        }
+
+    def record_change(self, file_id, removed=False):
+        self.changes.append(
+            {
+                "kind": "drive#change",
+                "fileId": file_id,
+                "removed": removed,
+                "time": now(),
+                **({} if removed else {"file": public(self.files[file_id])}),
+            }
+        )
+
+    def get(self, file_id):
+        file = self.files.get(file_id)
+        if file is None:
+            raise DriveError(404, f"File not found: {file_id}.")
+        return file
+
+    def create(self, metadata, content=None):
+        with self.lock:
+            file_id = f"fake{next(self.ids):08d}{uuid.uuid4().hex[:8]}"
+            self.files[file_id] = self.new_file(
+                file_id,
+                metadata.get("name", "Untitled"),
+                metadata.get("mimeType") or "application/octet-stream",
+                metadata.get("parents") or ["root"],
+                content or b"",
+            )
+            self.record_change(file_id)
+            return public(self.files[file_id])
+
+    def update(self, file_id, metadata, content=None, query=None):
+        with self.lock:
+            file = self.get(file_id)
+            for key in ("name", "mimeType", "trashed"):
+                if key in metadata:
+                    file[key] = metadata[key]
+            if query and query.get("addParents"):
+                file["parents"] = [
+                    parent
+                    for parent in file["parents"]
+                    if parent not in query.get("removeParents", "").split(",")
+                ] + query["addParents"].split(",")
+            if content is not None:
+                file["content"] = content
+                file["size"] = str(len(content))
+            file["modifiedTime"] = now()
+            self.record_change(file_id)
+            return public(file)
+
+    def delete(self, file_id):
+        with self.lock:
+            self.get(file_id)
+            del self.files[file_id]
+            self.permissions.pop(file_id, None)
+            self.record_change(file_id, removed=True)
+
+    def list(self, query):
+        terms = query.get("q", "")
+        page_size = min(int(query.get("pageSize", DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+        start = int(query.get("pageToken") or 0)
+
+        with self.lock:
+            matches = [
+                public(file)
+                for file_id, file in self.files.items()
+                if file_id != "root" and matches_query(file, terms)
+            ]
+
+        page = matches[start : start + page_size]
+        result = {"kind": "drive#fileList", "files": page}
+        if start + page_size < len(matches):
+            result["nextPageToken"] = str(start + page_size)
+        return result
+
+    def add_permission(self, file_id, body):
+        with self.lock:
+            self.get(file_id)
+            permission = {"kind": "drive#permission", "id": uuid.uuid4().hex, **body}
+            self.permissions.setdefault(file_id, {})[permission["id"]] = permission
+            return permission
+
+    def delete_permission(self, file_id, permission_id):
+        with self.lock:
+            if permission_id not in self.permissions.get(file_id, {}):
+                raise DriveError(404, f"Permission not found: {permission_id}.")
+            del self.permissions[file_id][permission_id]
+
+    def list_changes(self, query):
+        start = int(query.get("pageToken", 1)) - 1
+        page_size = min(int(query.get("pageSize", DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+        with self.lock:
+            page = self.changes[start : start + page_size]
+            end = start + len(page)
+            result = {"kind": "drive#changeList", "changes": page}
+            if end < len(self.changes):
+                result["nextPageToken"] = str(end + 1)
+            else:
+                result["newStartPageToken"] = str(end + 1)
+        return result
+
+    def dispatch(self, method, url, headers, body):
+        """
+        Answer one API request.
+
+        Returns:
+            tuple: (status, response headers, response body bytes)
+        """
+        self.request_count += 1
+        parts = urlsplit(url)
+        path = parts.path
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+
+        try:
+            self.faults.check()
+            if path.startswith("/upload/"):
+                return self.dispatch_upload(method, path, query, headers, body)
+            return self.dispatch_api(method, path, query, headers, body)
+        except DriveError as e:
+            return e.status, e.headers, json.dumps(e.body()).encode()
+
+    def dispatch_api(self, method, path, query, headers, body):
+        if path == "/drive/v3/changes/startPageToken" and method == "GET":
+            return ok({"startPageToken": str(len(self.changes) + 1)})
+        if path == "/drive/v3/changes" and method == "GET":
+            return ok(self.list_changes(query))
+
+        match = PERMISSIONS_PATH.match(path)
+        if match:
+            file_id, permission_id = match.group("file_id", "permission_id")
+            if method == "POST":
+                return ok(self.add_permission(file_id, load_json(body)))
+            if method == "DELETE" and permission_id:
+                self.delete_permission(file_id, permission_id)
+                return HTTPStatus.NO_CONTENT, {}, b""
+            raise DriveError(405, "Method not allowed", "methodNotAllowed")
+
+        match = FILES_PATH.match(path)
+        if not match:
+            raise DriveError(404, f"Unknown path: {path}", "notFound")
+
+        file_id = match.group("file_id")
+        if file_id is None:
+            if method == "GET":
+                return ok(self.list(query))
+            if method == "POST":
+                return ok(self.create(load_json(body)))
+        elif method == "GET":
+            with self.lock:
+                file = self.get(file_id)
+                content = file["content"]
+                resource = public(file)
+            if query.get("alt") == "media":
+                return media_response(content, resource["mimeType"], headers)
+            return ok(resource)
+        elif method == "PATCH":
+            return ok(self.update(file_id, load_json(body), query=query))
+        elif method == "DELETE":
+            self.delete(file_id)
+            return HTTPStatus.NO_CONTENT, {}, b""
+
+        raise DriveError(405, "Method not allowed", "methodNotAllowed")
+
+    def dispatch_upload(self, method, path, query, headers, body):
+        match = FILES_PATH.match(path)
+        if not match:
+            raise DriveError(404, f"Unknown path: {path}", "notFound")
+        file_id = match.group("file_id")
+        upload_type = query.get("uploadType", "media")
+
+        if upload_type == "resumable":
+            if "upload_id" in query:
+                return self.resumable_chunk(query["upload_id"], headers, body)
+
+            upload_id = uuid.uuid4().hex
+            metadata = load_json(body)
+            if "X-Upload-Content-Type" in headers:
+                metadata.setdefault("mimeType", headers["X-Upload-Content-Type"])
+            self.uploads[upload_id] = {
+                "file_id": file_id,
+                "metadata": metadata,
+                "query": query,
+                "data": bytearray(),
+            }
+            host = headers.get("Host", "127.0.0.1")
+            location = f"http://{host}{path}?uploadType=resumable&upload_id={upload_id}"
+            return HTTPStatus.OK, {"Location": location}, b""
+
+        if upload_type == "multipart":
+            metadata, content = split_multipart_related(headers, body)
+        else:
+            metadata, content = {"mimeType": headers.get("Content-Type")}, body
+
+        if file_id:
+            return ok(self.update(file_id, metadata, content, query))
+        return ok(self.create(metadata, content))
+
+    def resumable_chunk(self, upload_id, headers, body):
+        upload = self.uploads.get(upload_id)
+        if upload is None:
+            raise DriveError(404, "Upload session not found", "notFound")
+
+        content_range = headers.get("Content-Range", "")
+        match = re.match(r"bytes (?:(\d+)-(\d+)|\*)/(\d+|\*)", content_range)
+        total = match.group(3) if match else str(len(body))
+        if match and match.group(1) is not None:
+            start = int(match.group(1))
+            if start != len(upload["data"]):
+                raise DriveError(400, "Chunk out of order", "badRequest")
+            upload["data"].extend(body)
+        elif not match:
+            upload["data"].extend(body)
+
+        received = len(upload["data"])
+        if total == "*" or received < int(total):
+            response_headers = {}
+            if received:
+                response_headers["Range"] = f"bytes=0-{received - 1}"
+            return 308, response_headers, b""
+
+        del self.uploads[upload_id]
+        content = bytes(upload["data"])
+        if upload["file_id"]:
+            return ok(
+                self.update(
+                    upload["file_id"], upload["metadata"], content, upload["query"]
+                )
+            )
+        return ok(self.create(upload["metadata"], content))
+
+    def dispatch_batch(self, headers, body):
+        """Answer a multipart/mixed batch with one part per sub-request."""
+        boundary = "batch_" + uuid.uuid4().hex
+        parts = []
+        for content_id, request in split_batch(headers, body):
+            method, url, sub_headers, sub_body = request
+            status, response_headers, response_body = self.dispatch(
+                method, url, sub_headers, sub_body
+            )
+            status = HTTPStatus(status)
+            lines = [f"HTTP/1.1 {int(status)} {status.phrase}"]
+            lines.append("Content-Type: application/json; charset=UTF-8")
+            lines += [f"{key}: {value}" for key, value in response_headers.items()]
+            parts.append(
+                (
+                    f"--{boundary}\r\n"
+                    "Content-Type: application/http\r\n"
+                    f"Content-ID: <response-{content_id}>\r\n\r\n"
+                    + "\r\n".join(lines)
+                    + "\r\n\r\n"
+                ).encode()
+                + response_body
+                + b"\r\n"
+            )
+        parts.append(f"--{boundary}--\r\n".encode())
+        return (
+            HTTPStatus.OK,
+            {"Content-Type": f"multipart/mixed; boundary={boundary}"},
+            b"".join(parts),
+        )
+
+
+def now():
+    return (
+        datetime.now(timezone.utc)
+        .isoformat(timespec="milliseconds")
+        .replace("+00:00", "Z")
+    )
+
+
+def public(file):
+    """A file resource as the API returns it."""
+    return {key: value for key, value in file.items() if key != "content"}
+
+
+def ok(resource):
+    return HTTPStatus.OK, {}, json.dumps(resource).encode()
+
+
+def load_json(body):
+    if not body:
+        return {}
+    try:
+        return json.loads(body)
+    except ValueError:
+        raise DriveError(400, "Invalid JSON body", "parseError")
+
+
+def matches_query(file, terms):
+    for match in QUERY_TERM.finditer(terms):
+        if match.group("parent") and match.group("parent") not in file["parents"]:
+            return False
+        if match.group("trashed") and file["trashed"] != (
+            match.group("trashed") == "true"
+        ):
+            return False
+        if match.group("field") and file[match.group("field")] != match.group("value"):
+            return False
+    return True
+
+
+def media_response(content, mimetype, headers):
+    """The file content, honouring a `Range: bytes=a-b` header."""
+    match = re.match(r"bytes=(\d+)-(\d*)", headers.get("Range", ""))
+    if not match:
+        return HTTPStatus.OK, {"Content-Type": mimetype}, content
+
+    start = int(match.group(1))
+    end = min(int(match.group(2) or len(content) - 1), len(content) - 1)
+    if start >= len(content) and content:
+        raise DriveError(416, "Requested range not satisfiable", "badRange")
+    return (
+        HTTPStatus.PARTIAL_CONTENT,
+        {
+            "Content-Type": mimetype,
+            "Content-Range": f"bytes {start}-{end}/{len(content)}",
+        },
+        content[start : end + 1],
+    )
+
+
+def parse_mime(headers, body):
+    content_type = headers.get("Content-Type", "")
+    return BytesParser(policy=HTTP).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode() + body
+    )
+
+
+def split_multipart_related(headers, body):
+    """(metadata, content) of a multipart/related media upload."""
+    parts = list(parse_mime(headers, body).iter_parts())
+    if len(parts) != 2:
+        raise DriveError(400, "Expected metadata and media parts", "badRequest")
+    metadata = load_json(parts[0].get_payload(decode=True))
+    metadata.setdefault("mimeType", parts[1].get_content_type())
+    return metadata, parts[1].get_payload(decode=True)
+
+
+def split_batch(headers, body):
+    """Yield (Content-ID, (method, url, headers, body)) for every batch part."""
+    for part in parse_mime(headers, body).iter_parts():
+        content_id = part.get("Content-ID", "").strip("<>")
+        payload = part.get_payload(decode=True)
+        head, _, sub_body = payload.partition(b"\r\n\r\n")
+        if not _:
+            head, _, sub_body = payload.partition(b"\n\n")
+        lines = head.decode().splitlines()
+        method, url, _ = lines[0].split(" ", 2)
+        sub_headers = {}
+        for line in lines[1:]:
+            key, _, value = line.partition(":")
+            sub_headers[key.strip().title()] = value.strip()
+        yield content_id, (method, url, sub_headers, sub_body)
+
+
+class FakeDriveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    drive = None
+    quiet = True
+
+    def handle_request(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        headers = {key.title(): value for key, value in self.headers.items()}
+
+        self.drive.faults.delay()
+        if urlsplit(self.path).path == "/batch/drive/v3":
+            status, response_headers, response_body = self.drive.dispatch_batch(
+                headers, body
+            )
+        else:
+            status, response_headers, response_body = self.drive.dispatch(
+                self.command, self.path, headers, body
+            )
+
+        self.send_response(int(status))
+        response_headers.setdefault("Content-Type", "application/json; charset=UTF-8")
+        for key, value in response_headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(response_body)))
+        self.end_headers()
+        self.wfile.write(response_body)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = handle_request
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+
+def start_server(host="127.0.0.1", port=0, faults=None, quiet=True):
+    """
+    Serve a fresh FakeDrive on a background thread.
+
+    Returns:
+        tuple: (server, FakeDrive, root URL to use as `api_url`)
+    """
+    drive = FakeDrive(faults)
+    handler = type("Handler", (FakeDriveHandler,), {"drive": drive, "quiet": quiet})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, drive, f"http://{host}:{server.server_address[1]}/"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--quota-rate", type=float, default=0.0)
+    parser.add_argument("--max-qps", type=int, default=0)
+    parser.add_argument("--retry-after", type=float, help="Seconds, on quota errors")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    options = parser.parse_args()
+
+    faults = Faults(
+        latency=options.latency,
+        jitter=options.jitter,
+        error_rate=options.error_rate,
+        quota_rate=options.quota_rate,
+        max_qps=options.max_qps,
+        retry_after=options.retry_after,
+        seed=options.seed,
+    )
+    server, _, url = start_server(
+        options.host, options.port, faults, quiet=not options.verbose
+    )
+    print(f"Fake Drive API listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
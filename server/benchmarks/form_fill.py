@@ -0,0 +1,102 @@
+"""
+Compare the legacy pages x fields fill loop with the compiled FormFillPlan.
+
+Runs offline against the bundled templates (no Django, Drive or MySQL):
+
+    python -m benchmarks.form_fill
+    python -m benchmarks.form_fill --template service_record --repeat 10
+"""
+
+import argparse
+import logging
+import time
+from io import BytesIO
+
+from utils.form_filler import FormFillPlan
+from utils.pdf_templates import get_template
+
+
+def populated_values(template):
+    """Give every field in the template a value, checking every checkbox."""
+    values = {}
+    for name, spec in template.fields.items():
+        if spec.field_type == "/Btn":
+            values[name] = name.upper()
+        else:
+            values[name] = f"SAMPLE {name}".upper()
+    return values
+
+
+def legacy_fill(template, values, blank):
+    """The fill loop PDSBuilder used before FormFillPlan, kept for reference."""
+    writer = template.clone_writer()
+
+    for page in writer.pages:
+        for field_name, field in template.fields.items():
+            value = values.get(field_name, "")
+            if field.field_type == "/Btn":
+                writer.update_page_form_field_values(
+                    page,
+                    {
+                        field_name: f"/{value.lower() if not isinstance(value, bool) else ''}"
+                    },
+                )
+            else:
+                writer.update_page_form_field_values(
+                    page, {field_name: value if value and len(value) > 0 else blank}
+                )
+
+    output_pdf = BytesIO()
+    writer.write(output_pdf)
+    output_pdf.seek(0)
+    return output_pdf
+
+
+def timed(func, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--template", default="pds")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--legacy-repeat", type=int, default=1)
+    options = parser.parse_args()
+
+    # pypdf warns once per signature field on every legacy pass
+    logging.getLogger("pypdf").setLevel(logging.ERROR)
+
+    template = get_template(options.template)
+    values = populated_values(template)
+    blank = "N/A"
+
+    start = time.perf_counter()
+    plan = FormFillPlan(template)
+    compile_time = time.perf_counter() - start
+
+    legacy_time, legacy_pdf = timed(
+        lambda: legacy_fill(template, values, blank), options.legacy_repeat
+    )
+    plan_time, plan_pdf = timed(lambda: plan.fill(values, blank=blank), options.repeat)
+
+    print(f"template:       {options.template} ({len(template.fields)} fields)")
+    print(f"compile plan:   {compile_time * 1000:9.1f} ms (once per process)")
+    print(
+        f"legacy loop:    {legacy_time * 1000:9.1f} ms "
+        f"({len(legacy_pdf.getvalue()):,} bytes)"
+    )
+    print(
+        f"fill plan:      {plan_time * 1000:9.1f} ms "
+        f"({len(plan_pdf.getvalue()):,} bytes)"
+    )
+    print(f"speedup:        {legacy_time / plan_time:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,384 @@
+"""
+Time every stage of PDS and service record generation on worst-case payloads.
+
+Payloads are synthesized from the templates themselves: every row of work
+experience, voluntary work, learning and development, eligibility, children,
+skills and references is filled with long values and every checkbox is
+ticked. Each stage is timed separately and peak memory of a full run is
+measured with tracemalloc (Python allocations only, so PyMuPDF's native
+buffers are not counted). Runs offline (no Drive, no MySQL):
+
+    python -m benchmarks.pdf_generation
+    python -m benchmarks.pdf_generation --flatten --output after.json
+    python -m benchmarks.pdf_generation --compare before.json
+
+Results are written as JSON (benchmarks/results/ by default) so two runs can
+be compared; `--compare` exits non-zero when a stage regressed by more than
+`--threshold`.
+"""
+
+import argparse
+import copy
+import json
+import logging
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+import fitz
+import pypdf
+from django.conf import settings
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# Template field prefix -> payload section, in the order the client sends them
+SECTIONS = [
+    ("p_", "personal_information"),
+    ("fb_", "family_background"),
+    ("eb_", "educational_background"),
+    ("cse", "civil_service_eligibility"),
+    ("w_", "work_experience"),
+    ("vw_", "voluntary_work"),
+    ("ld_", "learning_development"),
+    ("of_", "other_information"),
+]
+LIST_SECTIONS = {
+    "civil_service_eligibility",
+    "work_experience",
+    "voluntary_work",
+    "learning_development",
+}
+SKILL_FIELDS = {"of_skill", "of_recognition", "of_membership"}
+ROW_FIELD = re.compile(r"^(?P<base>.+)_(?P<row>\d+)$")
+
+SERVICE_RECORD_ROWS = 21
+SERVICE_RECORD_COLUMNS = [
+    "id_from",
+    "id_to",
+    "id_designated",
+    "id_status",
+    "id_salary",
+    "id_assignment",
+    "id_loa",
+]
+
+
+def sample_text(name, length=48):
+    """A long, upper-cased value, as the views upper-case submitted data."""
+    text = f"SAMPLE {name} " * (length // (len(name) + 8) + 1)
+    return text[:length].strip().upper()
+
+
+def synthetic_pds_payload(template):
+    """
+    Build a PDS payload shaped like the client's submission with every field,
+    row and checkbox of the template populated.
+    """
+    payload = {section: {} for _, section in SECTIONS}
+    rows = {section: {} for section in LIST_SECTIONS | {"skills"}}
+
+    for name, spec in template.fields.items():
+        if spec.field_type not in ("/Tx", "/Btn"):
+            continue
+        section = next(
+            (section for prefix, section in SECTIONS if name.startswith(prefix)),
+            None,
+        )
+        if section is None:
+            continue
+
+        value = name.upper() if spec.field_type == "/Btn" else sample_text(name)
+
+        match = ROW_FIELD.match(name)
+        base = match.group("base") if match else name
+        if section == "work_experience" and not match:
+            # w_signature / w_date are single fields sent with other_information
+            payload["other_information"][name] = value
+        elif base in SKILL_FIELDS:
+            row = int(match.group("row"))
+            rows["skills"].setdefault(row, {})[base] = value
+        elif section in LIST_SECTIONS:
+            row = int(match.group("row"))
+            rows[section].setdefault(row, {})[base] = value
+        else:
+            payload[section][name] = value
+
+    for section in LIST_SECTIONS:
+        payload[section] = [rows[section][row] for row in sorted(rows[section])]
+    payload["other_information"]["skills"] = [
+        rows["skills"][row] for row in sorted(rows["skills"])
+    ]
+
+    payload.update(
+        {
+            "employee_id": "BENCH-0001",
+            "employment_status": "PERMANENT",
+            "position": sample_text("position"),
+            "department": sample_text("department"),
+            "first_day_service": "2000-01-01",
+        }
+    )
+    return payload
+
+
+def synthetic_service_record_fields():
+    """Header fields plus all 21 service record rows, as ServiceRecordPDF sends them."""
+    fields = {
+        "employee_id": "BENCH-0001",
+        "surname": "DELA CRUZ-SANTOS",
+        "given_name": "MARIA CRISTINA",
+        "middle_name": "VILLANUEVA",
+        "date_of_birth": "September 30, 1975",
+        "place_of_birth": "CABANATUAN CITY, NUEVA ECIJA",
+    }
+    for row in range(1, SERVICE_RECORD_ROWS + 1):
+        for column in SERVICE_RECORD_COLUMNS:
+            fields[f"{column}_{row}"] = sample_text(column, 24)
+        fields[f"id_from_{row}"] = "January 1, 2000"
+        fields[f"id_to_{row}"] = "December 31, 2024"
+        fields[f"id_salary_{row}"] = "123,456.78"
+    return fields
+
+
+def pds_stages(payload):
+    """The PDSBuilder chain split into named stages."""
+    from employee.helper.pds_builder import PDSBuilder
+
+    state = {}
+    return [
+        ("init", lambda: state.update(builder=PDSBuilder(copy.deepcopy(payload)))),
+        ("update_pds_data", lambda: state["builder"].update_pds_data()),
+        ("destruct_pds_data", lambda: state["builder"].destruct_pds_data()),
+        ("update", lambda: state["builder"].update()),
+        ("create_pds", lambda: state["builder"].create_pds()),
+        ("output", lambda: state.update(size=len(state["builder"].build().getvalue()))),
+    ], state
+
+
+def service_record_stages(fields):
+    """The ServiceRecordPDF fill split into named stages."""
+    from utils.form_filler import get_fill_plan
+
+    state = {}
+    return [
+        (
+            "fill",
+            lambda: state.update(
+                pdf=get_fill_plan("service_record").fill(
+                    fields,
+                    blank="",
+                    fill_missing=False,
+                    flatten=settings.FLATTEN_GENERATED_PDFS,
+                )
+            ),
+        ),
+        ("output", lambda: state.update(size=len(state["pdf"].getvalue()))),
+    ], state
+
+
+def run_stages(make_stages, repeat):
+    """Run the stages `repeat` times, returning per-stage timings and output size."""
+    timings = {}
+    size = 0
+    for _ in range(repeat):
+        stages, state = make_stages()
+        total = 0
+        for name, stage in stages:
+            start = time.perf_counter()
+            stage()
+            elapsed = time.perf_counter() - start
+            timings.setdefault(name, []).append(elapsed)
+            total += elapsed
+        timings.setdefault("total", []).append(total)
+        size = state.get("size", 0)
+    return timings, size
+
+
+def peak_memory(make_stages):
+    """Peak traced allocation of one full run, in bytes."""
+    tracemalloc.start()
+    try:
+        stages, _ = make_stages()
+        for _, stage in stages:
+            stage()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def summarize(samples):
+    return {
+        "min_ms": min(samples) * 1000,
+        "median_ms": statistics.median(samples) * 1000,
+        "mean_ms": statistics.fmean(samples) * 1000,
+    }
+
+
+def benchmark(name, make_stages, repeat, warmup):
+    run_stages(make_stages, warmup)
+    timings, size = run_stages(make_stages, repeat)
+    return {
+        "stages": {stage: summarize(samples) for stage, samples in timings.items()},
+        "output_bytes": size,
+        "peak_memory_bytes": peak_memory(make_stages),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(__file__),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def environment(options):
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "pypdf": pypdf.__version__,
+        "pymupdf": fitz.VersionBind,
+        "repeat": options.repeat,
+        "flatten": settings.FLATTEN_GENERATED_PDFS,
+    }
+
+
+def print_results(results):
+    for name, result in results["benchmarks"].items():
+        print(
+            f"{name}: {result['output_bytes']:,} bytes, "
+            f"peak memory {result['peak_memory_bytes'] / 1024 / 1024:.1f} MiB"
+        )
+        for stage, timing in result["stages"].items():
+            print(
+                f"  {stage:20} min {timing['min_ms']:9.2f} ms"
+                f"   median {timing['median_ms']:9.2f} ms"
+            )
+
+
+def compare(results, baseline, threshold):
+    """Print changes against a baseline run; return the regressions found."""
+    regressions = []
+    print(
+        f"\ncompared with {baseline['environment'].get('git_revision') or 'baseline'}:"
+    )
+
+    for name, result in results["benchmarks"].items():
+        before = baseline["benchmarks"].get(name)
+        if before is None:
+            continue
+
+        metrics = [
+            (
+                f"{stage} median",
+                timing["median_ms"],
+                before["stages"][stage]["median_ms"],
+            )
+            for stage, timing in result["stages"].items()
+            if stage in before["stages"]
+        ]
+        metrics.append(
+            ("peak memory", result["peak_memory_bytes"], before["peak_memory_bytes"])
+        )
+        metrics.append(("output size", result["output_bytes"], before["output_bytes"]))
+
+        for metric, now, then in metrics:
+            change = (now - then) / then if then else 0
+            flag = ""
+            # Sub-millisecond stages are dominated by noise
+            if change > threshold and (not metric.endswith("median") or now >= 1):
+                flag = "  REGRESSION"
+                regressions.append(f"{name} {metric}")
+            print(f"  {name:15} {metric:26} {change:+8.1%}{flag}")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument(
+        "--flatten", action="store_true", help="Benchmark the flattened output mode"
+    )
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/)")
+    parser.add_argument("--compare", help="Baseline result file to compare against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Relative slowdown reported as a regression (default 0.2 = 20%%)",
+    )
+    options = parser.parse_args()
+
+    if not settings.configured:
+        settings.configure(FLATTEN_GENERATED_PDFS=options.flatten)
+
+    logging.getLogger("pypdf").setLevel(logging.ERROR)
+
+    from utils.form_filler import get_fill_plan
+    from utils.pdf_templates import get_template
+
+    # Template parsing and plan compilation are once per process, not per fill
+    pds_payload = synthetic_pds_payload(get_template("pds"))
+    service_record_fields = synthetic_service_record_fields()
+    get_fill_plan("pds")
+    get_fill_plan("service_record")
+
+    results = {
+        "environment": environment(options),
+        "benchmarks": {
+            "pds": benchmark(
+                "pds",
+                lambda: pds_stages(pds_payload),
+                options.repeat,
+                options.warmup,
+            ),
+            "service_record": benchmark(
+                "service_record",
+                lambda: service_record_stages(service_record_fields),
+                options.repeat,
+                options.warmup,
+            ),
+        },
+    }
+    print_results(results)
+
+    output = options.output
+    if output is None:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = (
+            RESULTS_DIR
+            / f"{stamp}-{results['environment']['git_revision'] or 'local'}.json"
+        )
+    with open(output, "w") as file:
+        json.dump(results, file, indent=2)
+    print(f"\nresults written to {output}")
+
+    if options.compare:
+        with open(options.compare) as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, options.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
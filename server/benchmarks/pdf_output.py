@@ -0,0 +1,67 @@
+"""
+Compare the interactive form output with the flattened, compact output.
+
+For each mode this reports the time to produce the PDF, its size and the time
+a viewer takes to open and rasterize every page (MuPDF, as a stand-in for a
+desktop reader). Runs offline against the bundled templates:
+
+    python -m benchmarks.pdf_output
+    python -m benchmarks.pdf_output --template service_record --dpi 150
+"""
+
+import argparse
+import logging
+
+import fitz
+
+from benchmarks.form_fill import populated_values, timed
+from utils.form_filler import get_fill_plan
+from utils.pdf_templates import get_template
+
+
+def render_pages(pdf_bytes, dpi):
+    """Open a PDF and rasterize every page, as a viewer would on first display."""
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        for page in doc:
+            page.get_pixmap(dpi=dpi)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--template", default="pds")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--dpi", type=int, default=96)
+    options = parser.parse_args()
+
+    logging.getLogger("pypdf").setLevel(logging.ERROR)
+
+    template = get_template(options.template)
+    plan = get_fill_plan(options.template)
+    values = populated_values(template)
+
+    results = {}
+    for mode, flatten in (("interactive", False), ("flattened", True)):
+        fill_time, pdf = timed(
+            lambda: plan.fill(values, blank="N/A", flatten=flatten), options.repeat
+        )
+        pdf_bytes = pdf.getvalue()
+        render_time, _ = timed(
+            lambda: render_pages(pdf_bytes, options.dpi), options.repeat
+        )
+        results[mode] = (fill_time, len(pdf_bytes), render_time)
+
+    print(f"template:       {options.template} ({template.page_count} pages)")
+    print(f"{'':15} {'fill':>10} {'size':>12} {'render':>10}")
+    for mode, (fill_time, size, render_time) in results.items():
+        print(
+            f"{mode + ':':15} {fill_time * 1000:7.1f} ms {size:>12,} "
+            f"{render_time * 1000:7.1f} ms"
+        )
+
+    interactive, flattened = results["interactive"], results["flattened"]
+    print(f"size ratio:     {flattened[1] / interactive[1]:9.2f}")
+    print(f"render ratio:   {flattened[2] / interactive[2]:9.2f}")
+
+
+if __name__ == "__main__":
+    main()
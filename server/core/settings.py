@@ -15,6 +15,7 @@ from pathlib import Path
 from datetime import timedelta
 from utils.config_reader import get_config
 from google.oauth2.service_account import Credentials
+from corsheaders.defaults import default_headers
 import json
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -31,6 +32,59 @@ if not os.path.exists(BACKUP_DIR):
     except Exception as e:
         print(f"Warning: Could not create backup directory: {e}")
 
+# Cache of rendered PDFs (e.g. PDS), keyed by a hash of the submitted data
+RENDER_CACHE_DIR = BASE_DIR / "cache" / "renders"
+RENDER_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Documents downloaded from Drive for `employee/files/<file_id>/content/`,
+# kept per file version and evicted least recently used first
+DOWNLOAD_CACHE_DIR = BASE_DIR / "cache" / "downloads"
+DOWNLOAD_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+
+# Signed links to a file's content or thumbnail open without a login (e.g.
+# from an <img> tag or a new tab) for this long after they are issued
+FILE_LINK_MAX_AGE = timedelta(minutes=30)
+
+# Profile photo thumbnails: longest side in pixels per size name, generated
+# once per photo version and kept on disk
+THUMBNAIL_SIZES = {"avatar": 160, "detail": 400, "print": 600}
+THUMBNAIL_CACHE_DIR = BASE_DIR / "cache" / "thumbnails"
+THUMBNAIL_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Shared by every worker process on the host, so invalidating an entry (e.g.
+# a Drive folder listing after an upload) is seen by all of them
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / "cache" / "django",
+        "OPTIONS": {"MAX_ENTRIES": 5000},
+    }
+}
+
+# Seconds a Drive folder listing is served from the cache
+DRIVE_FOLDER_CACHE_TTL = 300
+
+# Upper bound in seconds on how long cached employee statistics are served;
+# saving or deleting an employee drops them right away
+EMPLOYEE_STATISTICS_CACHE_TTL = 3600
+
+# Seconds a Drive file's metadata (and so its version) is served from the cache
+DRIVE_FILE_CACHE_TTL = 60
+
+# Flatten generated forms (PDS, service record) into non-editable, compact PDFs
+pdf_config = get_config("pdf") or {}
+FLATTEN_GENERATED_PDFS = pdf_config.get("flatten", "false").lower() == "true"
+
+# Resumable (tus-style) document uploads: chunks are kept here until the
+# session is finalized into Drive; abandoned sessions expire after the TTL
+UPLOAD_SESSION_DIR = BASE_DIR / "cache" / "uploads"
+UPLOAD_SESSION_TTL = timedelta(hours=24)
+UPLOAD_SESSION_MAX_BYTES = 200 * 1024 * 1024
+
+# Finished PDS jobs (and the form payload they store) are deleted after this,
+# except each employee's last succeeded job, which regenerate_pds renders
+PDS_JOB_RETENTION = timedelta(days=30)
+
 SCOPES = ["https://www.googleapis.com/auth/drive"]
 
 # Get Google Drive credentials from configuration
@@ -54,6 +108,57 @@ if google_drive_config:
     except Exception as e:
         print(f"Error loading Google Drive credentials: {e}")
 
+# Send Drive API requests to another server, e.g. benchmarks.fake_drive
+GOOGLE_DRIVE_API_URL = (google_drive_config or {}).get("api_url")
+
+# Drive requests per second shared by all threads of a process, and how many
+# times a rate-limited or failed request is retried
+GOOGLE_DRIVE_MAX_REQUESTS_PER_SECOND = float(
+    (google_drive_config or {}).get("max_requests_per_second", 10)
+)
+GOOGLE_DRIVE_MAX_RETRIES = int((google_drive_config or {}).get("max_retries", 6))
+
+# Bytes sent per request of a resumable Drive upload (rounded to 256 KiB)
+GOOGLE_DRIVE_UPLOAD_CHUNK_SIZE = int(
+    (google_drive_config or {}).get("upload_chunk_size", 5 * 1024 * 1024)
+)
+
+# Where employee documents are kept: "drive" (Google Drive) or "local" (files
+# under DOCUMENT_STORAGE_ROOT, served by this server)
+storage_config = get_config("storage") or {}
+DOCUMENT_STORAGE_BACKEND = storage_config.get("backend", "drive")
+DOCUMENT_STORAGE_ROOT = Path(storage_config.get("root", BASE_DIR / "storage"))
+DOCUMENT_STORAGE_BASE_URL = storage_config.get("base_url", "http://127.0.0.1:8000")
+
+# Concurrent Drive uploads per batch document upload request
+GOOGLE_DRIVE_UPLOAD_WORKERS = int((google_drive_config or {}).get("upload_workers", 4))
+# Documents accepted in one batch upload request
+BATCH_UPLOAD_MAX_FILES = 30
+
+# Uploads are shrunk before they are stored: profile photos are resized to
+# fit PROFILE_PHOTO_SIZE pixels, scans are downsampled to UPLOAD_SCAN_DPI.
+# The work runs in a pool of worker processes.
+optimization_config = get_config("upload_optimization") or {}
+UPLOAD_OPTIMIZATION_ENABLED = (
+    optimization_config.get("enabled", "true").lower() == "true"
+)
+UPLOAD_OPTIMIZATION_WORKERS = int(optimization_config.get("workers", 2))
+# Seconds to wait for an optimization before the original is stored instead
+UPLOAD_OPTIMIZATION_TIMEOUT = 60
+PROFILE_PHOTO_SIZE = int(optimization_config.get("profile_size", 600))
+UPLOAD_SCAN_DPI = int(optimization_config.get("scan_dpi", 150))
+UPLOAD_JPEG_QUALITY = int(optimization_config.get("jpeg_quality", 80))
+
+# Uploaded documents above this size are spooled to a temporary file on disk
+# instead of being kept in memory
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2621440  # 2.5 MB
+
+# Share only employee folders and let uploaded files inherit "anyone reader"
+# instead of granting it file by file
+GOOGLE_DRIVE_INHERIT_FOLDER_PERMISSIONS = (google_drive_config or {}).get(
+    "inherit_folder_permissions", "false"
+).lower() == "true"
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
@@ -178,6 +283,18 @@ CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",
 ]
 
+# Let the client read download metadata on binary file responses and the
+# offsets of resumable upload sessions
+CORS_EXPOSE_HEADERS = [
+    "Content-Disposition",
+    "ETag",
+    "Location",
+    "Upload-Offset",
+    "Upload-Length",
+    "Upload-Expires",
+]
+CORS_ALLOW_HEADERS = (*default_headers, "upload-offset")
+
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "rest_framework_simplejwt.authentication.JWTAuthentication",
@@ -0,0 +1,107 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import transaction
+
+from services.storage import get_storage
+from utils.upload_optimizer import optimize_upload
+
+from ..models import File, FileType
+
+
+def document_name(file_type, employee):
+    return f"{FileType[file_type].value}_{employee.surname}".upper()
+
+
+def upload_document(uploaded, file_type, employee):
+    """
+    Optimize and upload one document to the employee's folder; runs on a
+    pool thread.
+
+    Returns:
+        tuple: (stored file info, OptimizedUpload)
+    """
+    try:
+        optimized = optimize_upload(uploaded, file_type, uploaded.content_type)
+        file_info = get_storage().put(
+            optimized.file_io,
+            document_name(file_type, employee),
+            employee.folder_id,
+            mimetype=optimized.mimetype,
+        )
+        return file_info, optimized
+    finally:
+        uploaded.close()
+
+
+def upload_documents(employee, documents, max_workers=None):
+    """
+    Upload several documents to an employee's folder concurrently.
+
+    Each Drive upload runs on a bounded thread pool (every thread gets its
+    own Drive client). The File rows of the successful uploads are then
+    created together with a single bulk insert.
+
+    Args:
+        employee: The Employee receiving the documents
+        documents: List of (UploadedFile, file_type) pairs
+        max_workers: Concurrent uploads, GOOGLE_DRIVE_UPLOAD_WORKERS by default
+
+    Returns:
+        list: One result per document, in the order given. Successful items
+        hold `employee_file`, failed items hold `detail`.
+    """
+    workers = max(1, max_workers or settings.GOOGLE_DRIVE_UPLOAD_WORKERS)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(upload_document, uploaded, file_type, employee)
+            for uploaded, file_type in documents
+        ]
+
+    results = []
+    new_files = []
+    for (uploaded, file_type), future in zip(documents, futures):
+        result = {"file_name": uploaded.name, "file_type": file_type}
+        try:
+            file_info, optimized = future.result()
+            if not file_info or "id" not in file_info:
+                raise Exception("Failed to upload file to Google Drive")
+        except Exception as e:
+            result.update(status="failed", detail=str(e))
+        else:
+            result["status"] = "uploaded"
+            new_files.append(
+                (
+                    result,
+                    File(
+                        name=file_info["name"],
+                        file_id=file_info["id"],
+                        uploaded=True,
+                        file_type=file_type,
+                        original_size=optimized.original_size,
+                        stored_size=optimized.size,
+                    ),
+                )
+            )
+        results.append(result)
+
+    if new_files:
+        with transaction.atomic():
+            File.objects.bulk_create([file for _, file in new_files])
+            # MySQL does not return the new primary keys from a bulk insert
+            employee.files.add(
+                *File.objects.filter(
+                    file_id__in=[file.file_id for _, file in new_files]
+                )
+            )
+
+        for result, file in new_files:
+            result["employee_file"] = {
+                "name": file.name,
+                "file_id": file.file_id,
+                "uploaded": file.uploaded,
+                "file_type": file.file_type,
+            }
+
+    return results
@@ -0,0 +1,164 @@
+import hashlib
+import os
+import re
+
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header, parse_etags
+
+from utils.render_cache import get_download_cache
+
+# Only a single "bytes=first-last", "bytes=first-" or "bytes=-suffix" range
+# is served; anything else is answered with the whole file
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+# Bytes read per chunk of a partial response
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def document_etag(file_id, version):
+    digest = hashlib.sha256(f"{file_id}:{version}".encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def etag_matches(if_none_match, etag):
+    """
+    Whether an If-None-Match header lists `etag` (or is "*").
+
+    Tags are compared exactly, except that a weak W/ prefix is ignored, as
+    RFC 9110 requires for If-None-Match.
+    """
+    tags = parse_etags(if_none_match or "")
+    return "*" in tags or etag in {tag.removeprefix("W/") for tag in tags}
+
+
+def parse_range(header, size):
+    """
+    The first and last byte (inclusive) asked for by a Range header.
+
+    Returns None when the whole file should be sent.
+
+    Raises:
+        RangeNotSatisfiable: The range lies entirely past the end of the file
+    """
+    match = RANGE_PATTERN.match((header or "").strip())
+    if not match or match.groups() == ("", ""):
+        return None
+
+    first, last = match.groups()
+    if not first:
+        # The last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise RangeNotSatisfiable
+        return max(0, size - length), size - 1
+
+    start = int(first)
+    if last and int(last) < start:
+        # Invalid, so ignored
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable
+    return start, min(int(last), size - 1) if last else size - 1
+
+
+def iter_range(stream, start, end):
+    """Yield bytes start..end (inclusive) of an open file, then close it."""
+    try:
+        stream.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = stream.read(min(STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        stream.close()
+
+
+def open_document(storage, file_id, metadata):
+    """
+    Open a stored document for reading from this server's disk.
+
+    Remote documents go through the download cache: the first request
+    downloads the file once, later ones read the cached copy until the file
+    changes. Files too big for the cache are downloaded for this request only.
+    """
+    path = storage.local_path(file_id)
+    if path:
+        return open(path, "rb")
+
+    downloads = get_download_cache()
+    if metadata["size"] > downloads.max_bytes:
+        return storage.open_stream(file_id)
+
+    stream = downloads.open(file_id, metadata["version"])
+    if stream is None:
+        stream = downloads.store(
+            file_id,
+            metadata["version"],
+            lambda file_io: storage.download_to(file_id, file_io),
+        )
+    return stream
+
+
+def serve_document(request, storage, file_id):
+    """
+    Respond with a stored document, honouring Range and conditional requests.
+
+    Whole files are returned as a FileResponse so the server can use
+    sendfile (wsgi.file_wrapper); a single byte range is answered with 206.
+
+    Raises:
+        FileNotFoundError: The file does not exist in storage
+    """
+    metadata = storage.metadata(file_id)
+    etag = document_etag(file_id, metadata["version"])
+
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        response = HttpResponse(status=304)
+        response["ETag"] = etag
+        return response
+
+    stream = open_document(storage, file_id, metadata)
+    size = stream.seek(0, os.SEEK_END)
+    stream.seek(0)
+
+    byte_range = None
+    # A Range with a stale If-Range validator gets the whole (new) file
+    if request.headers.get("If-Range", etag) == etag:
+        try:
+            byte_range = parse_range(request.headers.get("Range"), size)
+        except RangeNotSatisfiable:
+            stream.close()
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            response["ETag"] = etag
+            return response
+
+    if byte_range is None:
+        response = FileResponse(
+            stream, content_type=metadata["mimetype"], filename=metadata["name"]
+        )
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            iter_range(stream, start, end),
+            status=206,
+            content_type=metadata["mimetype"],
+        )
+        response["Content-Length"] = str(end - start + 1)
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Disposition"] = content_disposition_header(
+            False, metadata["name"]
+        )
+
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = etag
+    # The same link serves a replaced file, so revalidate (cheaply, by ETag)
+    response["Cache-Control"] = "private, no-cache"
+    return response
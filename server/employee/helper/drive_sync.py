@@ -0,0 +1,225 @@
+from django.db import transaction
+
+from services.drive_services import (
+    get_changes_start_token,
+    invalidate_file,
+    invalidate_folder,
+    list_changes,
+)
+
+from ..models import DriveSyncState, Employee, File, FileType
+
+FOLDER_MIMETYPE = "application/vnd.google-apps.folder"
+
+# Rows fetched per IN (...) query
+QUERY_CHUNK = 1000
+
+EmployeeFiles = Employee.files.through
+
+
+def chunked(items, size=QUERY_CHUNK):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def infer_file_type(name):
+    """File type from a Drive name such as "NBI CLEARANCE_DELA CRUZ"."""
+    prefix = name.split("_", 1)[0].upper()
+    if prefix == "PROFILE":
+        return "profile"
+    for file_type in FileType:
+        if file_type.value.upper() == prefix:
+            return file_type.name
+    return "None"
+
+
+def apply_changes(changes):
+    """
+    Apply Drive changes to File rows and employee file links in bulk.
+
+    Renamed files are renamed, removed or trashed files are deleted, files
+    moved to another employee's folder are re-linked, files moved out of
+    their employee's folder to any other folder are unlinked (their row is
+    kept, so moving them back links them again), and files added to an
+    employee folder by someone other than this app get a File row.
+
+    Returns:
+        dict: Counts per kind of change, plus the employee folders touched
+    """
+    # Only the latest change of each file matters
+    latest = {change["fileId"]: change for change in changes}
+
+    known = {}
+    for file_ids in chunked(latest):
+        for file in File.objects.filter(file_id__in=file_ids):
+            known.setdefault(file.file_id, []).append(file)
+
+    parent_ids = {
+        parent
+        for change in latest.values()
+        for parent in (change.get("file") or {}).get("parents", [])
+    }
+    employee_folders = {}
+    for folder_ids in chunked(parent_ids):
+        employee_folders.update(
+            Employee.objects.filter(folder_id__in=folder_ids).values_list(
+                "folder_id", "id"
+            )
+        )
+
+    known_pks = [file.pk for files in known.values() for file in files]
+    owners = {}
+    for pks in chunked(known_pks):
+        for file_pk, employee_pk in EmployeeFiles.objects.filter(
+            file_id__in=pks
+        ).values_list("file_id", "employee_id"):
+            owners.setdefault(file_pk, set()).add(employee_pk)
+
+    owner_folders = {}
+    for employee_pks in chunked(set().union(*owners.values())):
+        owner_folders.update(
+            Employee.objects.filter(pk__in=employee_pks).values_list("id", "folder_id")
+        )
+
+    renamed, deleted, moved, unlinked, new_files = [], [], {}, [], []
+    touched_employees = set()
+
+    for file_id, change in latest.items():
+        drive_file = change.get("file") or {}
+        if drive_file.get("mimeType") == FOLDER_MIMETYPE:
+            continue
+
+        target = next(
+            (
+                employee_folders[parent]
+                for parent in drive_file.get("parents", [])
+                if parent in employee_folders
+            ),
+            None,
+        )
+
+        if change.get("removed") or drive_file.get("trashed"):
+            for file in known.get(file_id, []):
+                deleted.append(file.pk)
+                touched_employees |= owners.get(file.pk, set())
+            continue
+
+        if file_id not in known:
+            # Files this app uploads get their rows from the upload itself
+            if target and not drive_file.get("lastModifyingUser", {}).get("me"):
+                new_files.append(
+                    (
+                        target,
+                        File(
+                            name=drive_file["name"],
+                            file_id=file_id,
+                            uploaded=True,
+                            file_type=infer_file_type(drive_file["name"]),
+                        ),
+                    )
+                )
+                touched_employees.add(target)
+            continue
+
+        for file in known[file_id]:
+            if drive_file.get("name") and file.name != drive_file["name"]:
+                file.name = drive_file["name"]
+                renamed.append(file)
+                touched_employees |= owners.get(file.pk, set())
+            if target and target not in owners.get(file.pk, set()):
+                moved[file.pk] = target
+                touched_employees |= owners.get(file.pk, set()) | {target}
+            elif (
+                target is None
+                and "parents" in drive_file
+                and file.pk in owners
+                and not any(
+                    owner_folders.get(owner) in drive_file["parents"]
+                    for owner in owners[file.pk]
+                )
+            ):
+                unlinked.append(file.pk)
+                touched_employees |= owners[file.pk]
+
+    if renamed:
+        File.objects.bulk_update(renamed, ["name"], batch_size=QUERY_CHUNK)
+
+    for pks in chunked(deleted):
+        File.objects.filter(pk__in=pks).delete()
+
+    for pks in chunked(list(moved) + unlinked):
+        EmployeeFiles.objects.filter(file_id__in=pks).delete()
+    EmployeeFiles.objects.bulk_create(
+        [
+            EmployeeFiles(employee_id=employee_pk, file_id=file_pk)
+            for file_pk, employee_pk in moved.items()
+        ],
+        batch_size=QUERY_CHUNK,
+    )
+
+    if new_files:
+        File.objects.bulk_create(
+            [file for _, file in new_files], batch_size=QUERY_CHUNK
+        )
+        # MySQL does not return the new primary keys from a bulk insert
+        created = {}
+        for file_ids in chunked(file.file_id for _, file in new_files):
+            created.update(
+                File.objects.filter(file_id__in=file_ids).values_list("file_id", "pk")
+            )
+        EmployeeFiles.objects.bulk_create(
+            [
+                EmployeeFiles(employee_id=employee_pk, file_id=created[file.file_id])
+                for employee_pk, file in new_files
+            ],
+            batch_size=QUERY_CHUNK,
+        )
+
+    folders = set()
+    for employee_pks in chunked(touched_employees):
+        folders.update(
+            Employee.objects.filter(pk__in=employee_pks).values_list(
+                "folder_id", flat=True
+            )
+        )
+
+    return {
+        "changes": len(changes),
+        "renamed": len(renamed),
+        "deleted": len(deleted),
+        "moved": len(moved),
+        "unlinked": len(unlinked),
+        "added": len(new_files),
+        "folders": folders,
+    }
+
+
+def sync_drive_changes(reset=False):
+    """
+    Pull the Drive changes made since the last run and apply them.
+
+    The first run (or `reset=True`) only records the current position in the
+    changes feed. The new position is saved in the same transaction as the
+    applied changes, so a failed run is simply repeated.
+
+    Returns:
+        dict: What `apply_changes` did, or None when only the start was recorded
+    """
+    state = DriveSyncState.objects.filter(name="changes").first()
+    if state is None or reset:
+        DriveSyncState.objects.update_or_create(
+            name="changes", defaults={"page_token": get_changes_start_token()}
+        )
+        return None
+
+    changes, page_token = list_changes(state.page_token)
+
+    with transaction.atomic():
+        stats = apply_changes(changes)
+        state.page_token = page_token
+        state.save()
+
+    invalidate_folder(*stats["folders"])
+    invalidate_file(*{change["fileId"] for change in changes})
+    return stats
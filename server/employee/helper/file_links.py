@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.signing import BadSignature, TimestampSigner
+
+signer = TimestampSigner(salt="employee.file-link")
+
+
+def sign_file_link(file_id):
+    """A token opening `file_id` without a login until FILE_LINK_MAX_AGE passes."""
+    return signer.sign(file_id)
+
+
+def check_file_link(token, file_id):
+    """True when `token` was signed for `file_id` and has not expired."""
+    try:
+        signed_id = signer.unsign(token, max_age=settings.FILE_LINK_MAX_AGE)
+    except BadSignature:
+        return False
+    return signed_id == file_id
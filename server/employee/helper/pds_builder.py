@@ -1,21 +1,19 @@
-import os
+import copy
+import hashlib
+import json
 
-from io import BytesIO
-
-from pypdf import PdfReader, PdfWriter
-from pypdf.generic import NameObject
+from django.conf import settings
 
 from utils.dict_handler import destructure_dict, update_dict_key
+from utils.form_filler import get_fill_plan
+from utils.pdf_templates import get_template
+from utils.render_cache import get_render_cache
 
 
 class PDSBuilder:
     def __init__(self, data: dict):
         self.data = data
         self.pds = None
-        self.base_path = os.path.dirname(os.path.abspath(__file__))
-        self.input_path = os.path.join(
-            self.base_path, "../../static/pdfs/PDS_CS_Form_No_212_Revised2017.pdf"
-        )
 
     def update_pds_data(self):
         update_dict_key(self.data["learning_development"])
@@ -58,46 +56,94 @@ class PDSBuilder:
         return self
 
     def create_pds(self):
-        reader = PdfReader(self.input_path)
-        writer = PdfWriter()
-
-        # Copy pages from reader to writer
-        for page in reader.pages:
-            writer.add_page(page)
-
-        # Copy the /AcroForm dictionary from reader to writer
-        if "/AcroForm" in reader.trailer["/Root"]:
-            writer._root_object.update(
-                {NameObject("/AcroForm"): reader.trailer["/Root"]["/AcroForm"]}
-            )
-
-        fields = reader.get_fields()
-
-        for page_num, page in enumerate(writer.pages):
-            for field_name, field in fields.items():
-                field_type = field.get("/FT")
-                if field_type == "/Btn":  # Checkbox field
-                    value = self.data.get(field_name, "")
-                    writer.update_page_form_field_values(
-                        page,
-                        {
-                            field_name: f"/{value.lower() if not isinstance(value, bool) else ''}"
-                        },
-                    )
-                else:
-                    value = self.data.get(field_name, "")
-                    writer.update_page_form_field_values(
-                        page, {field_name: value if value and len(value) > 0 else "N/A"}
-                    )
-
-        # Save the modified PDF to a BytesIO object
-        output_pdf = BytesIO()
-        writer.write(output_pdf)
-        output_pdf.seek(0)  # Move the cursor to the beginning of the BytesIO object
-
-        self.pds = output_pdf
+        # Fill every field of the compiled template in one pass per page
+        self.pds = get_fill_plan("pds").fill(
+            self.data, blank="N/A", flatten=settings.FLATTEN_GENERATED_PDFS
+        )
 
         return self
 
     def build(self):
         return self.pds
+
+
+def pds_content_hash(data, file_name=""):
+    """
+    Hash everything that ends up in a rendered PDS.
+
+    Covers the submitted data (minus the profile photo, which is not part of
+    the form), the Drive file name and the template itself, so a revised
+    form or a renamed employee never matches an older render.
+    """
+    payload = copy.deepcopy(data)
+    other_information = payload.get("other_information")
+    if isinstance(other_information, dict):
+        other_information.pop("profile", None)
+
+    content = {
+        "template": get_template("pds").digest,
+        "file_name": file_name,
+        "data": payload,
+    }
+    # Only added when enabled so interactive renders keep their existing hashes
+    if settings.FLATTEN_GENERATED_PDFS:
+        content["flatten"] = True
+
+    canonical = json.dumps(
+        content,
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def render_pds(data, content_hash=None):
+    """Build the PDS PDF, reusing a cached render of the same content."""
+    cache = get_render_cache("pds") if content_hash else None
+    if cache:
+        cached = cache.get(content_hash)
+        if cached is not None:
+            return cached
+
+    pds = (
+        PDSBuilder(data)
+        .update_pds_data()
+        .destruct_pds_data()
+        .update()
+        .create_pds()
+        .build()
+    )
+
+    if cache:
+        cache.put(content_hash, pds)
+
+    return pds
+
+
+def pds_file_name(personal_information):
+    """Drive file name of an employee's PDS."""
+    return f"PERSONAL DATA SHEET_{personal_information.get('p_surname', '')}, {personal_information.get('p_first_name', '')}"
+
+
+def init_render_worker():
+    """Process pool initializer: parse the template and compile its plan once."""
+    get_fill_plan("pds")
+
+
+def render_pds_job(employee_id, data):
+    """
+    Render one PDS inside a worker process.
+
+    Returns:
+        tuple: (employee_id, PDF bytes)
+    """
+    pds = (
+        PDSBuilder(data)
+        .update_pds_data()
+        .destruct_pds_data()
+        .update()
+        .create_pds()
+        .build()
+    )
+    return employee_id, pds.getvalue()
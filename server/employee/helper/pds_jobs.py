@@ -0,0 +1,288 @@
+import copy
+from datetime import timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, Max, OuterRef, Q
+from django.utils import timezone
+
+from services.storage import get_storage
+from utils.upload_optimizer import optimize_upload
+
+from ..models import File, PdsJob
+from ..utils.file_handler import file64_to_file
+from .pds_builder import pds_file_name, render_pds
+
+MAX_ATTEMPTS = 3
+# Seconds to wait before the 2nd and 3rd attempt
+RETRY_DELAYS = [30, 300]
+# A running job not finished after this long belongs to a dead worker
+STALE_AFTER = timedelta(minutes=15)
+
+
+def upload_pds(pdf, file_name, folder_id, file_id=None):
+    """Replace the employee's PDS on Drive, or upload it if they have none."""
+    if isinstance(pdf, bytes):
+        pdf = BytesIO(pdf)
+
+    if file_id:
+        # In place, so the file ID and shared link stay the same
+        return get_storage().replace(file_id, pdf, file_name, folder_id=folder_id)
+
+    return get_storage().put(pdf, file_name, folder_id)
+
+
+def enqueue_pds_job(employee, data, content_hash, profile=None):
+    """
+    Queue a PDS render/upload for an employee.
+
+    A job still waiting for the same employee is updated in place, so quick
+    successive saves render and upload only the latest data once.
+    """
+    with transaction.atomic():
+        job = (
+            PdsJob.objects.select_for_update()
+            .filter(employee=employee, status="queued")
+            .order_by("-id")
+            .first()
+        )
+        if job is None:
+            return PdsJob.objects.create(
+                employee=employee,
+                payload=data,
+                content_hash=content_hash,
+                profile=profile or None,
+                stage="Queued",
+            )
+
+        job.payload = data
+        job.content_hash = content_hash
+        if profile:
+            job.profile = profile
+        job.save()
+        return job
+
+
+def newer_jobs():
+    """Jobs of the same employee as the outer job that will upload newer data."""
+    return PdsJob.objects.filter(
+        employee=OuterRef("employee"),
+        id__gt=OuterRef("id"),
+        status__in=["queued", "running", "succeeded"],
+    )
+
+
+def has_pending_job(employee):
+    """True while a job for the employee is waiting or running."""
+    return employee.pds_jobs.filter(status__in=["queued", "running"]).exists()
+
+
+def prune_jobs():
+    """
+    Delete jobs that finished longer than PDS_JOB_RETENTION ago.
+
+    Each employee's last succeeded job is kept, since regenerate_pds renders
+    its payload.
+
+    Returns:
+        int: Number of jobs deleted
+    """
+    cutoff = timezone.now() - settings.PDS_JOB_RETENTION
+    # MySQL cannot delete from a table filtered by a subquery on itself
+    keep = list(
+        PdsJob.objects.filter(status="succeeded")
+        .values("employee")
+        .annotate(last=Max("id"))
+        .values_list("last", flat=True)
+    )
+    deleted, _ = (
+        PdsJob.objects.filter(
+            status__in=["succeeded", "failed", "superseded"], finished_at__lt=cutoff
+        )
+        .exclude(id__in=keep)
+        .delete()
+    )
+    return deleted
+
+
+def claim_next_job():
+    """
+    Lock and mark the next runnable job as running, or return None.
+
+    Jobs of an employee whose job is still running wait for it, so two
+    uploads of their PDS never overlap. Waiting jobs with a newer job for
+    the same employee are superseded instead of run, so a retry that comes
+    due late never uploads older data over a newer PDS.
+    """
+    now = timezone.now()
+    running = PdsJob.objects.filter(
+        status="running", started_at__gte=now - STALE_AFTER
+    ).values("employee")
+    runnable = Q(status="queued") | Q(
+        status="running", started_at__lt=now - STALE_AFTER
+    )
+    with transaction.atomic():
+        # MySQL cannot update a table filtered by a subquery on itself
+        superseded = list(
+            PdsJob.objects.filter(runnable)
+            .filter(Exists(newer_jobs()))
+            .values_list("id", flat=True)
+        )
+        if superseded:
+            PdsJob.objects.filter(id__in=superseded).update(
+                status="superseded", stage="Superseded", finished_at=now
+            )
+
+        job = (
+            PdsJob.objects.select_for_update(skip_locked=True)
+            .filter(runnable, run_after__lte=now)
+            .exclude(employee__in=running)
+            .exclude(Exists(newer_jobs()))
+            .order_by("run_after", "id")
+            .first()
+        )
+        if job is None:
+            return None
+
+        job.status = "running"
+        job.attempts += 1
+        job.started_at = now
+        job.stage = "Starting"
+        job.progress = 0
+        job.save()
+    return job
+
+
+def set_stage(job, stage, progress):
+    job.stage = stage
+    job.progress = progress
+    job.save(update_fields=["stage", "progress", "updated_at"])
+
+
+def run_pds_job(job):
+    """Run a claimed job, recording success, a scheduled retry or failure."""
+    try:
+        job.file_id = process_pds_job(job)
+    except Exception as e:
+        job.error = str(e)
+        if PdsJob.objects.filter(
+            employee=job.employee_id,
+            id__gt=job.id,
+            status__in=["queued", "running", "succeeded"],
+        ).exists():
+            # A newer save is uploaded by its own job, never retry this one
+            job.status = "superseded"
+            job.stage = "Superseded"
+            job.finished_at = timezone.now()
+        elif job.attempts < MAX_ATTEMPTS:
+            delay = RETRY_DELAYS[min(job.attempts, len(RETRY_DELAYS)) - 1]
+            job.status = "queued"
+            job.stage = f"Retrying in {delay}s"
+            job.run_after = timezone.now() + timedelta(seconds=delay)
+        else:
+            job.status = "failed"
+            job.stage = "Failed"
+            job.finished_at = timezone.now()
+        job.save()
+        return job
+
+    job.status = "succeeded"
+    job.stage = "Done"
+    job.progress = 100
+    job.error = ""
+    job.finished_at = timezone.now()
+    job.save()
+    return job
+
+
+def process_pds_job(job):
+    """Create the Drive folder if needed, render and upload the PDS and profile."""
+    employee = job.employee
+    personal_information = job.payload.get("personal_information", {})
+
+    if not employee.folder_id:
+        set_stage(job, "Creating Drive folder", 10)
+        folder_id = get_storage().create_folder(
+            f"{personal_information.get('p_surname', '')}, {personal_information.get('p_first_name', '')}"
+        )
+        if not folder_id:
+            raise Exception("Failed to create folder in Google Drive")
+        employee.folder_id = folder_id
+        employee.save(update_fields=["folder_id"])
+
+    file_name = pds_file_name(personal_information)
+    pds_file = employee.files.filter(file_type__iexact="pds").first()
+
+    # Already uploaded, e.g. by an earlier attempt that failed afterwards
+    if pds_file and pds_file.content_hash == job.content_hash:
+        file_id = pds_file.file_id
+    else:
+        set_stage(job, "Rendering PDS", 30)
+        # PDSBuilder rewrites its input, keep the stored payload intact
+        pds = render_pds(copy.deepcopy(job.payload), job.content_hash)
+
+        set_stage(job, "Uploading PDS", 60)
+        g_file = upload_pds(
+            pds, file_name, employee.folder_id, pds_file.file_id if pds_file else None
+        )
+        if not g_file or "id" not in g_file:
+            raise Exception("Failed to upload PDS file to Google Drive")
+
+        if pds_file:
+            pds_file.file_id = g_file["id"]
+            pds_file.name = g_file["name"]
+            pds_file.content_hash = job.content_hash
+            pds_file.save()
+        else:
+            new_file = File.objects.create(
+                name=g_file["name"],
+                file_id=g_file["id"],
+                uploaded=True,
+                file_type="pds",
+                content_hash=job.content_hash,
+            )
+            employee.files.add(new_file)
+        file_id = g_file["id"]
+
+    if job.profile:
+        set_stage(job, "Uploading profile", 85)
+        upload_profile(job, personal_information)
+
+    return file_id
+
+
+def upload_profile(job, personal_information):
+    """Upload the profile picture sent with a new employee; failures do not fail the job."""
+    employee = job.employee
+    try:
+        file_io = file64_to_file(job.profile)
+        if not isinstance(file_io, BytesIO):
+            raise Exception("Invalid profile image data")
+
+        file_name = f"PROFILE_{personal_information.get('p_surname', '')}, {personal_information.get('p_first_name', '')}"
+        optimized = optimize_upload(file_io, "profile")
+        file_info = get_storage().put(
+            optimized.file_io,
+            file_name,
+            employee.folder_id,
+            mimetype=optimized.mimetype,
+        )
+
+        if file_info and "id" in file_info:
+            profile_file = File.objects.create(
+                name=file_info["name"],
+                file_id=file_info["id"],
+                uploaded=True,
+                file_type="profile",
+                original_size=optimized.original_size,
+                stored_size=optimized.size,
+            )
+            employee.files.add(profile_file)
+    except Exception as e:
+        # Continue even if profile upload fails
+        print(f"Profile upload error: {str(e)}")
+
+    # Uploaded (or given up on) once, never again on a retry
+    job.profile = None
+    job.save(update_fields=["profile", "updated_at"])
@@ -0,0 +1,174 @@
+import operator
+import re
+import unicodedata
+from functools import reduce
+
+from django.db import transaction
+from django.db.models import (
+    Case,
+    F,
+    IntegerField,
+    Max,
+    OuterRef,
+    Q,
+    Subquery,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce
+
+from ..models import Employee, EmployeeSearchToken
+
+# Indexed fields and how much a match on each counts
+SEARCH_FIELDS = {
+    "employee_id": 4,
+    "surname": 3,
+    "first_name": 2,
+    "middle_name": 1,
+}
+
+# Name fields the whole query is also looked for in, anywhere in the value
+SUBSTRING_FIELDS = ["surname", "first_name", "middle_name"]
+
+TOKEN_MAX_LENGTH = 64
+# Words of a search query beyond this are ignored
+MAX_QUERY_TERMS = 8
+# Employees indexed per bulk insert when rebuilding
+REBUILD_BATCH_SIZE = 1000
+
+WORD = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    """Lowercase, accent-free words of a text ("PEÑA-DELA CRUZ" -> pena, dela, cruz)."""
+    text = unicodedata.normalize("NFKD", str(text or ""))
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return [word[:TOKEN_MAX_LENGTH] for word in WORD.findall(text.lower())]
+
+
+def employee_tokens(values):
+    """
+    {token: weight} for an employee's field values.
+
+    Multi-word values are also indexed joined up, so "DELA CRUZ" is found
+    by "delacruz" as well.
+    """
+    tokens = {}
+    for field, weight in SEARCH_FIELDS.items():
+        words = tokenize(values.get(field))
+        if len(words) > 1:
+            words.append("".join(words)[:TOKEN_MAX_LENGTH])
+        for word in words:
+            tokens[word] = max(tokens.get(word, 0), weight)
+    return tokens
+
+
+def build_tokens(employee_id, values):
+    return [
+        EmployeeSearchToken(employee_id=employee_id, token=token, weight=weight)
+        for token, weight in employee_tokens(values).items()
+    ]
+
+
+def index_employee(employee):
+    """Replace an employee's search tokens."""
+    values = {field: getattr(employee, field) for field in SEARCH_FIELDS}
+    with transaction.atomic():
+        EmployeeSearchToken.objects.filter(employee_id=employee.pk).delete()
+        EmployeeSearchToken.objects.bulk_create(build_tokens(employee.pk, values))
+
+
+def rebuild_index(batch_size=REBUILD_BATCH_SIZE):
+    """
+    Rebuild the search tokens of every employee.
+
+    Runs in one transaction, so searches keep using the old index until the
+    new one is complete.
+
+    Returns:
+        tuple: (employees indexed, tokens written)
+    """
+    employees = tokens = 0
+    with transaction.atomic():
+        EmployeeSearchToken.objects.all().delete()
+        batch = []
+        for values in (
+            Employee.objects.values("id", *SEARCH_FIELDS)
+            .order_by("id")
+            .iterator(chunk_size=batch_size)
+        ):
+            batch.extend(build_tokens(values["id"], values))
+            employees += 1
+            if employees % batch_size == 0:
+                EmployeeSearchToken.objects.bulk_create(batch)
+                tokens += len(batch)
+                batch = []
+        EmployeeSearchToken.objects.bulk_create(batch)
+        tokens += len(batch)
+    return employees, tokens
+
+
+def search_employees(employees, query):
+    """
+    Filter employees to those matching every word of `query`, best first.
+
+    Each word matches the start of an indexed token (so "dela cruz ju"
+    finds JUAN DELA CRUZ while typing), using the token index. An employee
+    scores the weight of the best token each word matches, doubled for an
+    exact match; results are ordered by the total (annotated as
+    `search_rank`), then by name.
+
+    Names that only contain the query elsewhere (e.g. "ruz" in DELA CRUZ),
+    which the index cannot find, are still included, as before the index
+    existed, ranked 0 after every token match.
+    """
+    query = str(query or "").strip()
+    terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+    if not query:
+        return employees.none()
+
+    matches = Q()
+    for field in SUBSTRING_FIELDS:
+        matches |= Q(**{f"{field}__icontains": query})
+
+    if not terms:
+        return (
+            employees.filter(matches)
+            .annotate(search_rank=Value(0))
+            .order_by("surname", "first_name", "id")
+        )
+
+    term_scores = {
+        f"term_{index}": Max(
+            Case(
+                When(token=term, then=F("weight") * 2),
+                When(token__startswith=term, then=F("weight")),
+                default=0,
+                output_field=IntegerField(),
+            )
+        )
+        for index, term in enumerate(terms)
+    }
+
+    any_term = Q()
+    for term in terms:
+        any_term |= Q(token__startswith=term)
+
+    scores = (
+        EmployeeSearchToken.objects.filter(any_term)
+        .values("employee_id")
+        .annotate(**term_scores)
+        .filter(**{f"{name}__gt": 0 for name in term_scores})
+        .annotate(rank=reduce(operator.add, [F(name) for name in term_scores]))
+    )
+
+    return (
+        employees.filter(matches | Q(pk__in=scores.values("employee_id")))
+        .annotate(
+            search_rank=Coalesce(
+                Subquery(scores.filter(employee_id=OuterRef("pk")).values("rank")[:1]),
+                0,
+            )
+        )
+        .order_by("-search_rank", "surname", "first_name", "id")
+    )
@@ -0,0 +1,74 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from ..models import Employee
+
+STATISTICS_CACHE_KEY = "employee:statistics"
+
+# Response key of EmployeeCount -> appointment status counted
+STATUS_TOTALS = {
+    "total_permanent": "PERMANENT",
+    "total_casual": "CASUAL",
+    "total_job_order": "JOB ORDER",
+    "total_co_terminus": "CO-TERMINUS",
+    "total_contract_of_service": "CONTRACT OF SERVICE",
+    "total_temporary": "TEMPORARY",
+}
+
+BREAKDOWNS = ("department", "sex", "civil_status")
+
+
+def compute_statistics():
+    """
+    Headcounts of active employees.
+
+    The per-status totals come from one conditional-aggregate query and the
+    department, sex and civil status breakdowns from one grouped query.
+    """
+    active = Employee.objects.filter(is_active=True)
+
+    statistics = active.aggregate(
+        total=Count("id"),
+        **{
+            key: Count("id", filter=Q(appointment_status=appointment_status))
+            for key, appointment_status in STATUS_TOTALS.items()
+        },
+    )
+
+    for field in BREAKDOWNS:
+        statistics[f"by_{field}"] = {}
+    for row in active.values(*BREAKDOWNS).annotate(count=Count("id")).order_by():
+        for field in BREAKDOWNS:
+            counts = statistics[f"by_{field}"]
+            label = row[field] or "NONE"
+            counts[label] = counts.get(label, 0) + row["count"]
+
+    for field in BREAKDOWNS:
+        statistics[f"by_{field}"] = dict(
+            sorted(statistics[f"by_{field}"].items(), key=lambda item: -item[1])
+        )
+    return statistics
+
+
+def get_statistics():
+    """
+    The cached headcounts, computed on a miss.
+
+    Saving or deleting an employee drops the cached copy (see
+    employee.signals); the TTL only bounds staleness from bulk queryset
+    updates, which send no signals.
+    """
+    statistics = cache.get(STATISTICS_CACHE_KEY)
+    if statistics is None:
+        statistics = compute_statistics()
+        cache.set(
+            STATISTICS_CACHE_KEY,
+            statistics,
+            timeout=settings.EMPLOYEE_STATISTICS_CACHE_TTL,
+        )
+    return statistics
+
+
+def invalidate_statistics():
+    cache.delete(STATISTICS_CACHE_KEY)
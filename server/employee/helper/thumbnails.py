@@ -0,0 +1,104 @@
+import os
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+
+from utils.render_cache import get_thumbnail_cache
+from utils.upload_optimizer import get_pool, reset_pool, thumbnail_content
+
+from .downloads import document_etag, etag_matches, open_document
+
+# Artifacts show sooner in small images, so thumbnails are encoded at a
+# higher quality than stored photos
+THUMBNAIL_QUALITY = 85
+
+# Versioned URLs (`?v=...`, changing with the photo) never go stale
+VERSIONED_CACHE_CONTROL = "private, max-age=31536000, immutable"
+UNVERSIONED_CACHE_CONTROL = "private, no-cache"
+
+
+class ThumbnailUnavailable(Exception):
+    """The thumbnail could not be generated right now (timeout, dead worker)."""
+
+
+class UndecodableImage(Exception):
+    """The stored file is not an image that can be thumbnailed."""
+
+
+def open_thumbnail(storage, file_id, size, metadata):
+    """
+    Open the thumbnail of an image, generating it on the first request.
+
+    The source is read through the download cache and resized in the
+    upload optimization process pool; the result is kept per source version.
+    A source that cannot be decoded is remembered as an empty thumbnail, so
+    it is not decoded again on every request.
+
+    Raises:
+        UndecodableImage: The source is not a supported image
+        ThumbnailUnavailable: The resize timed out or its worker died
+    """
+    thumbnails = get_thumbnail_cache()
+    key = f"{file_id}-{size}"
+
+    stream = thumbnails.open(key, metadata["version"])
+    if stream is None:
+        with open_document(storage, file_id, metadata) as source:
+            data = source.read()
+        try:
+            thumbnail = (
+                get_pool()
+                .submit(
+                    thumbnail_content,
+                    data,
+                    settings.THUMBNAIL_SIZES[size],
+                    THUMBNAIL_QUALITY,
+                )
+                .result(timeout=settings.UPLOAD_OPTIMIZATION_TIMEOUT)
+            )
+        except (BrokenProcessPool, FutureTimeoutError) as e:
+            # A timed out resize keeps its worker busy, start a fresh pool
+            reset_pool()
+            raise ThumbnailUnavailable(file_id) from e
+        except Exception:
+            # Raised by MuPDF in the worker
+            thumbnail = b""
+        stream = thumbnails.store(
+            key, metadata["version"], lambda file_io: file_io.write(thumbnail)
+        )
+
+    if stream.seek(0, os.SEEK_END) == 0:
+        stream.close()
+        raise UndecodableImage(file_id)
+    stream.seek(0)
+    return stream
+
+
+def serve_thumbnail(request, storage, file_id, size):
+    """
+    Respond with an image's thumbnail, with a strong ETag (304 when matched).
+
+    Raises:
+        FileNotFoundError: The file does not exist in storage
+        UndecodableImage: The file is not a supported image
+        ThumbnailUnavailable: The thumbnail could not be generated right now
+    """
+    metadata = storage.metadata(file_id)
+    etag = document_etag(f"{file_id}-{size}", metadata["version"])
+    cache_control = (
+        VERSIONED_CACHE_CONTROL if request.GET.get("v") else UNVERSIONED_CACHE_CONTROL
+    )
+
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        response = HttpResponse(status=304)
+    else:
+        response = FileResponse(
+            open_thumbnail(storage, file_id, size, metadata),
+            content_type="image/jpeg",
+        )
+
+    response["ETag"] = etag
+    response["Cache-Control"] = cache_control
+    return response
@@ -0,0 +1,215 @@
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from services.storage import get_storage
+from utils.upload_optimizer import optimize_upload
+
+from ..models import File, FileType, UploadSession
+
+# Bytes read from the request body per write
+COPY_BUFFER_SIZE = 64 * 1024
+
+# A chunk still being received after this long belongs to a dead request
+RECEIVE_TIMEOUT = timedelta(minutes=10)
+
+
+def session_path(session):
+    """Part file holding the bytes received so far."""
+    return os.path.join(settings.UPLOAD_SESSION_DIR, f"{session.id}.part")
+
+
+def create_session(employee, file_type, length, **fields):
+    """Open a new upload session with an empty part file."""
+    os.makedirs(settings.UPLOAD_SESSION_DIR, exist_ok=True)
+
+    session = UploadSession.objects.create(
+        employee=employee,
+        file_type=file_type,
+        length=length,
+        expires_at=timezone.now() + settings.UPLOAD_SESSION_TTL,
+        **fields,
+    )
+    open(session_path(session), "wb").close()
+    return session
+
+
+def claim_session(session, offset):
+    """
+    Reserve the session for one chunk starting at `offset`.
+
+    A compare-and-set on the row instead of a lock, so no transaction stays
+    open while the chunk streams in. Fails when the offset moved, the
+    session is finalizing or another chunk is being received.
+
+    Returns:
+        bool: Whether the caller may append the chunk
+    """
+    now = timezone.now()
+    claimed = (
+        UploadSession.objects.filter(id=session.id, offset=offset, finalizing=False)
+        .filter(
+            Q(receiving_at__isnull=True) | Q(receiving_at__lt=now - RECEIVE_TIMEOUT)
+        )
+        .update(receiving_at=now)
+    )
+    if claimed:
+        session.receiving_at = now
+    return bool(claimed)
+
+
+def append_chunk(session, stream):
+    """
+    Append a request body to the session's part file at `session.offset`.
+
+    The session must be claimed with claim_session() first; the claim is
+    released in the same update that records the new offset. Everything
+    that arrived is kept even if the client disconnects mid-chunk, so a
+    retry only has to resend the bytes after the new offset. Anything past
+    `length` is rejected.
+
+    Returns:
+        int: The new offset
+    """
+    path = session_path(session)
+    remaining = session.length - session.offset
+
+    with open(path, "r+b") as part:
+        # Drop bytes from a previous write that never got recorded
+        part.truncate(session.offset)
+        part.seek(session.offset)
+
+        try:
+            while remaining > 0:
+                chunk = stream.read(min(COPY_BUFFER_SIZE, remaining))
+                if not chunk:
+                    break
+                part.write(chunk)
+                remaining -= len(chunk)
+
+            if remaining == 0 and stream.read(1):
+                raise ValueError("Chunk extends past the upload length")
+        finally:
+            part.flush()
+            session.offset = min(part.tell(), session.length)
+            session.expires_at = timezone.now() + settings.UPLOAD_SESSION_TTL
+            UploadSession.objects.filter(
+                id=session.id, receiving_at=session.receiving_at
+            ).update(
+                offset=session.offset,
+                expires_at=session.expires_at,
+                receiving_at=None,
+                updated_at=timezone.now(),
+            )
+            session.receiving_at = None
+
+    return session.offset
+
+
+def finalize_session(session):
+    """
+    Upload a completed session to Drive and record it on the employee.
+
+    Runs outside any transaction, the session is marked as finalizing instead.
+
+    Returns:
+        File: The new or updated File row
+    """
+    employee = session.employee
+    file_name = f"{FileType[session.file_type].value}_{employee.surname}".upper()
+    path = session_path(session)
+
+    if not employee.folder_id:
+        raise Exception("The employee has no Drive folder yet")
+
+    file_instance = None
+    if session.file_id:
+        file_instance = employee.files.filter(file_id=session.file_id).first()
+        if file_instance is None:
+            raise Exception("The file to replace does not belong to the employee")
+
+    with open(path, "rb") as part:
+        optimized = optimize_upload(part, session.file_type, session.content_type)
+        if session.file_id:
+            file_info = get_storage().replace(
+                session.file_id,
+                optimized.file_io,
+                file_name,
+                folder_id=employee.folder_id,
+                mimetype=optimized.mimetype,
+            )
+        else:
+            file_info = get_storage().put(
+                optimized.file_io,
+                file_name,
+                employee.folder_id,
+                mimetype=optimized.mimetype,
+            )
+
+    if not file_info or "id" not in file_info:
+        raise Exception("Failed to upload file to Google Drive")
+
+    if file_instance is None:
+        file_instance = File.objects.create(
+            name=file_info["name"],
+            file_id=file_info["id"],
+            uploaded=True,
+            file_type=session.file_type,
+            original_size=optimized.original_size,
+            stored_size=optimized.size,
+        )
+        employee.files.add(file_instance)
+    else:
+        file_instance.name = file_info["name"]
+        file_instance.file_id = file_info["id"]
+        file_instance.file_type = session.file_type
+        file_instance.original_size = optimized.original_size
+        file_instance.stored_size = optimized.size
+        file_instance.save()
+
+    discard_session(session)
+    return file_instance
+
+
+def discard_session(session):
+    """Delete a session and its part file."""
+    try:
+        os.remove(session_path(session))
+    except FileNotFoundError:
+        pass
+    session.delete()
+
+
+def expire_sessions():
+    """
+    Remove expired sessions and part files no session refers to.
+
+    Returns:
+        int: Number of sessions removed
+    """
+    expired = list(UploadSession.objects.filter(expires_at__lte=timezone.now()))
+    for session in expired:
+        discard_session(session)
+
+    if os.path.isdir(settings.UPLOAD_SESSION_DIR):
+        # Leave recent files alone, their session may be getting created
+        cutoff = (timezone.now() - settings.UPLOAD_SESSION_TTL).timestamp()
+        known = {
+            f"{session_id}.part"
+            for session_id in UploadSession.objects.values_list("id", flat=True)
+        }
+        for entry in os.scandir(settings.UPLOAD_SESSION_DIR):
+            if (
+                entry.name.endswith(".part")
+                and entry.name not in known
+                and entry.stat().st_mtime < cutoff
+            ):
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+    return len(expired)
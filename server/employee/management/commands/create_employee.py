@@ -1,7 +1,8 @@
 from django.core.management.base import BaseCommand
 from employee.serializers import EmployeeSerializer
 from datetime import datetime
-from services.drive_services import create_folder
+from services.drive_services import BATCH_LIMIT, get_drive_stats
+from services.storage import get_storage
 import json
 
 
@@ -29,6 +30,20 @@ class Command(BaseCommand):
                         f"Date '{date_string}' not in expected format. Use either 'YYYY-MM-DD', 'MONTH DAY, YEAR', or 'YY/MM/DD'"
                     )
 
+    def share_folders(self, folders):
+        """Share the queued folders in batch requests instead of one call each."""
+        if not folders:
+            return
+
+        errors = get_storage().share(list(folders))
+        for folder_id, error in errors.items():
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Failed to share folder of employee {folders[folder_id]}: {error}"
+                )
+            )
+        folders.clear()
+
     def add_arguments(self, parser):
         parser.add_argument(
             "json_file", type=str, help="Path to JSON file containing employee data"
@@ -44,6 +59,8 @@ class Command(BaseCommand):
                 raise ValueError("JSON data must be a list of employees")
 
             success_count = 0
+            # Folders still waiting for their "anyone reader" permission
+            unshared_folders = {}
             for data in employees_data:
                 try:
                     # Prepare data for serializer
@@ -74,8 +91,13 @@ class Command(BaseCommand):
                     folder_name = (
                         f"{employee_data['first_name']} {employee_data['surname']}"
                     )
-                    folder_id = create_folder(folder_name.upper())
+                    folder_id = get_storage().create_folder(
+                        folder_name.upper(), share=False
+                    )
                     employee_data["folder_id"] = folder_id
+                    unshared_folders[folder_id] = data.get("employee_id")
+                    if len(unshared_folders) >= BATCH_LIMIT:
+                        self.share_folders(unshared_folders)
 
                     # Validate and create employee using serializer
                     serializer = EmployeeSerializer(data=employee_data)
@@ -101,12 +123,22 @@ class Command(BaseCommand):
                         )
                     )
 
+            self.share_folders(unshared_folders)
+
             self.stdout.write(
                 self.style.SUCCESS(
                     f"Successfully created {success_count} out of {len(employees_data)} employees"
                 )
             )
 
+            drive_stats = get_drive_stats()
+            if drive_stats["retries"]:
+                self.stdout.write(
+                    f"Drive: {drive_stats['requests']} requests, "
+                    f"{drive_stats['retries']} retried after rate limiting or errors, "
+                    f"{drive_stats['throttled_seconds'] + drive_stats['backoff_seconds']:.1f}s spent waiting"
+                )
+
         except FileNotFoundError:
             self.stdout.write(
                 self.style.ERROR(f"JSON file not found: {options['json_file']}")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from employee.helper.upload_sessions import expire_sessions
+
+
+class Command(BaseCommand):
+    help = "Delete expired resumable upload sessions and their partial files"
+
+    def handle(self, *args, **options):
+        removed = expire_sessions()
+        self.stdout.write(self.style.SUCCESS(f"Removed {removed} upload session(s)"))
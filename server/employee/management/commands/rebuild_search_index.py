@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from employee.helper.search import REBUILD_BATCH_SIZE, rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the employee search index from the employee table"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=REBUILD_BATCH_SIZE,
+            help=f"Employees per bulk insert (default: {REBUILD_BATCH_SIZE})",
+        )
+
+    def handle(self, *args, **options):
+        employees, tokens = rebuild_index(batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Indexed {employees} employee(s), {tokens} token(s)")
+        )
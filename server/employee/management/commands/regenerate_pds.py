@@ -0,0 +1,329 @@
+import copy
+import json
+import os
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+
+from django.core.management.base import BaseCommand
+
+from employee.helper.pds_builder import (
+    init_render_worker,
+    pds_content_hash,
+    pds_file_name,
+    render_pds_job,
+)
+from employee.helper.pds_jobs import has_pending_job, upload_pds
+from employee.models import Employee, File
+from employee.views import to_uppercase
+from pds.mixins import CompletePdsMixin
+
+
+class Command(CompletePdsMixin, BaseCommand):
+    help = (
+        "Rebuild every employee's PDS PDF from their stored PDS data and upload it "
+        "to Drive"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--employee",
+            action="append",
+            dest="employee_ids",
+            help="Only regenerate these employee IDs (can be repeated)",
+        )
+        parser.add_argument(
+            "--include-inactive",
+            action="store_true",
+            help="Also regenerate inactive employees",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 2,
+            help="Number of render processes",
+        )
+        parser.add_argument(
+            "--upload-concurrency",
+            type=int,
+            default=4,
+            help="Maximum number of Drive uploads in flight",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            type=str,
+            default="regenerate_pds.checkpoint",
+            help="File recording finished employees so an interrupted run can resume",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Ignore an existing checkpoint and start from the beginning",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Re-render and re-upload even when the PDS content is unchanged",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Render only; do not upload to Drive or update File rows",
+        )
+        parser.add_argument("--limit", type=int, help="Stop after this many employees")
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.stats = {
+            "rendered": 0,
+            "uploaded": 0,
+            "unchanged": 0,
+            "skipped": 0,
+            "resumed": 0,
+            "failed": 0,
+        }
+        self.started = time.perf_counter()
+
+        checkpoint_path = options["checkpoint"]
+        if options["restart"] and os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        finished = self.read_checkpoint(checkpoint_path)
+        if finished:
+            self.stdout.write(
+                f"Resuming from {checkpoint_path}: {len(finished)} employees already done"
+            )
+
+        queryset = Employee.objects.filter(personalinformation__isnull=False).exclude(
+            folder_id=""
+        )
+        if not options["include_inactive"]:
+            queryset = queryset.filter(is_active=True)
+        if options["employee_ids"]:
+            queryset = queryset.filter(employee_id__in=options["employee_ids"])
+
+        workers = max(1, options["workers"])
+        max_in_flight = workers * 2 + options["upload_concurrency"]
+
+        self.renders = {}
+        self.uploads = {}
+
+        with open(checkpoint_path, "a") as checkpoint, ProcessPoolExecutor(
+            max_workers=workers, initializer=init_render_worker
+        ) as renderers, ThreadPoolExecutor(
+            max_workers=max(1, options["upload_concurrency"])
+        ) as uploaders:
+            self.checkpoint = checkpoint
+            self.uploaders = uploaders
+
+            seen = 0
+            for employee in queryset.iterator(chunk_size=200):
+                if options["limit"] and seen >= options["limit"]:
+                    break
+                seen += 1
+
+                if employee.employee_id in finished:
+                    self.stats["resumed"] += 1
+                    continue
+
+                try:
+                    job = self.prepare(employee)
+                except Exception as e:
+                    self.fail(employee.employee_id, f"could not load PDS data: {e}")
+                    continue
+
+                if job is None:
+                    continue
+
+                if job.get("skip"):
+                    self.skip(employee.employee_id, job["skip"])
+                    continue
+
+                future = renderers.submit(
+                    render_pds_job, employee.employee_id, job["data"]
+                )
+                self.renders[future] = job
+
+                while len(self.renders) + len(self.uploads) >= max_in_flight:
+                    self.drain()
+
+            while self.renders or self.uploads:
+                self.drain()
+
+        self.report(final=True)
+
+    def read_checkpoint(self, path):
+        finished = set()
+        if not os.path.exists(path):
+            return finished
+
+        with open(path, "r") as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Partially written last line of an interrupted run
+                if entry.get("status") in ("done", "unchanged"):
+                    finished.add(entry["employee_id"])
+        return finished
+
+    def record(self, employee_id, status, **extra):
+        self.checkpoint.write(
+            json.dumps({"employee_id": employee_id, "status": status, **extra}) + "\n"
+        )
+        self.checkpoint.flush()
+
+    def prepare(self, employee):
+        """
+        Load an employee's PDS form data and decide whether it needs rendering.
+
+        The payload of their last succeeded PdsJob is rendered as submitted
+        when nothing saved the pds models after it, so its hash matches the
+        File row unless the template (or flattening) changed. Otherwise, as
+        for employees that never went through a job, the form is rebuilt from
+        the pds models, with that payload (if any) filling the sections the
+        models do not keep (see get_pds_form_data).
+        """
+        if has_pending_job(employee):
+            return {"skip": "a PDS job is pending"}
+
+        last_job = employee.pds_jobs.filter(status="succeeded").order_by("-id").first()
+        saved_at = employee.personalinformation.updated_at
+        if last_job and (saved_at is None or last_job.updated_at >= saved_at):
+            data = copy.deepcopy(last_job.payload)
+            # Not part of the form, and not worth pickling to the renderers
+            (data.get("other_information") or {}).pop("profile", None)
+        else:
+            data = to_uppercase(
+                self.get_pds_form_data(
+                    employee, fallback=last_job.payload if last_job else None
+                )
+            )
+
+        file_name = pds_file_name(data["personal_information"])
+        content_hash = pds_content_hash(data, file_name)
+
+        pds_file = employee.files.filter(file_type__iexact="pds").first()
+        if (
+            pds_file
+            and pds_file.content_hash == content_hash
+            and not self.options["force"]
+        ):
+            self.stats["unchanged"] += 1
+            self.record(employee.employee_id, "unchanged")
+            return None
+
+        return {
+            "employee": employee,
+            "data": data,
+            "file_name": file_name,
+            "content_hash": content_hash,
+            "pds_file": pds_file,
+        }
+
+    def drain(self):
+        """Wait for some render/upload work and hand results to the next stage."""
+        done, _ = wait(
+            list(self.renders) + list(self.uploads), return_when=FIRST_COMPLETED
+        )
+
+        for future in done:
+            if future in self.renders:
+                job = self.renders.pop(future)
+                self.render_finished(job, future)
+            else:
+                job = self.uploads.pop(future)
+                self.upload_finished(job, future)
+
+    def render_finished(self, job, future):
+        employee_id = job["employee"].employee_id
+        try:
+            _, pdf_bytes = future.result()
+        except Exception as e:
+            self.fail(employee_id, f"render failed: {e}")
+            return
+
+        self.stats["rendered"] += 1
+
+        if self.options["dry_run"]:
+            self.record(employee_id, "rendered", size=len(pdf_bytes))
+            self.progress()
+            return
+
+        pds_file = job["pds_file"]
+        upload = self.uploaders.submit(
+            upload_pds,
+            pdf_bytes,
+            job["file_name"],
+            job["employee"].folder_id,
+            pds_file.file_id if pds_file else None,
+        )
+        self.uploads[upload] = job
+
+    def upload_finished(self, job, future):
+        employee = job["employee"]
+        try:
+            g_file = future.result()
+            if not g_file or "id" not in g_file:
+                raise Exception("Drive returned no file ID")
+        except Exception as e:
+            self.fail(employee.employee_id, f"upload failed: {e}")
+            return
+
+        pds_file = job["pds_file"]
+        if pds_file:
+            pds_file.file_id = g_file["id"]
+            pds_file.name = g_file["name"]
+            pds_file.content_hash = job["content_hash"]
+            pds_file.save()
+        else:
+            new_file = File.objects.create(
+                name=g_file["name"],
+                file_id=g_file["id"],
+                uploaded=True,
+                file_type="pds",
+                content_hash=job["content_hash"],
+            )
+            employee.files.add(new_file)
+
+        self.stats["uploaded"] += 1
+        self.record(employee.employee_id, "done", file_id=g_file["id"])
+        self.progress()
+
+    def fail(self, employee_id, message):
+        self.stats["failed"] += 1
+        self.record(employee_id, "failed", error=message)
+        self.stdout.write(self.style.WARNING(f"{employee_id}: {message}"))
+
+    def skip(self, employee_id, reason):
+        self.stats["skipped"] += 1
+        self.record(employee_id, "skipped", reason=reason)
+        self.stdout.write(f"{employee_id}: skipped, {reason}")
+
+    def progress(self):
+        completed = self.stats["uploaded"] + (
+            self.stats["rendered"] if self.options["dry_run"] else 0
+        )
+        if completed and completed % 25 == 0:
+            self.report()
+
+    def report(self, final=False):
+        elapsed = time.perf_counter() - self.started
+        rendered = self.stats["rendered"]
+        rate = rendered / elapsed if elapsed else 0
+        summary = (
+            f"{rendered} rendered, {self.stats['uploaded']} uploaded, "
+            f"{self.stats['unchanged']} unchanged, {self.stats['skipped']} skipped, "
+            f"{self.stats['resumed']} resumed, "
+            f"{self.stats['failed']} failed in {elapsed:.1f}s ({rate:.2f} PDS/s)"
+        )
+
+        if not final:
+            self.stdout.write(summary)
+        elif self.stats["failed"]:
+            self.stdout.write(self.style.WARNING(summary))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
@@ -0,0 +1,90 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from employee.helper.pds_builder import init_render_worker
+from employee.helper.pds_jobs import claim_next_job, prune_jobs, run_pds_job
+
+# Seconds between deletions of old finished jobs while the worker runs
+PRUNE_INTERVAL = 3600
+
+
+class Command(BaseCommand):
+    help = "Run queued PDS render/upload jobs submitted through the PDS form"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once the queue is empty instead of waiting for new jobs",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=2.0,
+            help="Seconds to wait between polls when the queue is empty",
+        )
+        parser.add_argument(
+            "--max-jobs", type=int, help="Exit after running this many jobs"
+        )
+
+    def handle(self, *args, **options):
+        # Parse the template and compile its fill plan before the first job
+        init_render_worker()
+
+        self.stdout.write("Waiting for PDS jobs...")
+        processed = 0
+        pruned_at = None
+        try:
+            while not options["max_jobs"] or processed < options["max_jobs"]:
+                # Long-running process: drop connections the database timed out
+                close_old_connections()
+
+                if pruned_at is None or time.monotonic() - pruned_at >= PRUNE_INTERVAL:
+                    pruned = prune_jobs()
+                    if pruned:
+                        self.stdout.write(f"Deleted {pruned} old PDS job(s)")
+                    pruned_at = time.monotonic()
+
+                job = claim_next_job()
+                if job is None:
+                    if options["once"]:
+                        break
+                    time.sleep(options["poll_interval"])
+                    continue
+
+                self.run(job)
+                processed += 1
+        except KeyboardInterrupt:
+            self.stdout.write("Interrupted, stopping")
+
+        self.stdout.write(f"Ran {processed} PDS job(s)")
+
+    def run(self, job):
+        employee_id = job.employee.employee_id
+        started = time.perf_counter()
+        run_pds_job(job)
+        elapsed = time.perf_counter() - started
+
+        if job.status == "succeeded":
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Job {job.id} ({employee_id}) done in {elapsed:.1f}s: {job.pds_link}"
+                )
+            )
+        elif job.status == "queued":
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Job {job.id} ({employee_id}) attempt {job.attempts} failed, "
+                    f"{job.stage.lower()}: {job.error}"
+                )
+            )
+        elif job.status == "superseded":
+            self.stdout.write(
+                f"Job {job.id} ({employee_id}) failed and was superseded by a newer save"
+            )
+        else:
+            self.stdout.write(
+                self.style.ERROR(f"Job {job.id} ({employee_id}) failed: {job.error}")
+            )
@@ -0,0 +1,63 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from employee.helper.drive_sync import sync_drive_changes
+
+
+class Command(BaseCommand):
+    help = "Apply changes made directly in Google Drive to employee files"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Start over from the current Drive state, skipping older changes",
+        )
+        parser.add_argument(
+            "--watch",
+            action="store_true",
+            help="Keep running, syncing every --interval seconds",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=60.0,
+            help="Seconds between syncs with --watch",
+        )
+
+    def handle(self, *args, **options):
+        reset = options["reset"]
+        try:
+            while True:
+                close_old_connections()
+                try:
+                    self.sync(reset)
+                    reset = False
+                except Exception as e:
+                    if not options["watch"]:
+                        raise
+                    self.stdout.write(self.style.ERROR(f"Sync failed: {e}"))
+
+                if not options["watch"]:
+                    break
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            self.stdout.write("Interrupted, stopping")
+
+    def sync(self, reset):
+        stats = sync_drive_changes(reset=reset)
+        if stats is None:
+            self.stdout.write(
+                self.style.SUCCESS("Recorded the current Drive state as the start")
+            )
+            return
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{stats['changes']} change(s): {stats['renamed']} renamed, "
+                f"{stats['deleted']} deleted, {stats['moved']} moved, "
+                f"{stats['unlinked']} unlinked, {stats['added']} added"
+            )
+        )
@@ -1,5 +1,9 @@
 from django.db import models
+from django.utils import timezone
 from enum import Enum
+import uuid
+
+from services.storage import get_storage
 
 
 class FileType(Enum):
@@ -45,6 +49,12 @@ class File(models.Model):
     file_type = models.CharField(
         max_length=255, choices=FileType.choices(), default="None"
     )
+    # Hash of the data a generated file (e.g. the PDS) was rendered from
+    content_hash = models.CharField(max_length=64, blank=True, default="")
+    # Bytes as uploaded and as stored after optimization
+    original_size = models.PositiveBigIntegerField(null=True, blank=True)
+    stored_size = models.PositiveBigIntegerField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, null=True)
 
     class Meta:
         db_table = "file"
@@ -78,3 +88,126 @@ class Employee(models.Model):
         verbose_name = "Employee"
         verbose_name_plural = "Employees"
         ordering = ["surname", "first_name"]
+
+
+class JobStatus(Enum):
+    queued = "Queued"
+    running = "Running"
+    succeeded = "Succeeded"
+    failed = "Failed"
+    # Replaced by a newer save of the same employee before it could finish
+    superseded = "Superseded"
+
+    @classmethod
+    def choices(cls):
+        return [(key.name, key.value) for key in cls]
+
+
+class PdsJob(models.Model):
+    """A PDS render-and-upload queued by PDSView and run by `run_pds_jobs`."""
+
+    employee = models.ForeignKey(
+        Employee, on_delete=models.CASCADE, related_name="pds_jobs"
+    )
+    status = models.CharField(
+        max_length=20, choices=JobStatus.choices(), default="queued", db_index=True
+    )
+    # Human readable step the worker is on, e.g. "Uploading PDS"
+    stage = models.CharField(max_length=100, blank=True, default="")
+    progress = models.PositiveSmallIntegerField(default=0)
+    # Upper-cased PDS payload the file is rendered from
+    payload = models.JSONField()
+    # Base64 profile picture to upload alongside the PDS, if any
+    profile = models.JSONField(null=True, blank=True)
+    content_hash = models.CharField(max_length=64, blank=True, default="")
+    file_id = models.CharField(max_length=255, blank=True, default="")
+    error = models.TextField(blank=True, default="")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "pds_job"
+        ordering = ["created_at"]
+        indexes = [models.Index(fields=["status", "run_after"])]
+
+    @property
+    def pds_link(self):
+        if not self.file_id:
+            return None
+        return get_storage().file_link(self.file_id)
+
+
+class UploadSession(models.Model):
+    """
+    A resumable document upload (tus-style).
+
+    Chunks are appended to a part file under UPLOAD_SESSION_DIR until
+    `offset` reaches `length`, then the file is finalized into Drive.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    employee = models.ForeignKey(
+        Employee, on_delete=models.CASCADE, related_name="upload_sessions"
+    )
+    file_type = models.CharField(max_length=255, choices=FileType.choices())
+    file_name = models.CharField(max_length=255, blank=True, default="")
+    content_type = models.CharField(
+        max_length=255, blank=True, default="application/octet-stream"
+    )
+    # Existing Drive file to replace on finalize, if any
+    file_id = models.CharField(max_length=255, blank=True, default="")
+    length = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0)
+    # Set while the finished upload is being sent to storage
+    finalizing = models.BooleanField(default=False)
+    # Set while a PATCH streams a chunk into the part file
+    receiving_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        db_table = "upload_session"
+
+    @property
+    def is_complete(self):
+        return self.offset >= self.length
+
+    @property
+    def is_expired(self):
+        return self.expires_at <= timezone.now()
+
+
+class DriveSyncState(models.Model):
+    """Where `sync_drive_changes` left off in the Drive changes feed."""
+
+    name = models.CharField(max_length=50, unique=True, default="changes")
+    page_token = models.CharField(max_length=255)
+    synced_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "drive_sync_state"
+
+
+class EmployeeSearchToken(models.Model):
+    """
+    One normalized word of an employee's name or ID, for indexed search.
+
+    Maintained on every save (see employee.signals) and rebuilt by the
+    `rebuild_search_index` command.
+    """
+
+    employee = models.ForeignKey(
+        Employee, on_delete=models.CASCADE, related_name="search_tokens"
+    )
+    token = models.CharField(max_length=64)
+    # How much a match on this token counts when ranking results
+    weight = models.PositiveSmallIntegerField()
+
+    class Meta:
+        db_table = "employee_search_token"
+        indexes = [models.Index(fields=["token", "employee"])]
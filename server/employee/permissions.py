@@ -0,0 +1,11 @@
+from rest_framework.permissions import BasePermission
+
+from .helper.file_links import check_file_link
+
+
+class HasFileLinkToken(BasePermission):
+    """Allows a file view opened from a signed link (`?token=`) for its file."""
+
+    def has_permission(self, request, view):
+        token = request.query_params.get("token")
+        return bool(token) and check_file_link(token, view.kwargs.get("file_id"))
@@ -1,13 +1,20 @@
 from rest_framework import serializers
-from .models import Employee, File
+from .models import Employee, File, PdsJob
+from .helper.file_links import sign_file_link
 from datetime import datetime
 import re
 
 
 class FileSerializer(serializers.ModelSerializer):
+    # Lets <img> tags and new tabs open the file's thumbnail or content
+    token = serializers.SerializerMethodField()
+
     class Meta:
         model = File
-        fields = ["name", "file_id", "uploaded", "file_type"]
+        fields = ["name", "file_id", "uploaded", "file_type", "updated_at", "token"]
+
+    def get_token(self, obj):
+        return sign_file_link(obj.file_id)
 
 
 class CustomDateField(serializers.DateField):
@@ -137,3 +144,25 @@ class EmployeeSerializer(serializers.ModelSerializer):
             )
 
         return instance
+
+
+class PdsJobSerializer(serializers.ModelSerializer):
+    job_id = serializers.IntegerField(source="id", read_only=True)
+    employee_id = serializers.CharField(source="employee.employee_id", read_only=True)
+    pds_link = serializers.CharField(read_only=True)
+
+    class Meta:
+        model = PdsJob
+        fields = [
+            "job_id",
+            "employee_id",
+            "status",
+            "stage",
+            "progress",
+            "attempts",
+            "error",
+            "pds_link",
+            "created_at",
+            "updated_at",
+            "finished_at",
+        ]
@@ -0,0 +1,39 @@
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from .helper.search import SEARCH_FIELDS, index_employee, rebuild_index
+from .helper.statistics import invalidate_statistics
+from .models import Employee
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=Employee)
+@receiver(post_delete, sender=Employee)
+def employee_changed(sender, **kwargs):
+    # After the commit, so a request reading the old rows in the meantime
+    # cannot cache them again
+    transaction.on_commit(invalidate_statistics)
+
+
+@receiver(post_save, sender=Employee)
+def index_employee_on_save(sender, instance, update_fields=None, **kwargs):
+    # Saves of other fields (e.g. toggling is_active) leave the tokens alone
+    if update_fields is not None and not set(update_fields) & set(SEARCH_FIELDS):
+        return
+    index_employee(instance)
+
+
+@receiver(post_migrate)
+def index_unindexed_employees(sender, **kwargs):
+    # The token table starts out empty when it is created, and rows written
+    # without save() (e.g. bulk_create) are missing from it, so `migrate`
+    # fills the index in whenever an employee has no tokens
+    if sender.name != "employee":
+        return
+    if Employee.objects.filter(search_tokens__isnull=True).exists():
+        employees, tokens = rebuild_index()
+        logger.info("Indexed %d employee(s) for search, %d token(s)", employees, tokens)
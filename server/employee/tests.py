@@ -1,3 +1,393 @@
-from django.test import TestCase
+import tempfile
+from datetime import date
+from io import BytesIO
+from unittest import mock
 
-# Create your tests here.
+from django.test import RequestFactory, TestCase
+from rest_framework.test import APIClient
+
+from account.models import User
+from services.storage import LocalStorage
+
+from .helper.downloads import (
+    RangeNotSatisfiable,
+    document_etag,
+    parse_range,
+    serve_document,
+)
+from .helper.drive_sync import apply_changes
+from .helper.file_links import sign_file_link
+from .helper.search import employee_tokens, rebuild_index, search_employees
+from .models import Employee, File
+
+
+def make_employee(employee_id, surname="DELA CRUZ", first_name="JUAN", **fields):
+    defaults = {
+        "middle_name": "SANTOS",
+        "position": "CLERK",
+        "birth_date": date(1990, 1, 1),
+        "first_day_service": date(2020, 1, 1),
+        "civil_service": "",
+        "civil_status": "SINGLE",
+        "sex": "MALE",
+        "department": "ADMIN",
+        "folder_id": f"folder-{employee_id}",
+        "phone": "",
+        "email": "",
+    }
+    defaults.update(fields)
+    return Employee.objects.create(
+        employee_id=employee_id, surname=surname, first_name=first_name, **defaults
+    )
+
+
+def drive_change(file_id, name="NBI CLEARANCE_DELA CRUZ", parents=None, **fields):
+    drive_file = {"name": name, "mimeType": "application/pdf", **fields}
+    if parents is not None:
+        drive_file["parents"] = parents
+    return {"fileId": file_id, "file": drive_file}
+
+
+class ApplyChangesTests(TestCase):
+    def setUp(self):
+        self.juan = make_employee("E-1")
+        self.maria = make_employee("E-2", surname="REYES", first_name="MARIA")
+        self.file = File.objects.create(
+            name="NBI CLEARANCE_DELA CRUZ", file_id="drive-1", file_type="nbi"
+        )
+        self.juan.files.add(self.file)
+
+    def test_rename(self):
+        stats = apply_changes(
+            [drive_change("drive-1", "NBI_DELA CRUZ", [self.juan.folder_id])]
+        )
+
+        self.file.refresh_from_db()
+        self.assertEqual(self.file.name, "NBI_DELA CRUZ")
+        self.assertEqual(stats["renamed"], 1)
+        self.assertEqual(stats["folders"], {self.juan.folder_id})
+
+    def test_unchanged_file_is_left_alone(self):
+        stats = apply_changes(
+            [drive_change("drive-1", self.file.name, [self.juan.folder_id])]
+        )
+
+        self.assertEqual(stats["renamed"] + stats["moved"] + stats["unlinked"], 0)
+        self.assertEqual(list(self.juan.files.all()), [self.file])
+
+    def test_move_to_another_employee(self):
+        stats = apply_changes(
+            [drive_change("drive-1", self.file.name, [self.maria.folder_id])]
+        )
+
+        self.assertEqual(stats["moved"], 1)
+        self.assertFalse(self.juan.files.exists())
+        self.assertEqual(list(self.maria.files.all()), [self.file])
+        self.assertEqual(stats["folders"], {self.juan.folder_id, self.maria.folder_id})
+
+    def test_move_out_of_employee_folders_unlinks(self):
+        stats = apply_changes(
+            [drive_change("drive-1", self.file.name, ["somewhere-else"])]
+        )
+
+        self.assertEqual(stats["unlinked"], 1)
+        self.assertFalse(self.juan.files.exists())
+        # The row is kept, so moving the file back links it again
+        self.assertTrue(File.objects.filter(pk=self.file.pk).exists())
+
+        stats = apply_changes(
+            [drive_change("drive-1", self.file.name, [self.juan.folder_id])]
+        )
+        self.assertEqual(stats["moved"], 1)
+        self.assertEqual(list(self.juan.files.all()), [self.file])
+
+    def test_change_without_parents_does_not_unlink(self):
+        stats = apply_changes([drive_change("drive-1", self.file.name)])
+
+        self.assertEqual(stats["unlinked"], 0)
+        self.assertEqual(list(self.juan.files.all()), [self.file])
+
+    def test_removed_and_trashed_files_are_deleted(self):
+        trashed = File.objects.create(name="PROFILE_REYES", file_id="drive-2")
+        self.maria.files.add(trashed)
+
+        stats = apply_changes(
+            [
+                {"fileId": "drive-1", "removed": True},
+                drive_change(
+                    "drive-2", trashed.name, [self.maria.folder_id], trashed=True
+                ),
+            ]
+        )
+
+        self.assertEqual(stats["deleted"], 2)
+        self.assertFalse(
+            File.objects.filter(pk__in=[self.file.pk, trashed.pk]).exists()
+        )
+        self.assertEqual(stats["folders"], {self.juan.folder_id, self.maria.folder_id})
+
+    def test_only_the_latest_change_of_a_file_counts(self):
+        stats = apply_changes(
+            [
+                {"fileId": "drive-1", "removed": True},
+                drive_change("drive-1", self.file.name, [self.juan.folder_id]),
+            ]
+        )
+
+        self.assertEqual(stats["deleted"], 0)
+        self.assertTrue(File.objects.filter(pk=self.file.pk).exists())
+
+    def test_file_added_by_someone_else_gets_a_row(self):
+        stats = apply_changes(
+            [
+                drive_change(
+                    "drive-3",
+                    "PROFILE_REYES",
+                    [self.maria.folder_id],
+                    lastModifyingUser={"me": False},
+                ),
+                drive_change(
+                    "drive-4",
+                    "NBI CLEARANCE_REYES",
+                    [self.maria.folder_id],
+                    lastModifyingUser={"me": True},
+                ),
+            ]
+        )
+
+        self.assertEqual(stats["added"], 1)
+        added = self.maria.files.get()
+        self.assertEqual((added.file_id, added.file_type), ("drive-3", "profile"))
+
+
+class ParseRangeTests(TestCase):
+    def test_byte_ranges(self):
+        self.assertEqual(parse_range("bytes=0-99", 1000), (0, 99))
+        self.assertEqual(parse_range("bytes=500-", 1000), (500, 999))
+        self.assertEqual(parse_range("bytes=-100", 1000), (900, 999))
+        # Clamped to the end of the file
+        self.assertEqual(parse_range("bytes=900-5000", 1000), (900, 999))
+        self.assertEqual(parse_range("bytes=-5000", 1000), (0, 999))
+
+    def test_whole_file(self):
+        for header in [None, "", "bytes=-", "bytes=10-5", "bytes=0-1,5-9", "items=0-1"]:
+            with self.subTest(header=header):
+                self.assertIsNone(parse_range(header, 1000))
+
+    def test_not_satisfiable(self):
+        for header, size in [
+            ("bytes=1000-", 1000),
+            ("bytes=-0", 1000),
+            ("bytes=-1", 0),
+        ]:
+            with self.subTest(header=header, size=size):
+                with self.assertRaises(RangeNotSatisfiable):
+                    parse_range(header, size)
+
+
+class ServeDocumentTests(TestCase):
+    content = bytes(range(256)) * 4
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.storage = LocalStorage(root.name)
+        self.file_id = self.storage.put(
+            BytesIO(self.content), "DOC", "folder", mimetype="application/pdf"
+        )["id"]
+        self.factory = RequestFactory()
+
+    def serve(self, **headers):
+        request = self.factory.get("/", headers=headers)
+        return serve_document(request, self.storage, self.file_id)
+
+    def body(self, response):
+        return b"".join(response.streaming_content)
+
+    def test_whole_file(self):
+        response = self.serve()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.content)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertTrue(response["ETag"].startswith('"'))
+
+    def test_if_none_match(self):
+        etag = self.serve()["ETag"]
+
+        for header in [etag, f"W/{etag}", f'"other", {etag}', "*"]:
+            with self.subTest(header=header):
+                response = self.serve(if_none_match=header)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response["ETag"], etag)
+
+        # A tag that only contains the current one is a different tag
+        for header in ['"other"', etag[:-1] + 'x"', f'"{etag}"']:
+            with self.subTest(header=header):
+                self.assertEqual(self.serve(if_none_match=header).status_code, 200)
+
+    def test_range(self):
+        response = self.serve(range="bytes=10-19")
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.body(response), self.content[10:20])
+        self.assertEqual(response["Content-Length"], "10")
+        self.assertEqual(response["Content-Range"], f"bytes 10-19/{len(self.content)}")
+
+    def test_range_with_stale_if_range_gets_whole_file(self):
+        response = self.serve(range="bytes=10-19", if_range='"stale"')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.content)
+
+    def test_range_past_the_end(self):
+        response = self.serve(range=f"bytes={len(self.content)}-")
+
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], f"bytes */{len(self.content)}")
+
+    def test_missing_file(self):
+        self.storage.delete(self.file_id)
+        with self.assertRaises(FileNotFoundError):
+            self.serve()
+
+
+class EmployeeFileContentTests(TestCase):
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        storage = LocalStorage(root.name)
+        patcher = mock.patch("employee.views.get_storage", return_value=storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.file_id = storage.put(BytesIO(b"%PDF-1.4"), "DOC", "folder")["id"]
+        File.objects.create(name="DOC", file_id=self.file_id, file_type="pds")
+        self.url = f"/employee/files/{self.file_id}/content/"
+        self.client = APIClient()
+
+    def test_requires_login_or_token(self):
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_signed_token(self):
+        response = self.client.get(self.url, {"token": sign_file_link(self.file_id)})
+        self.assertEqual(response.status_code, 200)
+
+    def test_token_of_another_file(self):
+        response = self.client.get(self.url, {"token": sign_file_link("folder_x")})
+        self.assertEqual(response.status_code, 401)
+
+    def test_admin(self):
+        admin = User(is_superuser=True, is_admin=True)
+        self.client.force_authenticate(admin)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+
+class EmployeeFileThumbnailTests(TestCase):
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        storage = LocalStorage(root.name)
+        patcher = mock.patch("employee.views.get_storage", return_value=storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.file_id = storage.put(BytesIO(b"\x89PNG"), "PROFILE", "folder")["id"]
+        File.objects.create(name="PROFILE", file_id=self.file_id, file_type="profile")
+        self.url = f"/employee/files/{self.file_id}/thumbnail/avatar/"
+        self.client = APIClient()
+        self.etag = document_etag(
+            f"{self.file_id}-avatar", storage.metadata(self.file_id)["version"]
+        )
+
+    def test_requires_login_or_token(self):
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=self.etag)
+        self.assertEqual(response.status_code, 401)
+
+    def test_not_modified(self):
+        token = sign_file_link(self.file_id)
+        for header in [self.etag, f"W/{self.etag}"]:
+            with self.subTest(header=header):
+                response = self.client.get(
+                    self.url, {"token": token}, HTTP_IF_NONE_MATCH=header
+                )
+                self.assertEqual(response.status_code, 304)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.juan = make_employee("E-100", "DELA CRUZ", "JUAN", middle_name="REYES")
+        self.juana = make_employee("E-101", "CRUZADO", "JUANA", middle_name="")
+        self.maria = make_employee("E-102", "PEÑA", "MARIA", middle_name="CRUZ")
+        self.pedro = make_employee("E-103", "SANTOS", "PEDRO", middle_name="")
+
+    def search(self, query):
+        return list(search_employees(Employee.objects.all(), query))
+
+    def test_tokens(self):
+        tokens = employee_tokens(
+            {"employee_id": "E-1", "surname": "Peña-Dela Cruz", "first_name": "Juan"}
+        )
+        self.assertEqual(tokens["pena"], 3)
+        self.assertEqual(tokens["penadelacruz"], 3)
+        self.assertEqual(tokens["juan"], 2)
+        self.assertEqual(tokens["e"], 4)
+
+    def test_ranking(self):
+        # Exact surname (3 * 2), then prefix of a surname (3), then exact
+        # middle name (1 * 2)
+        self.assertEqual(self.search("cruz"), [self.juan, self.juana, self.maria])
+        ranks = search_employees(Employee.objects.all(), "cruz").values_list(
+            "search_rank", flat=True
+        )
+        self.assertEqual(list(ranks), [6, 3, 2])
+
+    def test_every_word_must_match(self):
+        self.assertEqual(self.search("juan cruz"), [self.juan, self.juana])
+        self.assertEqual(self.search("pedro cruz"), [])
+
+    def test_prefix_while_typing(self):
+        self.assertEqual(self.search("dela cruz ju"), [self.juan])
+
+    def test_accents_and_joined_words(self):
+        self.assertEqual(self.search("pena"), [self.maria])
+        self.assertEqual(self.search("delacruz"), [self.juan])
+
+    def test_employee_id(self):
+        self.assertEqual(self.search("E-103"), [self.pedro])
+
+    def test_substring_matches_come_last(self):
+        # Not the start of any token, found like the search before the index
+        self.assertEqual(self.search("ruz"), [self.juana, self.juan, self.maria])
+        self.assertEqual(self.search("antos"), [self.pedro])
+
+        ranks = search_employees(Employee.objects.all(), "ruz").values_list(
+            "search_rank", flat=True
+        )
+        self.assertEqual(list(ranks), [0, 0, 0])
+
+    def test_token_matches_rank_above_substring_matches(self):
+        make_employee("E-104", "ARUZ", "ANA", middle_name="")
+        results = self.search("aruz")
+        self.assertEqual(results[0].surname, "ARUZ")
+
+        make_employee("E-105", "BARUZA", "BEA", middle_name="")
+        results = [employee.surname for employee in self.search("aruz")]
+        self.assertEqual(results, ["ARUZ", "BARUZA"])
+
+    def test_index_follows_saves(self):
+        self.pedro.surname = "VILLANUEVA"
+        self.pedro.save()
+
+        self.assertEqual(self.search("villa"), [self.pedro])
+        self.assertEqual(self.search("santos"), [])
+
+    def test_rebuild_index(self):
+        Employee.objects.filter(pk=self.pedro.pk).update(surname="VILLANUEVA")
+        rebuild_index()
+
+        self.assertEqual(self.search("villa"), [self.pedro])
+
+    def test_empty_query(self):
+        self.assertEqual(self.search(""), [])
+        self.assertEqual(self.search("   "), [])
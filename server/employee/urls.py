@@ -3,9 +3,33 @@ from . import views
 
 urlpatterns = [
     path("pds/", views.PDSView.as_view(), name="pds"),
+    path("pds/jobs/<int:job_id>/", views.PdsJobView.as_view(), name="pds_job"),
     path("pds/<str:employee_id>/", views.PDSView.as_view(), name="selected_pds"),
     path("list/", views.EmployeeView.as_view(), name="employee_list"),
     path("list/<str:employee_id>/", views.EmployeeView.as_view(), name="employee"),
     path("count/", views.EmployeeCount.as_view(), name="employee_count"),
+    path("statistics/", views.EmployeeStatistics.as_view(), name="employee_statistics"),
     path("files/", views.EmployeeFile.as_view(), name="employee_file"),
+    path(
+        "files/<str:file_id>/content/",
+        views.EmployeeFileContent.as_view(),
+        name="employee_file_content",
+    ),
+    path(
+        "files/<str:file_id>/thumbnail/<str:size>/",
+        views.EmployeeFileThumbnail.as_view(),
+        name="employee_file_thumbnail",
+    ),
+    path("files/batch/", views.EmployeeFileBatch.as_view(), name="employee_files"),
+    path("uploads/", views.UploadSessionView.as_view(), name="upload_sessions"),
+    path(
+        "uploads/<uuid:upload_id>/",
+        views.UploadSessionDetailView.as_view(),
+        name="upload_session",
+    ),
+    path(
+        "uploads/<uuid:upload_id>/finalize/",
+        views.UploadSessionFinalizeView.as_view(),
+        name="upload_session_finalize",
+    ),
 ]
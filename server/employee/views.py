@@ -1,36 +1,68 @@
+from django.conf import settings
 from django.shortcuts import get_object_or_404
-from django.db.models import Q
+from django.urls import reverse
+from django.utils.http import http_date
+from django.db import transaction
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import APIException, ParseError
 
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework.parsers import JSONParser
-
-from .helper.pds_builder import PDSBuilder
+from rest_framework.parsers import JSONParser, MultiPartParser
+
+from .helper.pds_builder import pds_content_hash, pds_file_name
+from .helper.batch_upload import upload_documents
+from .helper.downloads import serve_document
+from .helper.search import search_employees
+from .helper.statistics import STATUS_TOTALS, get_statistics
+from .helper.thumbnails import (
+    ThumbnailUnavailable,
+    UndecodableImage,
+    serve_thumbnail,
+)
+from .helper.pds_jobs import enqueue_pds_job, has_pending_job
+from .helper.upload_sessions import (
+    append_chunk,
+    claim_session,
+    create_session,
+    discard_session,
+    finalize_session,
+)
 
-from .models import Employee, File, FileType
-from .serializers import EmployeeSerializer
+from .models import Employee, File, FileType, PdsJob, UploadSession
+from .serializers import EmployeeSerializer, PdsJobSerializer
 
 from pds.mixins import CompletePdsMixin
 
 from .utils.file_handler import file64_to_file
 
-from services.drive_services import (
-    get_file_to_folder,
-    create_folder,
-    upload_to_drive,
-    delete_file,
-    update_file,
-)
+from services.storage import get_storage
+from utils.upload_optimizer import optimize_upload
 
 import base64
 from io import BytesIO
 
 from account.permissions import IsAdminOrSuperAdmin
+from .permissions import HasFileLinkToken
 from .pagination import EmployeePagination
 
+# Fields `?fields=` may ask for in the employee list
+SPARSE_EMPLOYEE_FIELDS = [
+    field for field in EmployeeSerializer.Meta.fields if field != "files"
+]
+
+
+class NoDriveFolder(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Employee has no Drive folder yet, try again later"
+
+
+class UploadFailed(APIException):
+    status_code = status.HTTP_502_BAD_GATEWAY
+    default_detail = "Failed to upload file to storage"
+
 
 def get_civil_status(data):
     if data.get("p_civil_single"):
@@ -65,6 +97,23 @@ def to_uppercase(data):
         return data
 
 
+def split_profile(data):
+    """
+    Separate the base64 profile picture from a submitted PDS.
+
+    The picture is not form data, must not be uppercased and is too large
+    to keep in every PdsJob payload, so only the job's `profile` carries it.
+    The client sends it as `of_profile`, older clients as `profile`.
+
+    Returns:
+        tuple: The PDS without the picture, and the picture (or None)
+    """
+    other_information = dict(data.get("other_information") or {})
+    profile = other_information.pop("of_profile", None)
+    profile = other_information.pop("profile", None) or profile
+    return {**data, "other_information": other_information}, profile or None
+
+
 class PDSView(CompletePdsMixin, APIView):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAdminOrSuperAdmin]
@@ -75,14 +124,28 @@ class PDSView(CompletePdsMixin, APIView):
         data = self.get_complete_pds_data(employee)
         return Response(data)
 
+    def queued_response(self, job, detail):
+        return Response(
+            {
+                "detail": detail,
+                "job_id": job.id,
+                "status": job.status,
+            },
+            status=status.HTTP_202_ACCEPTED,
+        )
+
     def post(self, request):
+        """
+        Save a submitted PDS and queue its rendering and Drive upload.
+
+        Returns 202 with the id of a PdsJob to poll at `pds/jobs/<job_id>/`,
+        or 200 with the current link when the PDS did not change.
+        """
         try:
-            # Get profile data if available
-            other_information = request.data.get("other_information", {})
-            profile = other_information.get("profile", "") if other_information else ""
+            submitted, profile = split_profile(request.data)
 
             # Convert data to uppercase for consistency
-            data = to_uppercase(request.data)
+            data = to_uppercase(submitted)
 
             # Step 1. Extract personal information
             personal_information = data.get("personal_information", {})
@@ -94,6 +157,8 @@ class PDSView(CompletePdsMixin, APIView):
 
             # Prepare employee data
             employee_id = data.get("employee_id", "")
+            file_name = pds_file_name(personal_information)
+            pds_hash = pds_content_hash(data, file_name)
 
             # Check if employee already exists
             existing_employee = None
@@ -104,217 +169,68 @@ class PDSView(CompletePdsMixin, APIView):
                     existing_employee = None
 
             if existing_employee:
-                # If employee exists, use their folder_id
-                folder_id = existing_employee.folder_id
-                if not folder_id:
-                    return Response(
-                        {"detail": "Existing employee has no associated folder"},
-                        status=status.HTTP_400_BAD_REQUEST,
-                    )
-
-                # For existing employee, just create the PDS file
-                try:
-                    # Create PDS File
-                    pds_builder = (
-                        PDSBuilder(data)
-                        .update_pds_data()
-                        .destruct_pds_data()
-                        .update()
-                        .create_pds()
-                    )
-                    pds = pds_builder.build()
-
-                    file_name = f"PERSONAL DATA SHEET_{personal_information.get('p_surname', '')}, {personal_information.get('p_first_name', '')}"
-
-                    # Check if existing PDS file already exists
-                    pds_file = None
-                    for file in existing_employee.files.all():
-                        if file.file_type.lower() == "pds":
-                            pds_file = file
-                            break
-
-                    if pds_file:
-                        # Update existing PDS file
-                        g_file = update_file(pds_file.file_id, pds, file_name)
-
-                        # Update file record
-                        pds_file.name = g_file["name"]
-                        pds_file.save()
-                    else:
-                        # Upload new PDS file
-                        g_file = upload_to_drive(pds, file_name, folder_id)
-
-                        if not g_file or "id" not in g_file:
-                            return Response(
-                                {"detail": "Failed to upload PDS file to Google Drive"},
-                                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                            )
-
-                        # Create and attach new File record
-                        new_file = File.objects.create(
-                            name=g_file["name"],
-                            file_id=g_file["id"],
-                            uploaded=True,
-                            file_type="pds",
-                        )
-
-                        existing_employee.files.add(new_file)
-
-                    self.save_pds_data(employee_id, request.data)
-                    return Response(
-                        {
-                            "detail": "PDS created successfully for existing employee",
-                            "pds_link": f"https://drive.google.com/file/d/{g_file.get('id')}/view?usp=sharing",
-                        },
-                        status=status.HTTP_200_OK,
-                    )
-
-                except Exception as e:
-                    return Response(
-                        {"detail": f"PDS creation error: {str(e)}"},
-                        status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    )
-            else:
-                # For new employee, prepare the full employee data
-                employee = {
-                    "employee_id": employee_id,
-                    "first_name": personal_information.get("p_first_name", ""),
-                    "surname": personal_information.get("p_surname", ""),
-                    "middle_name": personal_information.get("p_middle_name", ""),
-                    "appointment_status": data.get("employment_status", ""),
-                    "position": data.get("position", ""),
-                    "department": data.get("department", ""),
-                    "civil_status": get_civil_status(personal_information),
-                    "birth_date": personal_information.get("p_birth_date", ""),
-                    "birth_place": personal_information.get("p_birth_place", ""),
-                    "first_day_service": data.get("first_day_service"),
-                    "sex": get_sex(personal_information),
-                    "phone": personal_information.get("p_mobile", ""),
-                    "email": personal_information.get("p_email", ""),
-                    "civil_service": data.get("civil_service", ""),
-                }
-
-                # Validate employee data
-                serializer = EmployeeSerializer(data=employee)
-                if not serializer.is_valid():
-                    return Response(
-                        serializer.errors, status=status.HTTP_400_BAD_REQUEST
-                    )
-
-                # Step 2. Create Folder for employee
+                # An employee without a folder yet gets one from the queued job
                 try:
-                    folder_name = f"{personal_information.get('p_surname', '')}, {personal_information.get('p_first_name', '')}"
-                    folder_id = create_folder(folder_name)
-                    if not folder_id:
+                    self.save_pds_data(employee_id, submitted)
+
+                    # Nothing changed since the last save, keep the current file.
+                    # A pending job may upload other data, so the save is then
+                    # queued behind it (or merged into it) instead
+                    pds_file = existing_employee.files.filter(
+                        file_type__iexact="pds"
+                    ).first()
+                    if (
+                        pds_file
+                        and pds_file.content_hash == pds_hash
+                        and not has_pending_job(existing_employee)
+                    ):
                         return Response(
-                            {"detail": "Failed to create folder in Google Drive"},
-                            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                            {
+                                "detail": "PDS unchanged for existing employee",
+                                "pds_link": get_storage().file_link(pds_file.file_id),
+                            },
+                            status=status.HTTP_200_OK,
                         )
-                except Exception as e:
-                    return Response(
-                        {"detail": f"Folder creation error: {str(e)}"},
-                        status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    )
-
-                # Step 3. Create PDS File
-                try:
-                    pds_builder = (
-                        PDSBuilder(data)
-                        .update_pds_data()
-                        .destruct_pds_data()
-                        .update()
-                        .create_pds()
-                    )
-                    pds = pds_builder.build()
 
-                    file_name = f"PERSONAL DATA SHEET_{personal_information.get('p_surname', '')}, {personal_information.get('p_first_name', '')}"
-                    g_file = upload_to_drive(pds, file_name, folder_id)
+                    job = enqueue_pds_job(existing_employee, data, pds_hash)
+                    return self.queued_response(job, "PDS queued for existing employee")
 
-                    if not g_file or "id" not in g_file:
-                        return Response(
-                            {"detail": "Failed to upload PDS file to Google Drive"},
-                            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                        )
                 except Exception as e:
                     return Response(
                         {"detail": f"PDS creation error: {str(e)}"},
                         status=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     )
 
-                # Initialize files list with PDS file
-                files_list = [
-                    {
-                        "name": g_file["name"],
-                        "file_id": g_file["id"],
-                        "uploaded": True,
-                        "file_type": "pds",
-                    }
-                ]
-
-                # Step 4. Upload Profile if provided
-                profile_data = None
-                if profile:
-                    try:
-                        file_io = file64_to_file(profile)
-                        if not file_io:
-                            return Response(
-                                {"detail": "Invalid profile image data"},
-                                status=status.HTTP_400_BAD_REQUEST,
-                            )
-
-                        file_name = f"PROFILE_{personal_information.get('p_surname', '')}, {personal_information.get('p_first_name', '')}"
-                        file_info = upload_to_drive(file_io, file_name, folder_id)
-
-                        if file_info and "id" in file_info:
-                            profile_data = {
-                                "name": file_info["name"],
-                                "file_id": file_info["id"],
-                                "uploaded": True,
-                                "file_type": "profile",
-                            }
-                            files_list.append(profile_data)
-                    except Exception as e:
-                        # Continue even if profile upload fails
-                        print(f"Profile upload error: {str(e)}")
-
-                # Update employee data with folder ID
-                employee["folder_id"] = folder_id
-
-                # Save employee to database
-                serializer = EmployeeSerializer(data=employee)
-                if not serializer.is_valid():
-                    # Clean up Drive files if employee save fails
-                    try:
-                        for file_item in files_list:
-                            delete_file(file_item["file_id"])
-                    except Exception:
-                        pass
-
-                    return Response(
-                        serializer.errors, status=status.HTTP_400_BAD_REQUEST
-                    )
-
+            # For new employee, prepare the full employee data
+            employee = {
+                "employee_id": employee_id,
+                "first_name": personal_information.get("p_first_name", ""),
+                "surname": personal_information.get("p_surname", ""),
+                "middle_name": personal_information.get("p_middle_name", ""),
+                "appointment_status": data.get("employment_status", ""),
+                "position": data.get("position", ""),
+                "department": data.get("department", ""),
+                "civil_status": get_civil_status(personal_information),
+                "birth_date": personal_information.get("p_birth_date", ""),
+                "birth_place": personal_information.get("p_birth_place", ""),
+                "first_day_service": data.get("first_day_service"),
+                "sex": get_sex(personal_information),
+                "phone": personal_information.get("p_mobile", ""),
+                "email": personal_information.get("p_email", ""),
+                "civil_service": data.get("civil_service", ""),
+            }
+
+            # Validate and save the employee, the job creates their Drive folder
+            serializer = EmployeeSerializer(data=employee)
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+            with transaction.atomic():
                 emp_instance = serializer.save()
+                self.save_pds_data(employee_id, submitted)
+                job = enqueue_pds_job(emp_instance, data, pds_hash, profile=profile)
 
-                # Add files to the employee
-                for file_data in files_list:
-                    file = File.objects.create(
-                        name=file_data["name"],
-                        file_id=file_data["file_id"],
-                        uploaded=file_data["uploaded"],
-                        file_type=file_data["file_type"],
-                    )
-                    emp_instance.files.add(file)
-
-                self.save_pds_data(employee_id, request.data)
-
-                return Response(
-                    {
-                        "detail": "Employee created successfully",
-                        "pds_link": f"https://drive.google.com/file/d/{g_file.get('id')}/view?usp=sharing",
-                    },
-                    status=status.HTTP_201_CREATED,
-                )
+            return self.queued_response(job, "Employee created, PDS queued")
 
         except Exception as e:
             return Response(
@@ -323,7 +239,7 @@ class PDSView(CompletePdsMixin, APIView):
             )
 
     def put(self, request):
-        """Update PDS for an existing employee"""
+        """Update PDS for an existing employee and queue its re-rendering"""
         try:
             employee_id = request.data.get("employee_id")
             if not employee_id:
@@ -341,8 +257,11 @@ class PDSView(CompletePdsMixin, APIView):
                     status=status.HTTP_404_NOT_FOUND,
                 )
 
+            # Only new employees get the profile picture uploaded
+            submitted, _ = split_profile(request.data)
+
             # Convert data to uppercase for consistency
-            data = to_uppercase(request.data)
+            data = to_uppercase(submitted)
             personal_information = data.get("personal_information", {})
 
             # Validate personal information
@@ -353,21 +272,14 @@ class PDSView(CompletePdsMixin, APIView):
                 )
 
             # Check if employee has a folder
-            folder_id = employee.folder_id
-            if not folder_id:
+            if not employee.folder_id:
                 return Response(
                     {"detail": "Employee has no associated folder"},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            # Check if PDS file already exists
-            pds_file = None
-            for file in employee.files.all():
-                if file.file_type.lower() == "pds":
-                    pds_file = file
-                    break
-
             # Require existing PDS file for update
+            pds_file = employee.files.filter(file_type__iexact="pds").first()
             if not pds_file:
                 return Response(
                     {
@@ -376,59 +288,24 @@ class PDSView(CompletePdsMixin, APIView):
                     status=status.HTTP_404_NOT_FOUND,
                 )
 
-            try:
-                self.save_pds_data(employee_id, request.data)
-
-                # Create PDS File
-                pds_builder = (
-                    PDSBuilder(data)
-                    .update_pds_data()
-                    .destruct_pds_data()
-                    .update()
-                    .create_pds()
-                )
-                pds = pds_builder.build()
-
-                # Create file name
-                file_name = f"PERSONAL DATA SHEET_{personal_information.get('p_surname', '')}, {personal_information.get('p_first_name', '')}"
+            file_name = pds_file_name(personal_information)
+            pds_hash = pds_content_hash(data, file_name)
 
-                g_file = update_file(pds_file.file_id, pds, file_name)
-
-                # Update file record with new ID from replacement file
-                pds_file.file_id = g_file["id"]
-                pds_file.name = g_file["name"]
-                pds_file.save()
-            except Exception as e:
-                if "File not found" in str(e) or "404" in str(e):
-                    # If file no longer exists in Drive, upload as replacement
-                    g_file = upload_to_drive(pds, file_name, folder_id)
+            self.save_pds_data(employee_id, submitted)
 
-                    if not g_file or "id" not in g_file:
-                        return Response(
-                            {
-                                "detail": "Failed to upload replacement PDS file to Google Drive"
-                            },
-                            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                        )
-
-                    # Update file record with new ID
-                    pds_file.file_id = g_file["id"]
-                    pds_file.name = g_file["name"]
-                    pds_file.save()
-                else:
-                    # Other error occurred
-                    return Response(
-                        {"detail": f"PDS file update error: {str(e)}"},
-                        status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    )
+            # Nothing changed since the last save and no pending job will
+            # upload other data, keep the current file
+            if pds_file.content_hash == pds_hash and not has_pending_job(employee):
+                return Response(
+                    {
+                        "detail": "PDS unchanged",
+                        "pds_link": get_storage().file_link(pds_file.file_id),
+                    },
+                    status=status.HTTP_200_OK,
+                )
 
-            return Response(
-                {
-                    "detail": "PDS updated successfully",
-                    "pds_link": f"https://drive.google.com/file/d/{g_file.get('id')}/view?usp=sharing",
-                },
-                status=status.HTTP_200_OK,
-            )
+            job = enqueue_pds_job(employee, data, pds_hash)
+            return self.queued_response(job, "PDS update queued")
 
         except Exception as e:
             return Response(
@@ -437,6 +314,16 @@ class PDSView(CompletePdsMixin, APIView):
             )
 
 
+class PdsJobView(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAdminOrSuperAdmin]
+
+    def get(self, request, job_id):
+        """Report a queued PDS job's progress and, once done, its Drive link"""
+        job = get_object_or_404(PdsJob.objects.select_related("employee"), id=job_id)
+        return Response(PdsJobSerializer(job).data)
+
+
 class EmployeeView(APIView):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAdminOrSuperAdmin]
@@ -453,6 +340,7 @@ class EmployeeView(APIView):
             category = request.query_params.get("category")
             is_active = request.query_params.get("is_active")
             search_query = request.query_params.get("search", "")
+            fields = request.query_params.get("fields")
 
             # Build filter conditions
             filters = {}
@@ -464,18 +352,34 @@ class EmployeeView(APIView):
             # Get all employees that match the filters
             employees = Employee.objects.filter(**filters)
 
-            # Apply search filter if provided
-            if search_query:
-                # Case-insensitive search across name fields
-                employees = employees.filter(
-                    Q(first_name__icontains=search_query)
-                    | Q(surname__icontains=search_query)
-                    | Q(middle_name__icontains=search_query)
-                )
+            # Ranked search over the name and ID tokens, best match first
+            if search_query.strip():
+                employees = search_employees(employees, search_query)
+            else:
+                employees = employees.order_by("surname", "first_name", "id")
 
             # Initialize paginator
             paginator = self.pagination_class()
-            paginated_employees = paginator.paginate_queryset(employees, request)
+
+            if fields:
+                # Sparse fieldset: plain rows from values(), without files
+                fields = [field.strip() for field in fields.split(",")]
+                unknown = set(fields) - set(SPARSE_EMPLOYEE_FIELDS)
+                if unknown:
+                    return Response(
+                        {
+                            "detail": f"Unknown fields: {', '.join(sorted(unknown))}. "
+                            f"Allowed: {', '.join(SPARSE_EMPLOYEE_FIELDS)}"
+                        },
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+                rows = paginator.paginate_queryset(employees.values(*fields), request)
+                return paginator.get_paginated_response(rows)
+
+            # One query for the files of the whole page
+            paginated_employees = paginator.paginate_queryset(
+                employees.prefetch_related("files"), request
+            )
 
             serializer = EmployeeSerializer(paginated_employees, many=True)
             return paginator.get_paginated_response(serializer.data)
@@ -573,51 +477,174 @@ class EmployeeCount(APIView):
     permission_classes = [IsAdminOrSuperAdmin]
 
     def get(self, request):
-        employees = Employee.objects.all()
-
-        total_permanent = employees.filter(
-            appointment_status="PERMANENT", is_active=True
-        ).count()
-        total_casuals = employees.filter(
-            appointment_status="CASUAL", is_active=True
-        ).count()
-        total_job_orders = employees.filter(
-            appointment_status="JOB ORDER", is_active=True
-        ).count()
-        total_co_terminus = employees.filter(
-            appointment_status="CO-TERMINUS", is_active=True
-        ).count()
-        total_contract_of_service = employees.filter(
-            appointment_status="CONTRACT OF SERVICE", is_active=True
-        ).count()
-        total_temporary = employees.filter(
-            appointment_status="TEMPORARY", is_active=True
-        ).count()
-
+        statistics = get_statistics()
         return Response(
-            {
-                "total_permanent": total_permanent,
-                "total_casual": total_casuals,
-                "total_job_order": total_job_orders,
-                "total_co_terminus": total_co_terminus,
-                "total_contract_of_service": total_contract_of_service,
-                "total_temporary": total_temporary,
-            },
+            {key: statistics[key] for key in STATUS_TOTALS},
             status=status.HTTP_200_OK,
         )
 
 
+class EmployeeStatistics(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAdminOrSuperAdmin]
+
+    def get(self, request):
+        """
+        Active employee headcounts: the total, per appointment status
+        (`total_*`) and per department, sex and civil status (`by_*`).
+        """
+        return Response(get_statistics(), status=status.HTTP_200_OK)
+
+
 class EmployeeFile(CompletePdsMixin, APIView):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAdminOrSuperAdmin]
-    parser_classes = [JSONParser]
+    # Multipart bodies are spooled to disk by Django's upload handlers and
+    # streamed to Drive in chunks; JSON bodies carry a base64 payload
+    parser_classes = [JSONParser, MultiPartParser]
 
     def get(self, request):
         folder = request.query_params.get("folder")
-        files = get_file_to_folder(folder)
+        if not folder:
+            return Response(
+                {"detail": "folder is required"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        refresh = request.query_params.get("refresh", "false").lower() == "true"
+        files = get_storage().list(folder, refresh=refresh)
         return Response(files, status=status.HTTP_200_OK)
 
+    def get_multipart_target(self, request):
+        """
+        Read the employee and Drive file name of a multipart upload.
+
+        Raises:
+            ParseError: A field is missing or the file type is unknown
+            NoDriveFolder: The employee's Drive folder does not exist yet
+        """
+        file_type = request.data.get("file_type")
+        employee_id = request.data.get("employee_id")
+
+        if "file" not in request.FILES or not file_type or not employee_id:
+            raise ParseError("Invalid data")
+
+        employee = get_object_or_404(Employee, employee_id=employee_id)
+        try:
+            file_name = f"{FileType[file_type].value}_{employee.surname}".upper()
+        except KeyError:
+            raise ParseError("Invalid file type")
+
+        # Created by the employee's first PDS job, which may still be queued
+        if not employee.folder_id:
+            raise NoDriveFolder
+
+        return employee, file_name
+
+    def store_multipart(self, request, store):
+        """
+        Optimize the uploaded file and pass it to `store(file_io, mimetype)`.
+
+        Returns:
+            tuple: (OptimizedUpload, file info from storage)
+
+        Raises:
+            UploadFailed: Storage failed or returned no file
+        """
+        uploaded = request.FILES["file"]
+        try:
+            optimized = optimize_upload(
+                uploaded, request.data.get("file_type"), uploaded.content_type
+            )
+            file_info = store(optimized.file_io, optimized.mimetype)
+        except Exception as e:
+            raise UploadFailed(f"Upload failed: {str(e)}") from e
+        finally:
+            uploaded.close()
+
+        if not file_info or "id" not in file_info:
+            raise UploadFailed
+        return optimized, file_info
+
+    def post_multipart(self, request):
+        """Upload a document sent as multipart/form-data (file, file_type, employee_id)"""
+        employee, file_name = self.get_multipart_target(request)
+
+        optimized, file_info = self.store_multipart(
+            request,
+            lambda file_io, mimetype: get_storage().put(
+                file_io, file_name, employee.folder_id, mimetype=mimetype
+            ),
+        )
+
+        new_file = File.objects.create(
+            name=file_info["name"],
+            file_id=file_info["id"],
+            uploaded=True,
+            file_type=request.data.get("file_type"),
+            original_size=optimized.original_size,
+            stored_size=optimized.size,
+        )
+        employee.files.add(new_file)
+
+        return Response(
+            {
+                "detail": "File uploaded successfully",
+                "employee_file": {
+                    "name": new_file.name,
+                    "file_id": new_file.file_id,
+                    "uploaded": new_file.uploaded,
+                    "file_type": new_file.file_type,
+                },
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
+    def put_multipart(self, request):
+        """Replace a document with one sent as multipart/form-data (plus file_id)"""
+        file_id = request.data.get("file_id")
+        if not file_id:
+            return Response(
+                {"detail": "Invalid data"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        employee, file_name = self.get_multipart_target(request)
+        file_instance = get_object_or_404(employee.files, file_id=file_id)
+
+        optimized, file_info = self.store_multipart(
+            request,
+            lambda file_io, mimetype: get_storage().replace(
+                file_id,
+                file_io,
+                file_name,
+                folder_id=employee.folder_id,
+                mimetype=mimetype,
+            ),
+        )
+
+        file_instance.name = file_info["name"]
+        file_instance.file_id = file_info["id"]
+        file_instance.file_type = request.data.get("file_type")
+        file_instance.original_size = optimized.original_size
+        file_instance.stored_size = optimized.size
+        file_instance.save()
+
+        return Response(
+            {
+                "detail": "File updated successfully",
+                "employee_file": {
+                    "name": file_instance.name,
+                    "file_id": file_instance.file_id,
+                    "uploaded": file_instance.uploaded,
+                    "file_type": file_instance.file_type,
+                },
+            },
+            status=status.HTTP_200_OK,
+        )
+
     def post(self, request):
+        if request.FILES:
+            return self.post_multipart(request)
+
         data = request.data
         payload = data.get("payload")
         employee = data.get("employee")
@@ -628,10 +655,13 @@ class EmployeeFile(CompletePdsMixin, APIView):
         )
 
         file_io = file64_to_file(payload)
+        optimized = optimize_upload(file_io, data.get("file_type"))
 
         # Save the file to Google Drive or any other storage
         folder_id = employee.get("folder_id")
-        file_info = upload_to_drive(file_io, file_name, folder_id)
+        file_info = get_storage().put(
+            optimized.file_io, file_name, folder_id, mimetype=optimized.mimetype
+        )
 
         # Create a new File instance
         new_file = File.objects.create(
@@ -639,6 +669,8 @@ class EmployeeFile(CompletePdsMixin, APIView):
             file_id=file_info["id"],
             uploaded=True,
             file_type=data.get("file_type"),
+            original_size=optimized.original_size,
+            stored_size=optimized.size,
         )
 
         # Update the employee's file information
@@ -665,6 +697,9 @@ class EmployeeFile(CompletePdsMixin, APIView):
         )
 
     def put(self, request):
+        if request.FILES:
+            return self.put_multipart(request)
+
         data = request.data
 
         payload = data.get("payload")
@@ -689,15 +724,24 @@ class EmployeeFile(CompletePdsMixin, APIView):
         # Decode the base64 file content
         file_data = base64.b64decode(file_content.split(",")[1])
         file_io = BytesIO(file_data)
-
-        # Update the file on Google Drive
-        file_info = update_file(file_id, file_io, file_name)
+        optimized = optimize_upload(file_io, file_type)
+
+        # Update the file on Google Drive, re-uploading it if it was removed
+        file_info = get_storage().replace(
+            file_id,
+            optimized.file_io,
+            file_name,
+            folder_id=employee.get("folder_id"),
+            mimetype=optimized.mimetype,
+        )
 
         # Update the File instance in the database
         file_instance = get_object_or_404(File, file_id=file_id)
         file_instance.name = file_info["name"]
         file_instance.file_id = file_info["id"]
         file_instance.file_type = file_type
+        file_instance.original_size = optimized.original_size
+        file_instance.stored_size = optimized.size
         file_instance.save()
 
         # Prepare the response data
@@ -746,7 +790,7 @@ class EmployeeFile(CompletePdsMixin, APIView):
         employee_instance.files.remove(file_instance)
 
         # Delete the file from Google Drive
-        delete_file(file_id)
+        get_storage().delete(file_id, folder_id=employee_instance.folder_id)
 
         # Delete the file instance from the database
         file_instance.delete()
@@ -755,3 +799,411 @@ class EmployeeFile(CompletePdsMixin, APIView):
             {"detail": "File deleted successfully", "employee_file": file_data},
             status=status.HTTP_200_OK,
         )
+
+
+class EmployeeFileContent(APIView):
+    authentication_classes = [JWTAuthentication]
+    # Browsers open the links of storage.file_link() without a login
+    permission_classes = [IsAdminOrSuperAdmin | HasFileLinkToken]
+
+    def get(self, request, file_id):
+        """
+        Serve a stored document's content inline.
+
+        Needs an admin login or a `?token=` signed for the file. Supports
+        `Range: bytes=...` (206) and `If-None-Match` (304). Drive documents
+        are kept in a local download cache per file version.
+        """
+        if not File.objects.filter(file_id=file_id).exists():
+            return Response(
+                {"detail": "File not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        try:
+            return serve_document(request, get_storage(), file_id)
+        except FileNotFoundError:
+            return Response(
+                {"detail": "File not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+
+class EmployeeFileThumbnail(APIView):
+    authentication_classes = [JWTAuthentication]
+    # Opened by <img> tags with the `token` FileSerializer returns
+    permission_classes = [IsAdminOrSuperAdmin | HasFileLinkToken]
+
+    def get(self, request, file_id, size):
+        """
+        Serve a profile photo resized to one of THUMBNAIL_SIZES.
+
+        Needs an admin login or a `?token=` signed for the file. Add
+        `?v=<version>` (e.g. the file's updated_at) to let browsers cache
+        the thumbnail for good.
+        """
+        if size not in settings.THUMBNAIL_SIZES:
+            return Response(
+                {
+                    "detail": f"Size must be one of: {', '.join(settings.THUMBNAIL_SIZES)}"
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if not File.objects.filter(file_id=file_id, file_type="profile").exists():
+            return Response(
+                {"detail": "Profile photo not found"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        try:
+            return serve_thumbnail(request, get_storage(), file_id, size)
+        except FileNotFoundError:
+            return Response(
+                {"detail": "Profile photo not found"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        except UndecodableImage:
+            return Response(
+                {"detail": "Profile photo is not a supported image"},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            )
+        except ThumbnailUnavailable:
+            return Response(
+                {"detail": "Thumbnail is not available, try again later"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+
+
+class EmployeeFileBatch(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAdminOrSuperAdmin]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        """
+        Upload several documents for one employee in a single request.
+
+        Multipart fields: employee_id, then `file` and `file_type` repeated
+        once per document, in the same order. Returns one result per
+        document: 201 when all uploaded, 207 when some failed, 502 when none
+        did.
+        """
+        employee_id = request.data.get("employee_id")
+        files = request.FILES.getlist("file")
+        file_types = request.data.getlist("file_type")
+
+        if not employee_id or not files or len(files) != len(file_types):
+            return Response(
+                {"detail": "Invalid data"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(files) > settings.BATCH_UPLOAD_MAX_FILES:
+            return Response(
+                {
+                    "detail": f"At most {settings.BATCH_UPLOAD_MAX_FILES} files per request"
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        invalid = [
+            file_type
+            for file_type in file_types
+            if file_type not in FileType.__members__
+        ]
+        if invalid:
+            return Response(
+                {"detail": f"Invalid file type: {', '.join(invalid)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        employee = get_object_or_404(Employee, employee_id=employee_id)
+        if not employee.folder_id:
+            return Response(
+                {"detail": "Employee has no Drive folder"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        results = upload_documents(employee, list(zip(files, file_types)))
+        uploaded = sum(result["status"] == "uploaded" for result in results)
+
+        if uploaded == len(results):
+            response_status = status.HTTP_201_CREATED
+        elif uploaded:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_502_BAD_GATEWAY
+
+        return Response(
+            {
+                "detail": f"Uploaded {uploaded} of {len(results)} files",
+                "results": results,
+            },
+            status=response_status,
+        )
+
+
+def describe_upload_session(session):
+    return {
+        "upload_id": str(session.id),
+        "employee_id": session.employee.employee_id,
+        "file_type": session.file_type,
+        "file_name": session.file_name,
+        "length": session.length,
+        "offset": session.offset,
+        "expires_at": session.expires_at,
+    }
+
+
+def upload_offset_headers(response, session):
+    response["Upload-Offset"] = str(session.offset)
+    response["Upload-Length"] = str(session.length)
+    response["Upload-Expires"] = http_date(session.expires_at.timestamp())
+    response["Cache-Control"] = "no-store"
+    return response
+
+
+class UploadSessionView(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAdminOrSuperAdmin]
+
+    def post(self, request):
+        """
+        Open a resumable upload session for an employee document.
+
+        Body: employee_id, file_type, length (bytes), and optionally
+        file_name, content_type and file_id (a Drive file to replace).
+        """
+        data = request.data
+        file_type = data.get("file_type")
+        employee_id = data.get("employee_id")
+
+        try:
+            length = int(data.get("length"))
+        except (TypeError, ValueError):
+            length = 0
+
+        if not employee_id or file_type not in FileType.__members__ or length <= 0:
+            return Response(
+                {"detail": "Invalid data"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        if length > settings.UPLOAD_SESSION_MAX_BYTES:
+            return Response(
+                {"detail": "File is too large"},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+
+        employee = get_object_or_404(Employee, employee_id=employee_id)
+        if not employee.folder_id:
+            raise NoDriveFolder
+        file_id = data.get("file_id", "")
+        if file_id and not employee.files.filter(file_id=file_id).exists():
+            return Response(
+                {"detail": "File not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        session = create_session(
+            employee,
+            file_type,
+            length,
+            file_name=data.get("file_name", "")[:255],
+            content_type=data.get("content_type") or "application/octet-stream",
+            file_id=file_id,
+        )
+
+        response = Response(
+            describe_upload_session(session), status=status.HTTP_201_CREATED
+        )
+        response["Location"] = reverse("upload_session", args=[session.id])
+        return upload_offset_headers(response, session)
+
+
+class UploadSessionDetailView(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAdminOrSuperAdmin]
+    # PATCH bodies are raw bytes, read straight from the request stream
+    parser_classes = []
+
+    def get_session(self, upload_id):
+        """Return the live session, or None once it is gone or expired."""
+        session = (
+            UploadSession.objects.select_related("employee")
+            .filter(id=upload_id)
+            .first()
+        )
+
+        if session is not None and session.is_expired:
+            discard_session(session)
+            return None
+        return session
+
+    def gone(self):
+        return Response(
+            {"detail": "Upload session not found or expired"},
+            status=status.HTTP_404_NOT_FOUND,
+        )
+
+    def finalizing(self, session):
+        return upload_offset_headers(
+            Response(
+                {"detail": "Upload is being finalized"},
+                status=status.HTTP_409_CONFLICT,
+            ),
+            session,
+        )
+
+    def head(self, request, upload_id):
+        """Report how many bytes the server has (tus offset retrieval)"""
+        session = self.get_session(upload_id)
+        if session is None:
+            return self.gone()
+        return upload_offset_headers(Response(status=status.HTTP_200_OK), session)
+
+    def get(self, request, upload_id):
+        session = self.get_session(upload_id)
+        if session is None:
+            return self.gone()
+        return upload_offset_headers(
+            Response(describe_upload_session(session)), session
+        )
+
+    def patch(self, request, upload_id):
+        """
+        Append a chunk (Content-Type: application/offset+octet-stream).
+
+        The Upload-Offset header must match the server's offset, otherwise
+        409 is returned with the current offset so the client can resume.
+        The session is claimed for the chunk (409 while another chunk is
+        being received) and the body streams outside any transaction.
+        """
+        if request.content_type != "application/offset+octet-stream":
+            return Response(
+                {"detail": "Content-Type must be application/offset+octet-stream"},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            )
+
+        try:
+            offset = int(request.headers.get("Upload-Offset", ""))
+        except ValueError:
+            return Response(
+                {"detail": "Upload-Offset header is required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        session = self.get_session(upload_id)
+        if session is None:
+            return self.gone()
+
+        if not claim_session(session, offset):
+            session = self.get_session(upload_id)
+            if session is None:
+                return self.gone()
+            if session.finalizing:
+                return self.finalizing(session)
+            detail = (
+                "Offset mismatch"
+                if offset != session.offset
+                else "Another chunk is being received"
+            )
+            return upload_offset_headers(
+                Response(
+                    {"detail": detail, "offset": session.offset},
+                    status=status.HTTP_409_CONFLICT,
+                ),
+                session,
+            )
+
+        try:
+            append_chunk(session, request.stream or BytesIO())
+        except ValueError as e:
+            return upload_offset_headers(
+                Response(
+                    {"detail": str(e), "offset": session.offset},
+                    status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                ),
+                session,
+            )
+
+        return upload_offset_headers(
+            Response(status=status.HTTP_204_NO_CONTENT), session
+        )
+
+    def delete(self, request, upload_id):
+        """Abandon an upload and delete what was received"""
+        session = self.get_session(upload_id)
+        if session is None:
+            return self.gone()
+        if session.finalizing:
+            return self.finalizing(session)
+        discard_session(session)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class UploadSessionFinalizeView(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAdminOrSuperAdmin]
+
+    def post(self, request, upload_id):
+        """
+        Upload a completed session to Drive and attach it to the employee.
+
+        The session is only locked to mark it as finalizing; the optimization
+        and upload run after that commits, so no row lock is held meanwhile.
+        """
+        with transaction.atomic():
+            session = (
+                UploadSession.objects.select_for_update()
+                .select_related("employee")
+                .filter(id=upload_id)
+                .first()
+            )
+            if session is None or session.is_expired:
+                return Response(
+                    {"detail": "Upload session not found or expired"},
+                    status=status.HTTP_404_NOT_FOUND,
+                )
+            if not session.employee.folder_id:
+                raise NoDriveFolder
+            if not session.is_complete:
+                return upload_offset_headers(
+                    Response(
+                        {"detail": "Upload is incomplete", "offset": session.offset},
+                        status=status.HTTP_409_CONFLICT,
+                    ),
+                    session,
+                )
+            if session.finalizing:
+                return upload_offset_headers(
+                    Response(
+                        {"detail": "Upload is being finalized"},
+                        status=status.HTTP_409_CONFLICT,
+                    ),
+                    session,
+                )
+
+            session.finalizing = True
+            session.save(update_fields=["finalizing", "updated_at"])
+
+        replaced = bool(session.file_id)
+        try:
+            file_instance = finalize_session(session)
+        except Exception as e:
+            # Let the client retry the finalize
+            UploadSession.objects.filter(id=session.id).update(finalizing=False)
+            return Response(
+                {"detail": f"Upload failed: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+        return Response(
+            {
+                "detail": (
+                    "File updated successfully"
+                    if replaced
+                    else "File uploaded successfully"
+                ),
+                "employee_file": {
+                    "name": file_instance.name,
+                    "file_id": file_instance.file_id,
+                    "uploaded": file_instance.uploaded,
+                    "file_type": file_instance.file_type,
+                },
+            },
+            status=status.HTTP_200_OK if replaced else status.HTTP_201_CREATED,
+        )
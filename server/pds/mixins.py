@@ -1,5 +1,6 @@
 from django.shortcuts import get_object_or_404
 from django.db import transaction
+from django.utils import timezone
 from datetime import datetime
 
 from employee.models import Employee
@@ -64,6 +65,52 @@ class CompletePdsMixin:
             else None,
         }
 
+    def get_pds_form_data(self, employee, fallback=None):
+        """
+        Rebuild the PDS form payload (as the client submits it) from stored data
+
+        The pds models do not back every section of the form. Those sections
+        are taken from `fallback`, a previously submitted payload, and left
+        empty without one:
+        - civil_service_eligibility is never stored
+        - educational_background is only stored by CompletePdsView, so the
+          first stored row is used and the fallback only when there is none
+        """
+        data = self.get_complete_pds_data(employee)
+        fallback = fallback or {}
+
+        other_information = dict(data["other_information"] or {})
+        skills = [dict(skill) for skill in other_information.pop("skills", [])]
+        for field_name in [
+            "of_profile_filename",
+            "of_profile_filetype",
+            "of_profile_file",
+        ]:
+            other_information.pop(field_name, None)
+        other_information["skills"] = skills
+
+        education_backgrounds = data["education_backgrounds"]
+        if education_backgrounds:
+            educational_background = dict(education_backgrounds[0])
+        else:
+            educational_background = dict(fallback.get("educational_background") or {})
+
+        return {
+            "employee_id": employee.employee_id,
+            "personal_information": dict(data["personal_information"] or {}),
+            "family_background": dict(data["family_background"] or {}),
+            "educational_background": educational_background,
+            "civil_service_eligibility": [
+                dict(item) for item in fallback.get("civil_service_eligibility") or []
+            ],
+            "work_experience": [dict(item) for item in data["work_experiences"]],
+            "voluntary_work": [dict(item) for item in data["voluntary_works"]],
+            "learning_development": [
+                dict(item) for item in data["learning_developments"]
+            ],
+            "other_information": other_information,
+        }
+
     # POST-related methods
     def process_personal_information(self, employee, data):
         """Process personal information data"""
@@ -306,6 +353,11 @@ class CompletePdsMixin:
                 ),
             }
 
+            # Mark the save even when only other sections changed
+            PersonalInformation.objects.filter(employee=employee).update(
+                updated_at=timezone.now()
+            )
+
             return employee, results
 
         except Exception as e:
@@ -68,6 +68,10 @@ class PersonalInformation(models.Model):
     p_mobile = models.CharField(max_length=50, blank=True)
     p_email = models.EmailField(blank=True)
 
+    # Last time any section of the PDS was saved, set by save_pds_data() (not
+    # auto_now, so rows saved before the column existed stay unknown)
+    updated_at = models.DateTimeField(null=True, blank=True)
+
     def __str__(self):
         return f"{self.p_first_name} {self.p_surname}"
 
@@ -45,7 +45,7 @@ class PersonalInformationSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = PersonalInformation
-        exclude = ["id", "employee"]
+        exclude = ["id", "employee", "updated_at"]
 
 
 class FamilyBackgroundSerializer(serializers.ModelSerializer):
@@ -98,8 +98,7 @@ class LearningDevelopmentSerializer(serializers.ModelSerializer):
 class SkillSerializer(serializers.ModelSerializer):
     class Meta:
         model = Skill
-        fields = ["id", "of_skill", "of_recognition", "of_membership"]
-        exclude = ["id"]
+        fields = ["of_skill", "of_recognition", "of_membership"]
 
 
 class OtherInformationSerializer(serializers.ModelSerializer):
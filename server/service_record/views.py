@@ -2,18 +2,22 @@ from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.conf import settings
 from django.shortcuts import get_object_or_404
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.http import parse_etags, quote_etag
 from datetime import datetime
 
 from employee.models import Employee
 from .models import ServiceRecord
 from .serializers import ServiceRecordSerializer
 
-import os
-from pypdf import PdfReader, PdfWriter
 import base64
-from io import BytesIO
-from pypdf.generic import NameObject
+import hashlib
+import json
+
+from utils.form_filler import get_fill_plan
+from utils.pdf_templates import get_template
 
 
 def format_date(date_value):
@@ -323,18 +327,69 @@ class ServiceRecordDetailView(APIView):
 
 class ServiceRecordPDF(APIView):
     permission_classes = [IsAuthenticated]
-    base_path = os.path.dirname(os.path.abspath(__file__))
-    input_path = os.path.join(base_path, "../static/service_record.pdf")
+    template_name = "service_record"
+
+    def get_etag(self, employee, service_records, manager, flatten=False):
+        """
+        Build an ETag from everything the rendered PDF depends on, so a repeat
+        download can be answered with 304 before anything is rendered.
+        """
+        parts = [
+            get_template(self.template_name).digest,
+            flatten,
+            employee.employee_id,
+            employee.surname,
+            employee.first_name,
+            employee.middle_name,
+            employee.birth_date,
+            employee.birth_place,
+        ]
+        for record in service_records:
+            parts.extend(
+                [
+                    record.id,
+                    record.service_from,
+                    record.service_to,
+                    record.designation,
+                    record.status,
+                    record.salary,
+                    record.station,
+                    record.absence,
+                ]
+            )
+        if manager is not None:
+            parts.extend(
+                [
+                    manager.division_manager_c,
+                    manager.general_manager,
+                    manager.last_updated.isoformat() if manager.last_updated else "",
+                ]
+            )
+
+        digest = hashlib.sha256(
+            json.dumps(parts, separators=(",", ":"), default=str).encode("utf-8")
+        ).hexdigest()
+        return quote_etag(digest)
 
     def get(self, request, employee_id=None, format=None):
         """
-        Generate a filled PDF service record for an employee and return as JSON with base64 encoded file
+        Generate a filled PDF service record for an employee.
+
+        Returns JSON with the base64 encoded file by default. With
+        `?download=true` the PDF is streamed as a binary attachment with an
+        ETag, and a matching If-None-Match gets 304 without rendering.
+        `?flatten=true|false` overrides FLATTEN_GENERATED_PDFS for this request.
         """
         if not employee_id:
             return Response(
                 {"error": "Employee ID is required"}, status=status.HTTP_400_BAD_REQUEST
             )
 
+        download = request.query_params.get("download", "false").lower() == "true"
+        flatten = request.query_params.get(
+            "flatten", str(settings.FLATTEN_GENERATED_PDFS)
+        ).lower() in ("true", "1")
+
         try:
             # Get employee data
             employee = Employee.objects.get(employee_id=employee_id)
@@ -348,9 +403,19 @@ class ServiceRecordPDF(APIView):
                 division_manager = manager.division_manager_c or ""
                 general_manager = manager.general_manager or ""
             except Exception:
+                manager = None
                 division_manager = ""
                 general_manager = ""
 
+            if download:
+                etag = self.get_etag(employee, service_records, manager, flatten)
+                if_none_match = request.headers.get("If-None-Match", "")
+                if etag in parse_etags(if_none_match) or if_none_match == "*":
+                    response = HttpResponseNotModified()
+                    response["ETag"] = etag
+                    response["Cache-Control"] = "private, no-cache"
+                    return response
+
             # Prepare fillable fields dictionary
             fillable_fields = {
                 "employee_id": employee.employee_id,
@@ -384,50 +449,21 @@ class ServiceRecordPDF(APIView):
                 fillable_fields[f"id_assignment_{i}"] = record.station
                 fillable_fields[f"id_loa_{i}"] = record.absence
 
-            # Use the provided PDF filling logic
-            reader = PdfReader(self.input_path)
-            writer = PdfWriter()
-
-            # Copy pages from reader to writer
-            for page in reader.pages:
-                writer.add_page(page)
+            # Fill only the fields we prepared, leaving the rest of the form as-is
+            output_pdf = get_fill_plan(self.template_name).fill(
+                fillable_fields, blank="", fill_missing=False, flatten=flatten
+            )
 
-            # Copy the /AcroForm dictionary from reader to writer
-            if "/AcroForm" in reader.trailer["/Root"]:
-                writer._root_object.update(
-                    {NameObject("/AcroForm"): reader.trailer["/Root"]["/AcroForm"]}
+            if download:
+                response = FileResponse(
+                    output_pdf,
+                    content_type="application/pdf",
+                    as_attachment=True,
+                    filename=f"service_record_{employee_id}.pdf",
                 )
-
-            fields = reader.get_fields()
-
-            # Fill form fields using correct field types
-            for page_num, page in enumerate(writer.pages):
-                for field_name, field in fields.items():
-                    if field_name in fillable_fields:
-                        field_type = field.get("/FT")
-                        if field_type == "/Btn":  # Checkbox field
-                            value = fillable_fields.get(field_name, "")
-                            writer.update_page_form_field_values(
-                                page,
-                                {
-                                    field_name: f"/{value.lower() if not isinstance(value, bool) else ''}"
-                                },
-                            )
-                        else:
-                            value = fillable_fields.get(field_name, "")
-                            writer.update_page_form_field_values(
-                                page,
-                                {
-                                    field_name: value
-                                    if value and len(str(value)) > 0
-                                    else ""
-                                },
-                            )
-
-            # Save the modified PDF to a BytesIO object
-            output_pdf = BytesIO()
-            writer.write(output_pdf)
-            output_pdf.seek(0)
+                response["ETag"] = etag
+                response["Cache-Control"] = "private, no-cache"
+                return response
 
             # Convert to base64 for response
             pdf_data = output_pdf.getvalue()
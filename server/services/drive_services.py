@@ -1,26 +1,254 @@
-from googleapiclient.discovery import build
+import copy
+import json
+import threading
+import time
+
+import google_auth_httplib2
+import httplib2
+from google.auth.credentials import AnonymousCredentials
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build_from_document
+from googleapiclient.errors import HttpError
 from googleapiclient.http import MediaIoBaseUpload, MediaIoBaseDownload
 from django.conf import settings
+from django.core.cache import cache
 from io import BytesIO
 from utils.config_reader import get_config
+from services.rate_limit import RetryPolicy, RetryStats, TokenBucket, parse_retry_after
 
 # Get default parent folder ID from config
 DEFAULT_PARENT_FOLDER_ID = get_config("google_drive", "parent_folder_id")
 
+# Seconds before a Drive HTTP request is abandoned
+HTTP_TIMEOUT = 60
+
+# Most sub-requests Drive accepts in one batch HTTP request
+BATCH_LIMIT = 100
+
+ANYONE_READER = {"type": "anyone", "role": "reader"}
+
+# Resumable upload chunks must be a multiple of this many bytes
+UPLOAD_CHUNK_UNIT = 256 * 1024
+
+# Largest page files().list and changes().list return
+LIST_PAGE_SIZE = 1000
+
+# What changes().list reports about each changed file
+CHANGE_FIELDS = (
+    "fileId, removed, file(id, name, mimeType, trashed, parents, lastModifyingUser/me)"
+)
+
+# Error reasons of a 403 that mean "slow down", not "forbidden"
+QUOTA_REASONS = {"userRateLimitExceeded", "rateLimitExceeded"}
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+_local = threading.local()
+_discovery_lock = threading.Lock()
+_credentials_lock = threading.Lock()
+_discovery_document = None
+_anonymous_credentials = AnonymousCredentials()
+_limiter = None
+_retry_policy = None
+_limiter_lock = threading.Lock()
+stats = RetryStats()
+
+
+def get_limiter():
+    """The token bucket every Drive request of this process goes through."""
+    global _limiter, _retry_policy
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _retry_policy = RetryPolicy(
+                    max_retries=settings.GOOGLE_DRIVE_MAX_RETRIES
+                )
+                _limiter = TokenBucket(settings.GOOGLE_DRIVE_MAX_REQUESTS_PER_SECOND)
+    return _limiter
+
+
+def get_drive_stats():
+    """
+    Request, retry and wait counters since start (or `stats.reset()`).
+
+    Returns:
+        dict: requests, retries, failures, throttled_seconds, backoff_seconds
+    """
+    return stats.snapshot()
+
+
+def error_reason(error):
+    """The `reason` of the first error in a Drive error response."""
+    try:
+        return json.loads(error.content)["error"]["errors"][0]["reason"]
+    except (ValueError, KeyError, IndexError, TypeError):
+        return ""
+
+
+def retry_delay(error, attempt, idempotent=True):
+    """
+    Seconds to wait before retrying after `error`, or None if it is final.
+
+    Quota errors also pause the shared limiter, so every thread slows down
+    instead of each one running into the limit on its own. Requests that
+    are not idempotent are only retried on quota errors, which Drive
+    answers without carrying them out.
+    """
+    get_limiter()
+    if attempt >= _retry_policy.max_retries:
+        return None
+
+    if isinstance(error, HttpError):
+        status = error.resp.status
+        quota = status == 429 or (
+            status == 403 and error_reason(error) in QUOTA_REASONS
+        )
+        if not quota and (not idempotent or status not in RETRYABLE_STATUSES):
+            return None
+
+        delay = _retry_policy.delay(
+            attempt, parse_retry_after(error.resp.get("retry-after"))
+        )
+        if quota:
+            get_limiter().pause(delay)
+        return delay
+
+    if idempotent and isinstance(error, (TimeoutError, ConnectionError)):
+        return _retry_policy.delay(attempt)
+    return None
+
+
+def with_retries(call, tokens=1, idempotent=True):
+    """
+    Make a Drive call through the shared rate limiter, retrying with backoff.
+
+    Rate-limit responses (403 userRateLimitExceeded/rateLimitExceeded, 429),
+    5xx responses and network errors are retried with jittered exponential
+    backoff, honouring Retry-After. With `idempotent=False` (e.g.
+    `files().create`, where a 5xx or a dropped connection may still have
+    created the file) only rate-limit responses are retried.
+    """
+    attempt = 0
+    while True:
+        stats.add(requests=tokens, throttled_seconds=get_limiter().acquire(tokens))
+        try:
+            return call()
+        except Exception as e:
+            delay = retry_delay(e, attempt, idempotent)
+            if delay is None:
+                if attempt:
+                    stats.add(failures=1)
+                raise
+            stats.add(retries=1, backoff_seconds=delay)
+            time.sleep(delay)
+            attempt += 1
+
+
+def execute(request, idempotent=True):
+    """Execute a Drive API request with rate limiting and retries."""
+    return with_retries(request.execute, idempotent=idempotent)
+
+
+def get_discovery_document():
+    """
+    Parse the bundled Drive v3 discovery document once per process.
+
+    With GOOGLE_DRIVE_API_URL set, every request (including uploads and
+    batches) goes to that server instead, e.g. `benchmarks.fake_drive`.
+    """
+    global _discovery_document
+    if _discovery_document is None:
+        with _discovery_lock:
+            if _discovery_document is None:
+                document = json.loads(discovery_cache.get_static_doc("drive", "v3"))
+                api_url = settings.GOOGLE_DRIVE_API_URL
+                if api_url:
+                    document = copy.deepcopy(document)
+                    document["rootUrl"] = api_url.rstrip("/") + "/"
+                    document["baseUrl"] = document["rootUrl"] + document["servicePath"]
+                    document.pop("mtlsRootUrl", None)
+                _discovery_document = document
+    return _discovery_document
+
+
+def refresh_credentials(credentials):
+    """Refresh an expired access token once, even when many threads notice."""
+    if credentials.valid:
+        return
+
+    with _credentials_lock:
+        if not credentials.valid:
+            credentials.refresh(
+                google_auth_httplib2.Request(httplib2.Http(timeout=HTTP_TIMEOUT))
+            )
+
+
+def new_http():
+    """
+    An httplib2 client for the Drive API.
+
+    Like googleapiclient's build_http(), 308 is not treated as a redirect:
+    resumable uploads answer every chunk but the last with 308.
+    """
+    http = httplib2.Http(timeout=HTTP_TIMEOUT)
+    http.redirect_codes = http.redirect_codes - {308}
+    return http
+
 
 def build_drive_service():
+    """
+    Return the Drive client for the current thread.
+
+    httplib2 connections are not thread-safe, so each thread builds one
+    client with its own keep-alive connection and reuses it. Every client
+    shares the process-wide discovery document and credentials.
+    """
     # Get credentials from settings
     credentials = settings.GOOGLE_DRIVE_CREDENTIALS
+    if credentials is None and settings.GOOGLE_DRIVE_API_URL:
+        # A local stand-in for Drive needs no authentication
+        credentials = _anonymous_credentials
     if credentials is None:
         raise Exception("Google Drive credentials not found!")
 
-    # Build the Drive service
-    service = build("drive", "v3", credentials=credentials)
+    refresh_credentials(credentials)
+
+    service = getattr(_local, "service", None)
+    if service is None or _local.credentials is not credentials:
+        http = google_auth_httplib2.AuthorizedHttp(credentials, http=new_http())
+        service = build_from_document(get_discovery_document(), http=http)
+        _local.service = service
+        _local.credentials = credentials
+
     return service
 
 
-def create_folder(folder_name, parent_folder_id=None):
-    """Create a folder in Google Drive."""
+def folder_cache_key(folder_id):
+    return f"drive:folder:{folder_id}"
+
+
+def invalidate_folder(*folder_ids):
+    """Drop the cached listing of folders whose content changed."""
+    cache.delete_many(
+        [folder_cache_key(folder_id) for folder_id in folder_ids if folder_id]
+    )
+
+
+def file_cache_key(file_id):
+    return f"drive:file:{file_id}"
+
+
+def invalidate_file(*file_ids):
+    """Drop the cached metadata of files that were changed or removed."""
+    cache.delete_many([file_cache_key(file_id) for file_id in file_ids if file_id])
+
+
+def create_folder(folder_name, parent_folder_id=None, share=True):
+    """
+    Create a folder in Google Drive.
+
+    With `share=False` the "anyone reader" permission is left to the caller,
+    e.g. to grant it for many folders at once with `set_permissions_batch`.
+    """
     service = build_drive_service()
 
     # Use the provided parent_folder_id or fall back to default
@@ -33,13 +261,39 @@ def create_folder(folder_name, parent_folder_id=None):
         "parents": [parent_folder_id],
     }
 
-    folder = service.files().create(body=FOLDER_METADATA, fields="id").execute()
-    set_file_permissions(folder.get("id"))
+    folder = execute(
+        service.files().create(body=FOLDER_METADATA, fields="id"), idempotent=False
+    )
+    if share:
+        set_file_permissions(folder.get("id"))
     return folder.get("id")
 
 
-def upload_to_drive(file_io, file_name, folder_id):
-    """Uploads a file to Google Drive."""
+def upload_media(file_io, mimetype=None):
+    """
+    Wrap a file object for a chunked resumable upload.
+
+    Only one chunk of GOOGLE_DRIVE_UPLOAD_CHUNK_SIZE bytes is held in memory
+    at a time, so uploads spooled to a temporary file stay cheap at any size.
+    """
+    # Drive requires chunks in multiples of 256 KiB
+    chunk_size = max(1, settings.GOOGLE_DRIVE_UPLOAD_CHUNK_SIZE // UPLOAD_CHUNK_UNIT)
+    return MediaIoBaseUpload(
+        file_io,
+        mimetype=mimetype or "application/octet-stream",
+        chunksize=chunk_size * UPLOAD_CHUNK_UNIT,
+        resumable=True,
+    )
+
+
+def upload_to_drive(file_io, file_name, folder_id, share=None, mimetype=None):
+    """
+    Uploads a file to Google Drive.
+
+    `share` defaults to granting "anyone reader" on the file itself unless
+    GOOGLE_DRIVE_INHERIT_FOLDER_PERMISSIONS is set, in which case the file
+    inherits it from its (already shared) employee folder.
+    """
     service = build_drive_service()
     # Set file metadata
     file_metadata = {
@@ -47,83 +301,332 @@ def upload_to_drive(file_io, file_name, folder_id):
         "parents": [folder_id],
     }
 
-    # Upload the file using MediaIoBaseUpload
-    media = MediaIoBaseUpload(
-        file_io, mimetype="application/octet-stream", resumable=True
-    )
-    file = (
-        service.files()
-        .create(body=file_metadata, media_body=media, fields="id")
-        .execute()
+    # Upload the file in resumable chunks
+    media = upload_media(file_io, mimetype)
+    file = execute(
+        service.files().create(body=file_metadata, media_body=media, fields="id"),
+        idempotent=False,
     )
 
-    set_file_permissions(file.get("id"))
-
-    return {"name": file_name, "id": file.get("id")}
+    invalidate_folder(folder_id)
 
+    if share is None:
+        share = not settings.GOOGLE_DRIVE_INHERIT_FOLDER_PERMISSIONS
+    if share:
+        set_file_permissions(file.get("id"))
 
-def update_file(file_id, file_io=None, new_name=None):
-    """Update a file in Google Drive by deleting and recreating it."""
-    service = build_drive_service()
+    return {"name": file_name, "id": file.get("id")}
 
-    # Get the original file's parent folder
-    file_data = service.files().get(fileId=file_id, fields="parents").execute()
-    parent_folder_id = (
-        file_data.get("parents", [])[0] if file_data.get("parents") else None
-    )
 
-    # Delete the existing file
-    delete_file(file_id)
+def update_file(file_id, file_io=None, new_name=None, folder_id=None, mimetype=None):
+    """
+    Replace a file's content and/or name in place with a single media update.
 
+    The file keeps its ID, permissions and shared links. Only when Drive no
+    longer has the file is it uploaded again into `folder_id` (under a new
+    ID); without a folder a "File not found" exception is raised instead.
+    """
     # If no new content or name provided, return None
     if not file_io and not new_name:
         return None
 
-    # Set up file metadata for new file
-    file_metadata = {
-        "name": new_name,
-        "parents": [parent_folder_id] if parent_folder_id else None,
-    }
+    service = build_drive_service()
 
-    # Upload the new file
+    body = {"name": new_name} if new_name else {}
     media = None
     if file_io:
-        media = MediaIoBaseUpload(
-            file_io, mimetype="application/octet-stream", resumable=True
-        )
-
-    file = (
-        service.files()
-        .create(body=file_metadata, media_body=media, fields="id, name")
-        .execute()
-    )
-
-    # Set permissions for the new file
-    set_file_permissions(file.get("id"))
+        media = upload_media(file_io, mimetype)
 
+    try:
+        file = execute(
+            service.files().update(
+                fileId=file_id, body=body, media_body=media, fields="id, name, parents"
+            )
+        )
+    except HttpError as e:
+        if e.resp.status != 404:
+            raise
+        if not folder_id or not file_io:
+            raise Exception(f"File not found: {file_id}") from e
+
+        # The file is gone from Drive, upload a fresh copy
+        file_io.seek(0)
+        return upload_to_drive(file_io, new_name, folder_id, mimetype=mimetype)
+
+    # Renames and new modification times show up in the listing
+    invalidate_folder(*file.get("parents", []))
+    invalidate_file(file_id)
     return {"name": file.get("name"), "id": file.get("id")}
 
 
 def set_file_permissions(file_id):
     """Set permissions for a file in Google Drive."""
     service = build_drive_service()
-    permission = {"type": "anyone", "role": "reader"}
-    service.permissions().create(fileId=file_id, body=permission).execute()
+    execute(service.permissions().create(fileId=file_id, body=ANYONE_READER))
+
+
+class DriveBatch:
+    """
+    Collects Drive requests and sends them as batch HTTP requests.
+
+    Requests are sent in groups of up to BATCH_LIMIT sub-requests. Every
+    request is added under a key, and `execute()` returns the responses and
+    errors keyed the same way, so one failing item does not fail the rest.
+    Items that were rate limited or hit a transient error are sent again in
+    a later batch after a backoff.
+    """
+
+    def __init__(self, service=None):
+        self.service = service or build_drive_service()
+        self._requests = []
+
+    def __len__(self):
+        return len(self._requests)
+
+    def add(self, key, request):
+        self._requests.append((key, request))
+
+    def execute(self):
+        """
+        Send every queued request.
+
+        Returns:
+            tuple: ({key: response}, {key: exception})
+        """
+        results = {}
+        errors = {}
+        pending = self._requests
+        attempt = 0
+
+        while pending:
+            retry = []
+            delay = 0
+            for start in range(0, len(pending), BATCH_LIMIT):
+                chunk = pending[start : start + BATCH_LIMIT]
+                failed = self.send(chunk, results)
+
+                for key, request in chunk:
+                    if key not in failed:
+                        continue
+                    item_delay = retry_delay(failed[key], attempt)
+                    if item_delay is None:
+                        errors[key] = failed[key]
+                    else:
+                        retry.append((key, request))
+                        delay = max(delay, item_delay)
+
+            if retry:
+                stats.add(retries=len(retry), backoff_seconds=delay)
+                time.sleep(delay)
+                attempt += 1
+            pending = retry
+
+        self._requests = []
+        return results, errors
+
+    def send(self, chunk, results):
+        """Send one batch HTTP request; return {key: exception} of failed items."""
+        keys = {str(index): key for index, (key, _) in enumerate(chunk)}
+        failed = {}
+
+        def callback(request_id, response, exception):
+            key = keys[request_id]
+            if exception is not None:
+                failed[key] = exception
+            else:
+                results[key] = response
+
+        batch = self.service.new_batch_http_request(callback=callback)
+        for index, (_, request) in enumerate(chunk):
+            batch.add(request, request_id=str(index))
+
+        # Drive counts every sub-request against the quota
+        stats.add(
+            requests=len(chunk), throttled_seconds=get_limiter().acquire(len(chunk))
+        )
+        try:
+            batch.execute()
+        except Exception as e:
+            # The whole batch request failed, e.g. a network error
+            for key in keys.values():
+                failed.setdefault(key, e)
+        return failed
+
+
+def set_permissions_batch(file_ids, permission=None):
+    """
+    Grant a permission ("anyone reader" by default) on many files or folders.
+
+    Returns:
+        dict: file ID -> exception for every file that could not be shared
+    """
+    batch = DriveBatch()
+    for file_id in file_ids:
+        batch.add(
+            file_id,
+            batch.service.permissions().create(
+                fileId=file_id, body=permission or ANYONE_READER, fields="id"
+            ),
+        )
+    _, errors = batch.execute()
+    return errors
+
+
+def delete_permissions_batch(permissions):
+    """
+    Remove permissions given as (file ID, permission ID) pairs.
+
+    Returns:
+        dict: (file ID, permission ID) -> exception for every failed removal
+    """
+    batch = DriveBatch()
+    for file_id, permission_id in permissions:
+        batch.add(
+            (file_id, permission_id),
+            batch.service.permissions().delete(
+                fileId=file_id, permissionId=permission_id
+            ),
+        )
+    _, errors = batch.execute()
+    return errors
+
+
+def get_files_metadata(file_ids, fields="id, name, mimeType, parents"):
+    """
+    Fetch metadata for many files at once.
+
+    Returns:
+        tuple: ({file ID: metadata}, {file ID: exception})
+    """
+    batch = DriveBatch()
+    for file_id in file_ids:
+        batch.add(file_id, batch.service.files().get(fileId=file_id, fields=fields))
+    return batch.execute()
+
 
+def iter_folder_files(folder_id, fields="id, name", page_size=LIST_PAGE_SIZE):
+    """
+    Yield every file in a Drive folder, fetching pages only as they are needed.
 
-def get_file_to_folder(folder_id):
-    """Retrieve files from a specific folder in Google Drive."""
+    Follows `nextPageToken`, so large folders are listed completely.
+    """
     service = build_drive_service()
     query = f"'{folder_id}' in parents and trashed=false"
-    results = service.files().list(q=query, fields="files(id, name)").execute()
-    files = results.get("files", [])
+    page_token = None
+
+    while True:
+        results = execute(
+            service.files().list(
+                q=query,
+                fields=f"nextPageToken, files({fields})",
+                pageSize=page_size,
+                pageToken=page_token,
+            )
+        )
+        yield from results.get("files", [])
+
+        page_token = results.get("nextPageToken")
+        if not page_token:
+            break
+
+
+def get_file_to_folder(folder_id, refresh=False):
+    """
+    Retrieve files from a specific folder in Google Drive.
+
+    The listing is cached for DRIVE_FOLDER_CACHE_TTL seconds and dropped
+    whenever this module uploads, updates or deletes a file in the folder.
+    `refresh=True` bypasses the cache.
+    """
+    key = folder_cache_key(folder_id)
+    if not refresh:
+        files = cache.get(key)
+        if files is not None:
+            return files
+
+    files = list(iter_folder_files(folder_id))
+    cache.set(key, files, timeout=settings.DRIVE_FOLDER_CACHE_TTL)
     return files
 
 
-def delete_file(file_id):
-    """Delete a file from Google Drive."""
+def get_changes_start_token():
+    """Page token from which `list_changes` reports later changes."""
+    service = build_drive_service()
+    return execute(service.changes().getStartPageToken())["startPageToken"]
+
+
+def list_changes(page_token, fields=CHANGE_FIELDS, page_size=LIST_PAGE_SIZE):
+    """
+    Fetch every change recorded after `page_token`, following all pages.
+
+    Returns:
+        tuple: (list of changes, token to resume from on the next call)
+    """
+    service = build_drive_service()
+    changes = []
+
+    while True:
+        results = execute(
+            service.changes().list(
+                pageToken=page_token,
+                fields=f"nextPageToken, newStartPageToken, changes({fields})",
+                pageSize=page_size,
+                includeRemoved=True,
+                spaces="drive",
+            )
+        )
+        changes.extend(results.get("changes", []))
+
+        if "newStartPageToken" in results:
+            return changes, results["newStartPageToken"]
+        page_token = results["nextPageToken"]
+
+
+def delete_file(file_id, folder_id=None):
+    """
+    Delete a file from Google Drive.
+
+    `folder_id` is the folder the file is in, whose cached listing is dropped.
+    """
     service = build_drive_service()
-    service.files().delete(fileId=file_id).execute()
+    execute(service.files().delete(fileId=file_id))
+    invalidate_folder(folder_id)
+    invalidate_file(file_id)
+
+
+def get_file_metadata(file_id, refresh=False):
+    """
+    A file's name, mimeType, size and modifiedTime, cached for
+    DRIVE_FILE_CACHE_TTL seconds.
+
+    modifiedTime identifies the file's current content, e.g. to key a cache
+    of downloads. Changes made through this module drop the cached entry.
+    """
+    key = file_cache_key(file_id)
+    if not refresh:
+        file = cache.get(key)
+        if file is not None:
+            return file
+
+    service = build_drive_service()
+    file = execute(
+        service.files().get(
+            fileId=file_id, fields="id, name, mimeType, size, modifiedTime"
+        )
+    )
+    cache.set(key, file, timeout=settings.DRIVE_FILE_CACHE_TTL)
+    return file
+
+
+def download_to(file_id, file_io, chunk_size=10 * 1024 * 1024):
+    """Stream a file's content into `file_io`, one chunk in memory at a time."""
+    service = build_drive_service()
+    downloader = MediaIoBaseDownload(
+        file_io, service.files().get_media(fileId=file_id), chunksize=chunk_size
+    )
+    done = False
+    while not done:
+        _, done = with_retries(downloader.next_chunk)
 
 
 def download_file(file_id):
@@ -137,28 +640,9 @@ def download_file(file_id):
         bytes: The file content as bytes, or None if download fails
     """
     try:
-        service = build_drive_service()
-
-        # Get file metadata to confirm it exists
-        file = service.files().get(fileId=file_id).execute()
-        if not file:
-            print(f"File with ID {file_id} not found")
-            return None
-
-        # Get download URL
-        request = service.files().get_media(fileId=file_id)
-
-        # Create a BytesIO stream
+        # A missing file fails the media request itself, no need to look it up first
         file_content = BytesIO()
-
-        # Use the Google API client to download the file
-        downloader = MediaIoBaseDownload(file_content, request)
-
-        done = False
-        while not done:
-            status, done = downloader.next_chunk()
-
-        # Return the file content as bytes
+        download_to(file_id, file_content)
         return file_content.getvalue()
 
     except Exception as e:
@@ -0,0 +1,121 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket shared by every caller of an API.
+
+    Up to `burst` requests may go out at once, after which requests are
+    spaced to `rate` per second. `pause()` holds every caller back, e.g.
+    when the API reports that the quota is exhausted.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or max(1, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """
+        Wait until `tokens` requests may be sent.
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        if self.rate <= 0:
+            return 0.0
+
+        waited = 0.0
+        # More than a full bucket (e.g. a large batch) is taken in parts
+        while tokens > self.capacity:
+            waited += self.acquire(self.capacity)
+            tokens -= self.capacity
+
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+
+                if now < self.paused_until:
+                    delay = self.paused_until - now
+                elif self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+                else:
+                    delay = (tokens - self.tokens) / self.rate
+
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds):
+        """Let no request through for the next `seconds`."""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0.0
+
+
+class RetryStats:
+    """Counters of what rate limiting and retries cost, safe across threads."""
+
+    FIELDS = ("requests", "retries", "failures", "throttled_seconds", "backoff_seconds")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.values = dict.fromkeys(self.FIELDS, 0)
+
+    def add(self, **amounts):
+        with self.lock:
+            for field, amount in amounts.items():
+                self.values[field] += amount
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.values)
+
+
+class RetryPolicy:
+    """
+    Jittered exponential backoff.
+
+    Attempt n waits a random time between 0 and min(max_delay, base * 2**n)
+    ("full jitter"), unless the server said how long to wait.
+    """
+
+    def __init__(self, max_retries=6, base_delay=1.0, max_delay=64.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (seconds or an HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
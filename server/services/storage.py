@@ -0,0 +1,328 @@
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from urllib.parse import quote
+
+from django.conf import settings
+from googleapiclient.errors import HttpError
+
+from employee.helper.file_links import sign_file_link
+from services import drive_services
+
+# Folder and file IDs double as path components in LocalStorage
+SAFE_ID = re.compile(r"^[A-Za-z0-9_-]+$")
+
+# Bytes copied per read when writing or downloading a file
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+class DocumentStorage(ABC):
+    """
+    Where employee documents are kept.
+
+    Files live in folders (one per employee) and are addressed by the ID
+    returned when they are stored. Methods that store a file return a dict
+    with its "name" and "id", like the Drive helpers always have.
+    """
+
+    @abstractmethod
+    def create_folder(self, name, parent_id=None, share=True):
+        """Create a folder and return its ID."""
+
+    @abstractmethod
+    def put(self, file_io, name, folder_id, mimetype=None, share=None):
+        """Store a new file in a folder."""
+
+    @abstractmethod
+    def replace(self, file_id, file_io=None, name=None, folder_id=None, mimetype=None):
+        """
+        Replace a file's content and/or name, keeping its ID.
+
+        A file that no longer exists is stored again in `folder_id` under a
+        new ID. Returns None when neither content nor name is given.
+        """
+
+    @abstractmethod
+    def delete(self, file_id, folder_id=None):
+        """Delete a file from its folder."""
+
+    @abstractmethod
+    def list(self, folder_id, refresh=False):
+        """Files in a folder, as dicts with "id" and "name"."""
+
+    @abstractmethod
+    def metadata(self, file_id):
+        """
+        A file's "name", "mimetype", "size" (bytes) and "version", a string
+        that changes whenever the content does.
+
+        Raises:
+            FileNotFoundError: The file does not exist
+        """
+
+    @abstractmethod
+    def open_stream(self, file_id):
+        """
+        Open a file's content for reading; the caller closes it.
+
+        Raises:
+            FileNotFoundError: The file does not exist
+        """
+
+    def download_to(self, file_id, file_io):
+        """Copy a file's content into a writable file object."""
+        with self.open_stream(file_id) as stream:
+            shutil.copyfileobj(stream, file_io, COPY_BUFFER_SIZE)
+
+    def local_path(self, file_id):
+        """Path of the file on this server's disk, or None if it is remote."""
+        return None
+
+    def share(self, ids):
+        """
+        Make files or folders readable through their link.
+
+        Returns:
+            dict: ID -> exception for everything that could not be shared
+        """
+        return {}
+
+    @abstractmethod
+    def file_link(self, file_id):
+        """URL users open to view a file."""
+
+
+class DriveStorage(DocumentStorage):
+    """Documents in Google Drive, shared with "anyone with the link"."""
+
+    def create_folder(self, name, parent_id=None, share=True):
+        return drive_services.create_folder(name, parent_id, share=share)
+
+    def put(self, file_io, name, folder_id, mimetype=None, share=None):
+        return drive_services.upload_to_drive(
+            file_io, name, folder_id, share=share, mimetype=mimetype
+        )
+
+    def replace(self, file_id, file_io=None, name=None, folder_id=None, mimetype=None):
+        return drive_services.update_file(
+            file_id, file_io, name, folder_id=folder_id, mimetype=mimetype
+        )
+
+    def delete(self, file_id, folder_id=None):
+        drive_services.delete_file(file_id, folder_id=folder_id)
+
+    def list(self, folder_id, refresh=False):
+        return drive_services.get_file_to_folder(folder_id, refresh=refresh)
+
+    def metadata(self, file_id):
+        try:
+            file = drive_services.get_file_metadata(file_id)
+        except HttpError as e:
+            if e.resp.status == 404:
+                raise FileNotFoundError(file_id) from e
+            raise
+        return {
+            "name": file["name"],
+            "mimetype": file.get("mimeType", "application/octet-stream"),
+            "size": int(file.get("size", 0)),
+            "version": file.get("modifiedTime", ""),
+        }
+
+    def open_stream(self, file_id):
+        """Download into a temporary file, kept in memory only while small."""
+        stream = tempfile.SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        )
+        try:
+            self.download_to(file_id, stream)
+        except HttpError as e:
+            stream.close()
+            if e.resp.status == 404:
+                raise FileNotFoundError(file_id) from e
+            raise
+        stream.seek(0)
+        return stream
+
+    def download_to(self, file_id, file_io):
+        drive_services.download_to(file_id, file_io, chunk_size=COPY_BUFFER_SIZE * 10)
+
+    def share(self, ids):
+        return drive_services.set_permissions_batch(ids)
+
+    def file_link(self, file_id):
+        return f"https://drive.google.com/file/d/{file_id}/view?usp=sharing"
+
+
+class LocalStorage(DocumentStorage):
+    """
+    Documents on the local filesystem under `root`.
+
+    Every folder is a directory and every file is stored next to a small
+    JSON sidecar holding its name and type. A file's ID embeds its folder ID
+    (`<folder>_<hex>`), so it is found without any index. Writes go to a
+    temporary file that is renamed over the target, so readers never see a
+    partial file.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def folder_path(self, folder_id):
+        if not folder_id or not SAFE_ID.match(folder_id):
+            raise ValueError(f"Invalid folder ID: {folder_id!r}")
+        return os.path.join(self.root, folder_id)
+
+    def file_path(self, file_id):
+        if not file_id or not SAFE_ID.match(file_id) or "_" not in file_id:
+            raise FileNotFoundError(file_id)
+        folder_id = file_id.rsplit("_", 1)[0]
+        return os.path.join(self.folder_path(folder_id), file_id)
+
+    def write_atomic(self, path, source):
+        """Write `source` (bytes or a file object) to `path` in one rename."""
+        directory = os.path.dirname(path)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as temp:
+                if isinstance(source, bytes):
+                    temp.write(source)
+                else:
+                    shutil.copyfileobj(source, temp, COPY_BUFFER_SIZE)
+                temp.flush()
+                os.fsync(temp.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def write_meta(self, file_id, meta):
+        self.write_atomic(
+            f"{self.file_path(file_id)}.json", json.dumps(meta).encode("utf-8")
+        )
+
+    def read_meta(self, file_id):
+        try:
+            with open(f"{self.file_path(file_id)}.json", encoding="utf-8") as meta:
+                return json.load(meta)
+        except FileNotFoundError:
+            return {}
+
+    def create_folder(self, name, parent_id=None, share=True):
+        folder_id = uuid.uuid4().hex
+        os.makedirs(self.folder_path(folder_id))
+        self.write_atomic(
+            os.path.join(self.folder_path(folder_id), ".folder.json"),
+            json.dumps({"name": name, "parent": parent_id}).encode("utf-8"),
+        )
+        return folder_id
+
+    def put(self, file_io, name, folder_id, mimetype=None, share=None):
+        os.makedirs(self.folder_path(folder_id), exist_ok=True)
+        file_id = f"{folder_id}_{uuid.uuid4().hex}"
+
+        self.write_atomic(self.file_path(file_id), file_io)
+        self.write_meta(
+            file_id,
+            {"name": name, "mimetype": mimetype or "application/octet-stream"},
+        )
+        return {"name": name, "id": file_id}
+
+    def replace(self, file_id, file_io=None, name=None, folder_id=None, mimetype=None):
+        if not file_io and not name:
+            return None
+
+        if not os.path.exists(self.file_path(file_id)):
+            if not folder_id or not file_io:
+                raise Exception(f"File not found: {file_id}")
+            return self.put(file_io, name, folder_id, mimetype=mimetype)
+
+        if file_io:
+            self.write_atomic(self.file_path(file_id), file_io)
+
+        meta = self.read_meta(file_id)
+        if name:
+            meta["name"] = name
+        if mimetype:
+            meta["mimetype"] = mimetype
+        self.write_meta(file_id, meta)
+
+        return {"name": meta.get("name", file_id), "id": file_id}
+
+    def delete(self, file_id, folder_id=None):
+        path = self.file_path(file_id)
+        if not os.path.exists(path):
+            raise Exception(f"File not found: {file_id}")
+        for stale in (f"{path}.json", path):
+            try:
+                os.remove(stale)
+            except FileNotFoundError:
+                pass
+
+    def list(self, folder_id, refresh=False):
+        try:
+            entries = list(os.scandir(self.folder_path(folder_id)))
+        except FileNotFoundError:
+            return []
+
+        return [
+            {"id": entry.name, "name": self.read_meta(entry.name).get("name", "")}
+            for entry in sorted(entries, key=lambda entry: entry.name)
+            if entry.is_file()
+            and not entry.name.startswith(".")
+            and not entry.name.endswith(".json")
+        ]
+
+    def metadata(self, file_id):
+        stat = os.stat(self.file_path(file_id))
+        meta = self.read_meta(file_id)
+        return {
+            "name": meta.get("name", file_id),
+            "mimetype": meta.get("mimetype", "application/octet-stream"),
+            "size": stat.st_size,
+            "version": f"{stat.st_mtime_ns:x}-{stat.st_size:x}",
+        }
+
+    def open_stream(self, file_id):
+        return open(self.file_path(file_id), "rb")
+
+    def local_path(self, file_id):
+        return self.file_path(file_id)
+
+    def file_link(self, file_id):
+        # Opened directly in a browser, so the link carries a short-lived token
+        token = quote(sign_file_link(file_id))
+        return (
+            f"{settings.DOCUMENT_STORAGE_BASE_URL}/employee/files/{file_id}/content/"
+            f"?token={token}"
+        )
+
+
+BACKENDS = {"drive": DriveStorage, "local": LocalStorage}
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage():
+    """The document storage selected by DOCUMENT_STORAGE_BACKEND."""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                backend = settings.DOCUMENT_STORAGE_BACKEND
+                if backend not in BACKENDS:
+                    raise Exception(f"Unknown document storage backend: {backend}")
+                if backend == "local":
+                    _storage = LocalStorage(settings.DOCUMENT_STORAGE_ROOT)
+                else:
+                    _storage = BACKENDS[backend]()
+    return _storage
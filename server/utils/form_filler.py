@@ -0,0 +1,385 @@
+import inspect
+import threading
+from collections import defaultdict, namedtuple
+from io import BytesIO
+
+import pypdf
+from pypdf import PdfWriter
+from pypdf.constants import FieldDictionaryAttributes as FA
+from pypdf.generic import (
+    ByteStringObject,
+    DecodedStreamObject,
+    DictionaryObject,
+    IndirectObject,
+    NameObject,
+    RectangleObject,
+    TextStringObject,
+)
+
+from .pdf_compact import flatten_pdf
+from .pdf_templates import get_template, qualified_field_name, field_type
+
+# The fill plan builds appearance streams with pypdf internals, which is why
+# pypdf is pinned in requirements.txt. They are checked on import, so an
+# upgrade that changes them fails here instead of rendering broken forms.
+PYPDF_INTERNALS_ERROR = (
+    "utils.form_filler needs private pypdf APIs ({}) that pypdf {} does not "
+    "provide; install the version pinned in requirements.txt"
+)
+
+try:
+    from pypdf._cmap import _default_fonts_space_width, build_char_map_from_dict
+    from pypdf._writer import (
+        DEFAULT_FONT_HEIGHT_IN_MULTILINE,
+        generate_appearance_stream,
+    )
+except ImportError as e:
+    raise ImportError(PYPDF_INTERNALS_ERROR.format(e, pypdf.__version__)) from e
+
+
+def check_pypdf_internals():
+    """Raise ImportError unless pypdf has the private APIs used below."""
+    missing = [
+        f"PdfWriter.{name}"
+        for name in ("_objects", "_add_object")
+        if not hasattr(PdfWriter(), name)
+    ]
+    if list(inspect.signature(generate_appearance_stream).parameters) != [
+        "txt",
+        "sel",
+        "da",
+        "font_full_rev",
+        "rct",
+        "font_height",
+        "y_offset",
+    ]:
+        missing.append("generate_appearance_stream() signature")
+    if missing:
+        raise ImportError(
+            PYPDF_INTERNALS_ERROR.format(", ".join(missing), pypdf.__version__)
+        )
+
+
+check_pypdf_internals()
+
+# Appearance stream keys that are always rebuilt rather than copied
+AP_REBUILT_KEYS = {"/BBox", "/Length", "/Subtype", "/Type", "/Filter"}
+
+TextWidget = namedtuple(
+    "TextWidget",
+    [
+        "annot_index",
+        "field_name",
+        "owns_field",
+        "da",
+        "rect",
+        "font_name",
+        "font_from_acroform",
+        "font_rev",
+        "font_height",
+        "y_offset",
+    ],
+)
+CheckboxWidget = namedtuple(
+    "CheckboxWidget", ["annot_index", "field_name", "owns_field", "states"]
+)
+
+
+def checkbox_value(value):
+    """Coerce a submitted checkbox value to the state name it selects."""
+    if isinstance(value, bool) or value is None:
+        return "/"
+    return f"/{str(value).lower()}"
+
+
+def text_value(value, blank=""):
+    """Coerce a submitted value to the text shown in a field."""
+    if value is None or value is False:
+        return blank
+    value = str(value)
+    return value if len(value) > 0 else blank
+
+
+def escape_text(text):
+    # Escape parentheses (PDF 1.7 reference, table 3.2, Literal Strings)
+    return text.replace("\\", "\\\\").replace("(", r"\(").replace(")", r"\)")
+
+
+def font_reverse_map(font_res):
+    """Build the unicode -> glyph code map used to encode appearance text."""
+    _, _, font_encoding, font_map = build_char_map_from_dict(200, font_res)
+    font_map.pop(-1, None)
+
+    if isinstance(font_encoding, str):
+        return {v: k.encode(font_encoding) for k, v in font_map.items()}
+
+    font_rev = {v: bytes((k,)) for k, v in font_encoding.items()}
+    encoding_rev = dict(font_rev)
+    for key, value in font_map.items():
+        font_rev[value] = encoding_rev.get(key, key)
+    return font_rev
+
+
+class FormFillPlan:
+    """
+    A template compiled into a field -> page/widget plan.
+
+    Compiling resolves, once per template, everything pypdf would otherwise
+    recompute for every widget on every fill: which page owns each field,
+    the default appearance string, widget geometry and the font encoding map.
+    `fill()` then sets all values for a page in a single pass over only the
+    widgets that page owns.
+    """
+
+    def __init__(self, template):
+        self.template = template
+        self.pages = defaultdict(list)
+        self.fallback = defaultdict(set)
+        self._font_maps = {}
+        self._compile()
+
+    def _compile(self):
+        reader = self.template.reader
+        acroform = reader.trailer["/Root"].get("/AcroForm", DictionaryObject())
+        acroform = acroform.get_object()
+        acroform_dr = acroform.get("/DR", DictionaryObject()).get_object()
+        acroform_fonts = acroform_dr.get("/Font", DictionaryObject()).get_object()
+
+        for page_index, page in enumerate(reader.pages):
+            for annot_index, annotation in enumerate(page.get("/Annots", None) or []):
+                annotation = annotation.get_object()
+                if annotation.get("/Subtype") != "/Widget":
+                    continue
+
+                name = qualified_field_name(annotation)
+                ftype = field_type(annotation)
+                owns_field = "/T" in annotation
+
+                if ftype == "/Btn":
+                    states = set(annotation.get("/AP", {}).get("/N", {}).keys())
+                    self.pages[page_index].append(
+                        CheckboxWidget(annot_index, name, owns_field, states)
+                    )
+                elif ftype == "/Tx":
+                    self.pages[page_index].append(
+                        self._compile_text_widget(
+                            annot_index,
+                            name,
+                            owns_field,
+                            annotation,
+                            acroform,
+                            acroform_fonts,
+                        )
+                    )
+                elif ftype == "/Ch":
+                    # Choice fields are rare in our forms; let pypdf fill them
+                    self.fallback[page_index].add(name)
+
+    def _compile_text_widget(
+        self, annot_index, name, owns_field, annotation, acroform, acroform_fonts
+    ):
+        _rect = annotation["/Rect"]
+        rect = RectangleObject(
+            (0, 0, abs(_rect[2] - _rect[0]), abs(_rect[3] - _rect[1]))
+        )
+
+        da = annotation.get_inherited("/DA", acroform.get("/DA", None))
+        da = "/Helv 0 Tf 0 g" if da is None else da.get_object()
+        font_properties = [
+            x for x in da.replace("\n", " ").replace("\r", " ").split(" ") if x
+        ]
+        tf = font_properties.index("Tf")
+        font_name = font_properties[tf - 2]
+        font_height = float(font_properties[tf - 1])
+        if font_height == 0:
+            if annotation.get_inherited(FA.Ff, 0) & FA.FfBits.Multiline:
+                font_height = DEFAULT_FONT_HEIGHT_IN_MULTILINE
+            else:
+                font_height = rect.height - 2
+        font_properties[tf - 1] = str(font_height)
+
+        local_dr = annotation.get_inherited("/DR", None)
+        fonts = DictionaryObject()
+        if local_dr is not None:
+            fonts = local_dr.get_object().get("/Font", DictionaryObject()).get_object()
+        font_from_acroform = (
+            font_name not in fonts and font_name not in _default_fonts_space_width
+        ) or local_dr is None
+        if font_from_acroform:
+            fonts = acroform_fonts
+
+        font_res = fonts.get(font_name, None)
+        font_rev = {}
+        if font_res is not None:
+            font_res = font_res.get_object()
+            key = (font_from_acroform, font_name, id(font_res))
+            if key not in self._font_maps:
+                self._font_maps[key] = font_reverse_map(font_res)
+            font_rev = self._font_maps[key]
+
+        return TextWidget(
+            annot_index,
+            name,
+            owns_field,
+            " ".join(font_properties),
+            rect,
+            font_name if font_res is not None else None,
+            font_from_acroform,
+            font_rev,
+            font_height,
+            rect.height - 1 - font_height,
+        )
+
+    def fill(self, values, blank="", fill_missing=True, flatten=False):
+        """
+        Fill the form and return the PDF as a BytesIO.
+
+        Args:
+            values: Mapping of field name to submitted value
+            blank: Text written to text fields whose value is empty
+            fill_missing: Also write `blank` into fields absent from `values`
+            flatten: Bake the fields into the pages and drop the form, see
+                `utils.pdf_compact.flatten_pdf`
+
+        Returns:
+            BytesIO: The filled PDF, positioned at the start
+        """
+        writer = self.fill_writer(values, blank, fill_missing)
+
+        output_pdf = BytesIO()
+        writer.write(output_pdf)
+        output_pdf.seek(0)
+
+        if flatten:
+            return flatten_pdf(output_pdf)
+        return output_pdf
+
+    def fill_writer(self, values, blank="", fill_missing=True):
+        """Fill a fresh clone of the template and return the PdfWriter."""
+        writer = self.template.clone_writer()
+        writer.set_need_appearances_writer(True)
+
+        acroform = writer._root_object["/AcroForm"]
+        acroform_fonts = (
+            acroform.get("/DR", DictionaryObject())
+            .get_object()
+            .get("/Font", DictionaryObject())
+            .get_object()
+        )
+
+        for page_index, widgets in self.pages.items():
+            page = writer.pages[page_index]
+            annotations = page["/Annots"]
+
+            for widget in widgets:
+                if widget.field_name not in values and not fill_missing:
+                    continue
+                value = values.get(widget.field_name, "")
+
+                annotation = annotations[widget.annot_index].get_object()
+                parent = (
+                    annotation
+                    if widget.owns_field
+                    else annotation["/Parent"].get_object()
+                )
+
+                if isinstance(widget, CheckboxWidget):
+                    state = checkbox_value(value)
+                    if state not in widget.states:
+                        state = "/Off"
+                    parent[NameObject("/V")] = NameObject(state)
+                    annotation[NameObject("/AS")] = NameObject(state)
+                else:
+                    text = text_value(value, blank)
+                    parent[NameObject("/V")] = TextStringObject(text)
+                    self._write_appearance(
+                        writer, annotation, widget, text, acroform_fonts
+                    )
+
+            fallback = {
+                name: text_value(values.get(name, ""), blank)
+                for name in self.fallback.get(page_index, ())
+                if name in values or fill_missing
+            }
+            if fallback:
+                writer.update_page_form_field_values(
+                    page, fallback, auto_regenerate=None
+                )
+
+        return writer
+
+    def _write_appearance(self, writer, annotation, widget, text, acroform_fonts):
+        """Replace a text widget's /AP /N stream with one showing `text`."""
+        ap_stream = generate_appearance_stream(
+            escape_text(text),
+            [],
+            widget.da,
+            widget.font_rev,
+            widget.rect,
+            widget.font_height,
+            widget.y_offset,
+        )
+
+        dct = DecodedStreamObject.initialize_from_dictionary(
+            {
+                NameObject("/Type"): NameObject("/XObject"),
+                NameObject("/Subtype"): NameObject("/Form"),
+                NameObject("/BBox"): widget.rect,
+                "__streamdata__": ByteStringObject(ap_stream),
+                "/Length": 0,
+            }
+        )
+
+        appearance = annotation.get("/AP")
+        if appearance is not None:
+            for key, value in appearance.get("/N", {}).items():
+                if key not in AP_REBUILT_KEYS:
+                    dct[key] = value
+
+        if widget.font_name is not None:
+            fonts = acroform_fonts
+            if not widget.font_from_acroform:
+                fonts = annotation.get_inherited("/DR", None).get_object()
+                fonts = fonts["/Font"].get_object()
+            # Keep the indirect reference so the font is not inlined per field
+            font_res = fonts.raw_get(widget.font_name)
+            dct[NameObject("/Resources")] = DictionaryObject(
+                {
+                    NameObject("/Font"): DictionaryObject(
+                        {NameObject(widget.font_name): font_res}
+                    )
+                }
+            )
+
+        if appearance is None:
+            annotation[NameObject("/AP")] = DictionaryObject(
+                {NameObject("/N"): writer._add_object(dct)}
+            )
+        elif not isinstance(appearance.raw_get("/N"), IndirectObject):
+            appearance[NameObject("/N")] = writer._add_object(dct)
+        else:
+            # Reuse the existing object number so the old stream is dropped
+            idnum = appearance.raw_get("/N").idnum
+            writer._objects[idnum - 1] = dct
+            dct.indirect_reference = IndirectObject(idnum, 0, writer)
+
+
+_plans = {}
+_plans_lock = threading.Lock()
+
+
+def get_fill_plan(name):
+    """Return the compiled FormFillPlan for a template, compiling it once."""
+    template = get_template(name)
+
+    plan = _plans.get(template.path)
+    if plan is not None and plan.template is template:
+        return plan
+
+    with _plans_lock:
+        plan = _plans.get(template.path)
+        if plan is None or plan.template is not template:
+            plan = FormFillPlan(template)
+            _plans[template.path] = plan
+
+    return plan
@@ -0,0 +1,41 @@
+from io import BytesIO
+
+import fitz
+
+
+def flatten_pdf(pdf_io, subset_fonts=True):
+    """
+    Flatten a filled form into plain page content and write it compactly.
+
+    Every widget's appearance is drawn into its page and the widgets and
+    /AcroForm dictionary are removed, so viewers no longer regenerate field
+    appearances. Duplicate objects (fonts, images) are merged, embedded fonts
+    are subset to the glyphs actually used and everything is written into
+    compressed object streams.
+
+    Args:
+        pdf_io: BytesIO (or bytes) holding the filled PDF
+        subset_fonts: Keep only the glyphs the document uses
+
+    Returns:
+        BytesIO: The flattened PDF, positioned at the start
+    """
+    data = pdf_io.getvalue() if hasattr(pdf_io, "getvalue") else pdf_io
+
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        doc.bake(annots=True, widgets=True)
+        if subset_fonts:
+            doc.subset_fonts()
+
+        output_pdf = BytesIO(
+            doc.tobytes(
+                garbage=4,
+                deflate=True,
+                deflate_fonts=True,
+                deflate_images=True,
+                use_objstms=1,
+            )
+        )
+
+    output_pdf.seek(0)
+    return output_pdf
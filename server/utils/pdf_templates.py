@@ -0,0 +1,140 @@
+import hashlib
+import os
+import threading
+from collections import namedtuple
+from io import BytesIO
+from pathlib import Path
+
+from pypdf import PdfReader, PdfWriter
+
+STATIC_DIR = Path(__file__).resolve().parent.parent / "static"
+
+# Known form templates, keyed by the name callers use to look them up
+TEMPLATE_PATHS = {
+    "pds": STATIC_DIR / "pdfs" / "PDS_CS_Form_No_212_Revised2017.pdf",
+    "service_record": STATIC_DIR / "service_record.pdf",
+}
+
+FieldSpec = namedtuple("FieldSpec", ["name", "field_type", "pages"])
+
+
+def qualified_field_name(annotation):
+    """Return the fully qualified name of a widget's field (parent.child)."""
+    if "/TM" in annotation:
+        return annotation["/TM"]
+
+    parts = []
+    node = annotation
+    while node is not None:
+        if "/T" in node:
+            parts.append(node["/T"])
+        parent = node.get("/Parent")
+        node = parent.get_object() if parent is not None else None
+
+    return ".".join(reversed(parts))
+
+
+def field_type(annotation):
+    """Return the /FT of a widget, following /Parent links when inherited."""
+    node = annotation
+    while node is not None:
+        if "/FT" in node:
+            return node["/FT"]
+        parent = node.get("/Parent")
+        node = parent.get_object() if parent is not None else None
+    return None
+
+
+class PdfTemplate:
+    """
+    A fillable PDF form parsed once and shared by every request in the process.
+
+    The file is read and parsed a single time. Callers get their own
+    PdfWriter through `clone_writer()`, so the shared reader is never mutated.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._lock = threading.Lock()
+
+        self.mtime = os.path.getmtime(self.path)
+        with open(self.path, "rb") as file:
+            data = file.read()
+
+        self.size = len(data)
+        self.digest = hashlib.sha256(data).hexdigest()
+        # A BytesIO over bytes shares their buffer until written to
+        self.reader = PdfReader(BytesIO(data))
+        self.fields = self._build_catalogue()
+
+        # Resolve every object up front so later clones never hit the stream
+        PdfWriter(clone_from=self.reader)
+
+    def _build_catalogue(self):
+        """Map each field name to its type and the pages that own its widgets."""
+        catalogue = {}
+        for page_index, page in enumerate(self.reader.pages):
+            for annotation in page.get("/Annots", None) or []:
+                annotation = annotation.get_object()
+                if annotation.get("/Subtype") != "/Widget":
+                    continue
+
+                name = qualified_field_name(annotation)
+                if not name:
+                    continue
+
+                spec = catalogue.get(name)
+                pages = spec.pages if spec else ()
+                if page_index not in pages:
+                    pages = pages + (page_index,)
+                catalogue[name] = FieldSpec(name, field_type(annotation), pages)
+
+        return catalogue
+
+    @property
+    def page_count(self):
+        return len(self.reader.pages)
+
+    def is_stale(self):
+        """Whether the file on disk changed since it was loaded."""
+        try:
+            return os.path.getmtime(self.path) != self.mtime
+        except OSError:
+            return False
+
+    def clone_writer(self):
+        """Return a new PdfWriter holding an independent copy of the form."""
+        with self._lock:
+            return PdfWriter(clone_from=self.reader)
+
+
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+def get_template(name):
+    """
+    Return the cached PdfTemplate for a registered name or a file path.
+
+    Templates are loaded on first use and reloaded if the file on disk is
+    replaced (e.g. when the CSC releases a revised form).
+    """
+    path = str(TEMPLATE_PATHS.get(name, name))
+
+    template = _templates.get(path)
+    if template is not None and not template.is_stale():
+        return template
+
+    with _templates_lock:
+        template = _templates.get(path)
+        if template is None or template.is_stale():
+            template = PdfTemplate(path)
+            _templates[path] = template
+
+    return template
+
+
+def warm_templates(*names):
+    """Load templates ahead of the first request (e.g. in a worker initializer)."""
+    for name in names or TEMPLATE_PATHS.keys():
+        get_template(name)
@@ -0,0 +1,208 @@
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from io import BytesIO
+
+from django.conf import settings
+
+
+class RenderCache:
+    """
+    A size-bounded on-disk cache of rendered files keyed by content hash.
+
+    Entries are written atomically and evicted least-recently-used first
+    (access time is tracked through the file's mtime).
+    """
+
+    suffix = ".pdf"
+
+    def __init__(self, directory, max_bytes):
+        self.directory = str(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}{self.suffix}")
+
+    def get(self, key):
+        """Return the cached file as a BytesIO, or None on a miss."""
+        path = self.path(key)
+        try:
+            with open(path, "rb") as file:
+                content = file.read()
+            os.utime(path)
+        except OSError:
+            return None
+
+        return BytesIO(content)
+
+    def put(self, key, file_io):
+        """Store a rendered file; the stream position is left unchanged."""
+        position = file_io.tell()
+        file_io.seek(0)
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                tmp.write(file_io.read())
+            os.replace(tmp_path, self.path(key))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        finally:
+            file_io.seek(position)
+
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits max_bytes."""
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.directory):
+                if not entry.name.endswith(self.suffix):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
+
+
+class DownloadCache(RenderCache):
+    """
+    A size-bounded LRU disk cache of downloaded documents.
+
+    Entries are keyed by file ID and version (e.g. Drive's modifiedTime), so
+    a replaced file is downloaded again; storing a new version drops the
+    older ones.
+    """
+
+    suffix = ".bin"
+    SAFE_ID = re.compile(r"^[A-Za-z0-9_-]+$")
+
+    def key(self, file_id, version):
+        if not self.SAFE_ID.match(file_id):
+            raise ValueError(f"Invalid file ID: {file_id!r}")
+        digest = hashlib.sha256(str(version).encode("utf-8")).hexdigest()[:16]
+        return f"{file_id}.{digest}"
+
+    def open(self, file_id, version):
+        """
+        Open the cached file for reading, or return None on a miss.
+
+        Returning an open file rather than a path keeps it readable even if
+        another process evicts the entry meanwhile.
+        """
+        path = self.path(self.key(file_id, version))
+        try:
+            stream = open(path, "rb")
+            os.utime(path)
+        except OSError:
+            return None
+        return stream
+
+    def store(self, file_id, version, download):
+        """
+        Cache a file written by `download(file_object)` and open it.
+
+        The download streams into a temporary file that is renamed into
+        place once complete, so a failed download leaves nothing behind.
+        """
+        key = self.key(file_id, version)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                download(tmp)
+            os.replace(tmp_path, self.path(key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        stream = open(self.path(key), "rb")
+        self.forget(file_id, keep=key)
+        self.evict()
+        return stream
+
+    def forget(self, file_id, keep=None):
+        """Remove the cached versions of a file (except `keep`)."""
+        prefix = f"{file_id}."
+        for entry in os.scandir(self.directory):
+            if (
+                entry.name.startswith(prefix)
+                and entry.name.endswith(self.suffix)
+                and entry.name != f"{keep}{self.suffix}"
+            ):
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+
+class ThumbnailCache(DownloadCache):
+    """Resized images, keyed like DownloadCache by "<file ID>-<size>" and version."""
+
+    suffix = ".jpg"
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_render_cache(name):
+    """Return the process-wide RenderCache stored under RENDER_CACHE_DIR/name."""
+    cache = _caches.get(name)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.get(name)
+            if cache is None:
+                cache = RenderCache(
+                    os.path.join(settings.RENDER_CACHE_DIR, name),
+                    settings.RENDER_CACHE_MAX_BYTES,
+                )
+                _caches[name] = cache
+    return cache
+
+
+_download_cache = None
+_thumbnail_cache = None
+
+
+def get_download_cache():
+    """Return the process-wide DownloadCache under DOWNLOAD_CACHE_DIR."""
+    global _download_cache
+    if _download_cache is None:
+        with _caches_lock:
+            if _download_cache is None:
+                _download_cache = DownloadCache(
+                    settings.DOWNLOAD_CACHE_DIR, settings.DOWNLOAD_CACHE_MAX_BYTES
+                )
+    return _download_cache
+
+
+def get_thumbnail_cache():
+    """Return the process-wide ThumbnailCache under THUMBNAIL_CACHE_DIR."""
+    global _thumbnail_cache
+    if _thumbnail_cache is None:
+        with _caches_lock:
+            if _thumbnail_cache is None:
+                _thumbnail_cache = ThumbnailCache(
+                    settings.THUMBNAIL_CACHE_DIR, settings.THUMBNAIL_CACHE_MAX_BYTES
+                )
+    return _thumbnail_cache
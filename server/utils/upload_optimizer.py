@@ -0,0 +1,369 @@
+import io
+import logging
+import multiprocessing
+import os
+import struct
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from io import BytesIO
+
+import fitz
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+JPEG_MIMETYPE = "image/jpeg"
+PDF_MIMETYPE = "application/pdf"
+
+# Leading bytes of the formats that are optimized
+SIGNATURES = {
+    b"\xff\xd8\xff": "image/jpeg",
+    b"\x89PNG\r\n\x1a\n": "image/png",
+    b"%PDF-": PDF_MIMETYPE,
+}
+
+# Scanned images carry no page size, so they are sized for the longest
+# common paper side (legal, 14 in) at the scan DPI
+SCAN_PAGE_INCHES = 14
+
+# Rotation for insert_image (counter-clockwise) of the EXIF orientations
+# phones write; mirrored orientations are left alone
+EXIF_ROTATION = {3: 180, 6: 270, 8: 90}
+
+# An image is only re-encoded when it shrinks by more than this factor
+MIN_SCALE_GAIN = 0.9
+
+
+@dataclass
+class OptimizedUpload:
+    file_io: object
+    mimetype: str
+    original_size: int
+    size: int
+
+
+class OptimizedFile(io.BufferedReader):
+    """A temporary file written by a worker, deleted once closed or collected."""
+
+    def __init__(self, path):
+        super().__init__(io.FileIO(path, "rb"))
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            try:
+                os.remove(self.name)
+            except FileNotFoundError:
+                pass
+
+
+def sniff_mimetype(head):
+    for signature, mimetype in SIGNATURES.items():
+        if head.startswith(signature):
+            return mimetype
+    return None
+
+
+def jpeg_orientation(data):
+    """The EXIF Orientation of a JPEG (1, upright, when absent)."""
+    position = 2
+    while position + 4 <= len(data) and data[position] == 0xFF:
+        marker = data[position + 1]
+        (length,) = struct.unpack(">H", data[position + 2 : position + 4])
+        segment = data[position + 4 : position + 2 + length]
+        if marker == 0xE1 and segment.startswith(b"Exif\x00\x00"):
+            tiff = segment[6:]
+            order = "<" if tiff[:2] == b"II" else ">"
+            (ifd,) = struct.unpack(order + "I", tiff[4:8])
+            (count,) = struct.unpack(order + "H", tiff[ifd : ifd + 2])
+            for index in range(count):
+                entry = tiff[ifd + 2 + index * 12 : ifd + 14 + index * 12]
+                tag, _, _, value = struct.unpack(order + "HHIH", entry[:10])
+                if tag == 0x0112:
+                    return value
+            return 1
+        if marker == 0xDA:
+            # Start of the image data, no metadata after this
+            break
+        position += 2 + length
+    return 1
+
+
+def resize_image(data, max_side):
+    """
+    Downsize an image to fit `max_side` pixels (it is never enlarged).
+
+    The EXIF orientation is applied and transparency is flattened onto
+    white.
+
+    Returns:
+        fitz.Pixmap: The resized image, gray or RGB like the source
+    """
+    pix = fitz.Pixmap(data)
+    rotate = (
+        EXIF_ROTATION.get(jpeg_orientation(data), 0) if data[:2] == b"\xff\xd8" else 0
+    )
+    width, height = (
+        (pix.height, pix.width) if rotate in (90, 270) else (pix.width, pix.height)
+    )
+
+    scale = min(1.0, max_side / max(width, height))
+    width, height = max(1, round(width * scale)), max(1, round(height * scale))
+
+    # Rendering onto a page of width x height points at 72 dpi resamples,
+    # rotates and flattens the image in one step
+    with fitz.open() as doc:
+        page = doc.new_page(width=width, height=height)
+        page.insert_image(page.rect, pixmap=pix, rotate=rotate, keep_proportion=False)
+        gray = pix.colorspace is not None and pix.colorspace.n == 1
+        return page.get_pixmap(
+            colorspace=fitz.csGRAY if gray else fitz.csRGB, alpha=False
+        )
+
+
+def encode_image(data, max_side, quality):
+    """
+    Downsize an image to fit `max_side` pixels and re-encode it as JPEG.
+
+    Returns None when the result is not smaller.
+    """
+    encoded = resize_image(data, max_side).tobytes("jpeg", jpg_quality=quality)
+    return encoded if len(encoded) < len(data) else None
+
+
+def thumbnail_content(data, max_side, quality):
+    """A JPEG of an image fitting `max_side` pixels; runs in a worker process."""
+    return resize_image(data, max_side).tobytes("jpeg", jpg_quality=quality)
+
+
+def is_image_only(doc):
+    """True for a scanned PDF: every page has images and no text."""
+    return doc.page_count > 0 and all(
+        page.get_images() and not page.get_text().strip() for page in doc
+    )
+
+
+def downsample_pdf(data, dpi, quality):
+    """
+    Downsample the images of an image-only PDF to `dpi` and write it compactly.
+
+    Each image is measured against the largest area it is drawn in, so an
+    image shown at full page size keeps `dpi` pixels per inch. Bilevel and
+    masked images are kept as they are. Returns None for PDFs with text or
+    when the result is not smaller.
+    """
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        if not is_image_only(doc):
+            return None
+
+        done = set()
+        for page in doc:
+            for image in page.get_images(full=True):
+                xref, smask = image[0], image[1]
+                if xref in done:
+                    continue
+                done.add(xref)
+                if smask or doc.xref_get_key(xref, "BitsPerComponent")[1] == "1":
+                    continue
+
+                rects = page.get_image_rects(xref)
+                if not rects:
+                    continue
+                inches = max(max(rect.width, rect.height) for rect in rects) / 72
+
+                pix = fitz.Pixmap(doc, xref)
+                scale = dpi * inches / max(pix.width, pix.height)
+                if scale >= MIN_SCALE_GAIN:
+                    continue
+
+                if (
+                    pix.alpha
+                    or pix.colorspace is None
+                    or pix.colorspace.n not in (1, 3)
+                ):
+                    pix = fitz.Pixmap(fitz.csRGB, pix, 0)
+                pix = fitz.Pixmap(
+                    pix,
+                    max(1, round(pix.width * scale)),
+                    max(1, round(pix.height * scale)),
+                )
+                page.replace_image(
+                    xref, stream=pix.tobytes("jpeg", jpg_quality=quality)
+                )
+
+        output = doc.tobytes(garbage=4, deflate=True, use_objstms=1)
+
+    return output if len(output) < len(data) else None
+
+
+def write_temporary(data, mimetype):
+    """Write an optimized result to a temporary file and return its path."""
+    suffix = ".pdf" if mimetype == PDF_MIMETYPE else ".jpg"
+    fd, path = tempfile.mkstemp(prefix="optimized-", suffix=suffix)
+    with os.fdopen(fd, "wb") as file:
+        file.write(data)
+    return path
+
+
+def optimize_content(source, kind, mimetype, options):
+    """
+    Optimize a document's content; runs in a worker process.
+
+    The result is written to a temporary file so only its path, not the
+    content, is sent back to the server process.
+
+    Args:
+        source: The content (bytes) or the path of a file holding it
+        kind: "profile" for a profile photo, "scan" for any other document
+        mimetype: The sniffed type of the content
+        options: dict with profile_size, scan_dpi and jpeg_quality
+
+    Returns:
+        tuple: (temporary file path, mimetype, size), or None to keep the
+        original
+    """
+    if isinstance(source, str):
+        with open(source, "rb") as file:
+            data = file.read()
+    else:
+        data = source
+
+    quality = options["jpeg_quality"]
+    if mimetype == PDF_MIMETYPE:
+        if kind == "profile":
+            return None
+        optimized = downsample_pdf(data, options["scan_dpi"], quality)
+        if optimized is None:
+            return None
+        return write_temporary(optimized, PDF_MIMETYPE), PDF_MIMETYPE, len(optimized)
+
+    max_side = (
+        options["profile_size"]
+        if kind == "profile"
+        else options["scan_dpi"] * SCAN_PAGE_INCHES
+    )
+    optimized = encode_image(data, max_side, quality)
+    if optimized is None:
+        return None
+    return write_temporary(optimized, JPEG_MIMETYPE), JPEG_MIMETYPE, len(optimized)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    The process pool the optimizations run in.
+
+    Worker processes are spawned rather than forked, since the server
+    process runs threads (e.g. batch uploads) that a fork would copy
+    mid-flight.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(
+                    max_workers=settings.UPLOAD_OPTIMIZATION_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _pool
+
+
+def reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def file_size(file_io):
+    if hasattr(file_io, "size") and file_io.size is not None:
+        return file_io.size
+    position = file_io.tell()
+    size = file_io.seek(0, os.SEEK_END)
+    file_io.seek(position)
+    return size
+
+
+def optimize_upload(file_io, file_type, mimetype=None):
+    """
+    Shrink a document before it is stored.
+
+    Profile photos (file type "profile") are resized to fit
+    PROFILE_PHOTO_SIZE pixels and re-encoded as JPEG. Scanned images are
+    limited to UPLOAD_SCAN_DPI over a legal-size page and re-encoded, and
+    image-only PDFs get their images downsampled to UPLOAD_SCAN_DPI. Other
+    files, failures and results that are not smaller keep the original.
+
+    Returns:
+        OptimizedUpload: The file object and type to store, with the
+        original and stored sizes in bytes. An optimized file_io is an
+        OptimizedFile, deleted from disk once it is closed or collected
+    """
+    original_size = file_size(file_io)
+    kept = OptimizedUpload(file_io, mimetype, original_size, original_size)
+    if not settings.UPLOAD_OPTIMIZATION_ENABLED:
+        return kept
+
+    file_io.seek(0)
+    sniffed = sniff_mimetype(file_io.read(8))
+    file_io.seek(0)
+    if sniffed is None:
+        return kept
+
+    # Files on disk (e.g. uploads Django spooled there) are read by the
+    # worker from their path
+    name = getattr(file_io, "name", None)
+    if hasattr(file_io, "temporary_file_path"):
+        source = file_io.temporary_file_path()
+    elif isinstance(name, str) and os.path.isabs(name) and os.path.isfile(name):
+        source = name
+    elif isinstance(file_io, BytesIO):
+        source = file_io.getvalue()
+    else:
+        source = file_io.read()
+        file_io.seek(0)
+
+    options = {
+        "profile_size": settings.PROFILE_PHOTO_SIZE,
+        "scan_dpi": settings.UPLOAD_SCAN_DPI,
+        "jpeg_quality": settings.UPLOAD_JPEG_QUALITY,
+    }
+    kind = "profile" if str(file_type).lower() == "profile" else "scan"
+
+    try:
+        result = (
+            get_pool()
+            .submit(optimize_content, source, kind, sniffed, options)
+            .result(timeout=settings.UPLOAD_OPTIMIZATION_TIMEOUT)
+        )
+    except BrokenProcessPool as e:
+        # A worker died (e.g. out of memory); start a fresh pool next time
+        reset_pool()
+        logger.error("Upload optimization worker died: %s", e)
+        return kept
+    except FutureTimeoutError:
+        # The task keeps its worker busy until it finishes, start a fresh pool
+        reset_pool()
+        logger.warning(
+            "Upload optimization timed out (%d bytes), keeping original",
+            original_size,
+        )
+        return kept
+    except Exception:
+        logger.exception("Upload optimization failed, keeping original")
+        return kept
+
+    if result is None:
+        return kept
+
+    path, optimized_mimetype, size = result
+    return OptimizedUpload(OptimizedFile(path), optimized_mimetype, original_size, size)